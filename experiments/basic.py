@@ -3,16 +3,26 @@
 # Boid implementation in Python using PyGame
 from __future__ import division  # required in Python 2.7
 # Necessary to import modules with relative path
-import sys, os.path as path
+import sys, os, os.path as path
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
-from modules.boid import *
+from modules.simulation import *
+from modules.overlay import *
+from modules.renderer import *
+from modules.camera import *
+from modules.pipeline import *
+from modules import config
 
 # === main === (lower_case names)
 
 # --- init ---
 
+# Size of the world, numbers of boids... from a scenario file, the environment or the command line (see modules/config.py)
+config.parse_command_line('Boids following the three basic rules.')
+
 pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+# The window shows the part of the world the camera looks at, all of it unless it is larger than the screen
+world = config.world_size()
+screen = pygame.display.set_mode(config.window_size(world))
 
 # Set the title of the window
 pygame.display.set_caption('Boids')
@@ -24,68 +34,98 @@ background.fill(BLACK)
 
 # --- objects ---
 
-# lists
-# This is a list of every boid
-boid_list = pygame.sprite.Group()
+# The simulation places the boids at random positions on the screen. --integrator, --dt and --min-speed set how they
+# move, a tick covers --dt ticks of the rules and this scenario runs twice as fast as real time.
+simulation = BasicSimulation(config.get('num_boids'), timestep=config.get('dt') / 120, seed=config.get('seed'),
+                             integrator=config.get('integrator'), dt=config.get('dt'),
+                             min_speed=config.get('min_speed'))
+flock = simulation.flock
+# With --threaded the simulation runs on a thread of its own and the flocks drawn are interpolated copies of its flocks
+pipeline = Pipeline(simulation, config.get('threaded'))
 # This is a list of every sprite.
 all_sprites_list = pygame.sprite.LayeredDirty()
 
-# --- create boids and obstacles at random positions on the screen ---
-
-# Place boids
-for i in range(NUM_BOIDS):
-    boid = Boid(random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT),
-                100, 40, 5, 10, 100, 200, MAX_BOID_SPEED, "experiments/resources/img/boid.png")
-    # Add the boid to the lists of objects
-    boid_list.add(boid)
-    all_sprites_list.add(boid)
+# The renderer draws the boids, with a strategy that depends on how many of them are on screen.
+# With the render_every setting at k (BOIDS_RENDER_EVERY or --render-every) only every k-th tick is drawn.
+renderer = Renderer(screen, background, all_sprites_list, config.get('render_every'))
+# Only the boids in view are drawn. WASD scroll, the mouse wheel and + and - zoom, Home shows the whole world.
+camera = Camera(screen.get_width(), screen.get_height(), *world)
+renderer.add_flock(pipeline.flock(flock), "experiments/resources/img/boid.png")
+
+# Profiling is turned on by the profile setting (BOIDS_PROFILE or --profile), 1 or a .csv or .json file to save the frame
+# times to on exit.
+# F3 shows the profiling overlay.
+profile = config.get('profile')
+if profile != '0':
+    profiler = Profiler(record=profile != '1')
+    overlay = ProfilerOverlay(profiler)
+    all_sprites_list.add(overlay, layer=1)
+else:
+    profiler = NullProfiler()
+    overlay = None
+simulation.profiler = profiler
 
 clock = pygame.time.Clock()
 running = True
+# Time the last frame took and how many times faster than real time the simulation runs
+frame_time = 0
+speed = 1
 # Clear old sprites and replace with background
 all_sprites_list.clear(screen, background)
 
+pipeline.start()
+
 # --- mainloop ---
 
 while running:
 
     # --- events ---
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
+    with profiler.phase('events'):
+        for event in pygame.event.get():
+            if camera.handle(event):
+                continue
+            if event.type == pygame.QUIT:
                 running = False
-
-    text = "Boids Simulation: FPS: {0:.2f}".format(clock.get_fps())
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                # Fast forward with the arrow keys
+                elif event.key == pygame.K_RIGHT:
+                    speed = min(speed * 2, 8)
+                elif event.key == pygame.K_LEFT:
+                    speed = max(speed // 2, 1)
+                elif event.key == pygame.K_F3 and overlay is not None:
+                    overlay.toggle()
+
+    text = "Boids Simulation: FPS: {0:.2f} Speed: x{1}".format(clock.get_fps(), speed)
     pygame.display.set_caption(text)
     # --- updates ---
 
-    # Scan for boids to pay attention to
-    for boid in boid_list:
-        closeboid = []
-        for otherboid in boid_list:
-            if otherboid == boid:
-                continue
-            distance = boid.distance(otherboid)
-            if distance < boid.field_of_view:
-                closeboid.append(otherboid)
+    pipeline.speed = speed
+    ticks = pipeline.step(frame_time)
 
-        # Apply the rules of the boids
-        boid.cohesion(closeboid)
-        boid.alignment(closeboid)
-        boid.separation(closeboid, 20)
-        boid.update(False)
+    # --- draws ---
 
-        # --- draws ---
+    with profiler.phase('draw'):
+        if overlay is not None:
+            overlay.update()
+
+        # Create list of dirty rects
+        rects = renderer.draw(ticks, camera.view(), camera.zoom)
 
-    # Create list of dirty rects
-    rects = all_sprites_list.draw(screen)
     # Go ahead and update the screen with what we've drawn.
-    pygame.display.update(rects)
-    clock.tick(120)
+    with profiler.phase('present'):
+        pygame.display.update(rects)
+
+    # Used to manage how fast the screen updates
+    with profiler.phase('wait'):
+        frame_time = clock.tick(120) / 1000
+    profiler.frame()
 
 # --- the end ---
+pipeline.close()
+if profile not in ('0', '1'):
+    profiler.export(profile)
 pygame.quit()
 sys.exit()
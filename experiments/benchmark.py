@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Measure how fast the scenarios step (headless) for growing numbers of boids
+from __future__ import division  # required in Python 2.7
+# Necessary to import modules with relative path
+import sys, os, os.path as path
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import resource
+import time
+import traceback
+from timeit import default_timer
+
+try:
+    from queue import Empty
+except ImportError:
+    # Python 2
+    from Queue import Empty
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+# Size of the world for REFERENCE_AGENTS boids. Worlds are scaled up for more boids so that the density (and so the number of neighbors per boid) stays the same.
+REFERENCE_WIDTH, REFERENCE_HEIGHT = 1280, 720
+REFERENCE_AGENTS = 1000
+
+'''
+Size of the world used for a run with the given number of agents.
+'''
+def world_size(agents, fixed_world):
+    if fixed_world or agents <= REFERENCE_AGENTS:
+        return REFERENCE_WIDTH, REFERENCE_HEIGHT
+
+    scale = math.sqrt(agents / REFERENCE_AGENTS)
+    return int(REFERENCE_WIDTH * scale), int(REFERENCE_HEIGHT * scale)
+
+
+'''
+Relative error of the rules of the BasicSimulation sim with lod (approximate far neighbors) against the exact rules, on its current state: mean length of the difference of the velocity changes over mean length of the exact velocity changes.
+'''
+def lod_error(sim, lod):
+    import numpy
+    flock = sim.flock
+    n = flock.count
+    changes = []
+    for radius in (None, lod):
+        sim.lod = radius
+        flock.begin_tick()
+        sim.prepare()
+        sim.rules(0, n)
+        changes.append(flock.next_velocities[:n] - flock.velocities[:n])
+    exact, approximate = changes
+
+    exact_length = numpy.sqrt((exact ** 2).sum(axis=1)).mean()
+    return float(numpy.sqrt(((approximate - exact) ** 2).sum(axis=1)).mean() / exact_length) if exact_length else 0.0
+
+
+'''
+Run a single benchmark case and put its result on queue, or {'error': traceback} if it fails. Runs in its own process, so that every case starts from a fresh interpreter and the peak memory is its own.
+'''
+def run_case(queue, *args):
+    try:
+        queue.put(measure_case(*args))
+    except Exception:
+        queue.put({'error': traceback.format_exc()})
+
+
+'''
+Run a single benchmark case and return its result.
+'''
+def measure_case(scenario, agents, steps, max_seconds, width, height, seed, workers, lod=None, skin=None):
+    # Headless whatever the environment says, the world of every case is given to the simulation
+    os.environ['BOIDS_HEADLESS'] = '1'
+    sys.path.append(ROOT)
+    from modules import config, simulation
+    from modules.profiler import Profiler
+
+    start = default_timer()
+    if scenario == 'basic':
+        sim = simulation.BasicSimulation(agents, width=width, height=height, seed=seed, workers=workers, lod=lod,
+                                         skin=skin)
+    elif scenario == 'obstacles':
+        # Keep the number of obstacles per area of the default scenario
+        obstacles = int(round(config.get('num_obstacles') * width * height / (REFERENCE_WIDTH * REFERENCE_HEIGHT)))
+        sim = simulation.ObstacleSimulation(agents, obstacles, width=width, height=height, seed=seed, workers=workers,
+                                            skin=skin)
+    else:
+        # Keep the ratio of prey to predators of the default scenario
+        num_predators = config.get('num_predators')
+        predators = max(num_predators, agents * num_predators // config.get('num_prey'))
+        if scenario == 'predators':
+            sim = simulation.PredatorSimulation(agents, predators, width=width, height=height, seed=seed, skin=skin)
+        else:
+            # The prey split into two species, sharing a single flock with the predators
+            species = [(simulation.PREY, agents - agents // 2), (simulation.STARLING, agents // 2),
+                       (simulation.PREDATOR, predators)]
+            sim = simulation.SpeciesSimulation(species, width=width, height=height, seed=seed, skin=skin)
+    setup_seconds = default_timer() - start
+
+    sim.profiler = Profiler()
+    done = 0
+    start = default_timer()
+    while done < steps and default_timer() - start < max_seconds:
+        sim.run(1)
+        done += 1
+    seconds = default_timer() - start
+    if scenario in ('basic', 'obstacles'):
+        sim.close()
+    # Milliseconds per step spent in every rule, before the error measurement adds to them
+    rule_ms = dict((name, 1000 * total / done) for name, total in sim.profiler.totals.items())
+    error = lod_error(sim, lod) if lod is not None else None
+
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    return {
+        'scenario': scenario if lod is None else scenario + '-lod',
+        'lod': lod,
+        'lod_error': error,
+        'agents': agents,
+        'width': width,
+        'height': height,
+        'workers': workers,
+        'skin': skin,
+        'steps': done,
+        'setup_seconds': setup_seconds,
+        'seconds': seconds,
+        'steps_per_second': done / seconds if seconds > 0 else None,
+        'rule_ms': rule_ms,
+        'peak_memory_mb': peak_mb,
+    }
+
+
+'''
+Run a single benchmark case in a process of its own (see run_case) and return its result. Raises RuntimeError when the case fails or its process dies without a result.
+'''
+def run_in_process(*args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_case, args=(queue,) + args)
+    process.start()
+    # Read the result before joining, a process with data left in its queue does not exit
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1)
+        except Empty:
+            if not process.is_alive():
+                # The result may have been put just before the process exited
+                try:
+                    result = queue.get(timeout=1)
+                except Empty:
+                    raise RuntimeError("Benchmark case {0} exited with code {1} without a result".format(
+                        args[:2], process.exitcode))
+    process.join()
+    if 'error' in result:
+        raise RuntimeError("Benchmark case {0} failed:\n{1}".format(args[:2], result['error']))
+    return result
+
+
+'''
+What a case is compared by: the same scenario with as many agents, run the same way.
+'''
+def case_key(case):
+    # Results saved before workers and skin were recorded ran with neither
+    return case['scenario'], case['agents'], case.get('lod'), case.get('workers', 1), case.get('skin')
+
+
+'''
+Print how every case of results did compared with the same case in baseline. Returns the list of cases that got slower by more than tolerance.
+'''
+def compare(results, baseline, tolerance):
+    before = dict((case_key(case), case) for case in baseline['results'])
+    regressions = []
+
+    print("\n{0:<10} {1:>8} {2:>12} {3:>12} {4:>8}".format('scenario', 'agents', 'before', 'after', 'change'))
+    for case in results['results']:
+        old = before.get(case_key(case))
+        if old is None or not old['steps_per_second'] or not case['steps_per_second']:
+            continue
+        change = case['steps_per_second'] / old['steps_per_second'] - 1
+        flag = ''
+        if change < -tolerance:
+            flag = '  REGRESSION'
+            regressions.append(case)
+        print("{0:<10} {1:>8} {2:>12.1f} {3:>12.1f} {4:>+7.0%}{5}".format(
+            case['scenario'], case['agents'], old['steps_per_second'], case['steps_per_second'], change, flag))
+
+    return regressions
+
+
+# === main ===
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the headless simulation step for growing numbers of boids.')
+    parser.add_argument('--scenarios', nargs='+', default=['basic', 'obstacles', 'predators'],
+                        choices=['basic', 'obstacles', 'predators', 'species'])
+    parser.add_argument('--agents', nargs='+', type=int, default=[100, 1000, 10000, 100000],
+                        help='numbers of boids (prey for the predators and species scenarios) to run')
+    parser.add_argument('--steps', type=int, default=100, help='number of steps to time per case')
+    parser.add_argument('--max-seconds', type=float, default=60, help='stop timing a case after this long')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes applying the rules (basic and obstacles scenarios)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random number generators')
+    parser.add_argument('--lod', type=float, metavar='NEAR',
+                        help='also run the basic scenario with boids further than NEAR only seen through cell summaries '
+                             '(modules.lod) and report how far its rules are from the exact ones')
+    parser.add_argument('--skin', type=float, metavar='PIXELS',
+                        help='keep Verlet neighbor lists with this skin (modules.neighbor_list)')
+    parser.add_argument('--fixed-world', action='store_true',
+                        help='keep the world at {0}x{1} instead of growing it with the number of boids'.format(
+                            REFERENCE_WIDTH, REFERENCE_HEIGHT))
+    parser.add_argument('--output', default='benchmark.json', help='file to save the results to')
+    parser.add_argument('--compare', metavar='BASELINE', help='results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='slowdown (fraction of steps/s) reported as a regression when comparing')
+    # The numbers of obstacles, prey and predators of the default scenarios, which the cases keep the proportions of,
+    # from a scenario file, the environment or the command line. The cases run in forked processes, which inherit them
+    sys.path.append(ROOT)
+    from modules import config
+    config.add_arguments(parser, only=('num_obstacles', 'num_prey', 'num_predators'))
+    args = parser.parse_args()
+    if args.skin is not None and args.workers > 1:
+        parser.error('--skin cannot be combined with --workers')
+    if args.skin is not None and args.lod is not None:
+        parser.error('--skin cannot be combined with --lod')
+    config.apply_arguments(args)
+
+    import numpy
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'machine': platform.platform(),
+        'processor': platform.processor(),
+        'steps': args.steps,
+        'seed': args.seed,
+        'workers': args.workers,
+        'lod': args.lod,
+        'skin': args.skin,
+        'results': [],
+    }
+
+    print("{0:<10} {1:>8} {2:>6} {3:>10} {4:>10}  {5}".format('scenario', 'agents', 'steps', 'steps/s', 'peak MB', 'ms per step by rule'))
+    for scenario in args.scenarios:
+        for agents in args.agents:
+            width, height = world_size(agents, args.fixed_world)
+            modes = [None, args.lod] if scenario == 'basic' and args.lod is not None else [None]
+            for lod in modes:
+                case = run_in_process(scenario, agents, args.steps, args.max_seconds, width, height, args.seed,
+                                      args.workers, lod, args.skin)
+                results['results'].append(case)
+
+                rules = ', '.join('{0} {1:.2f}'.format(name, ms) for name, ms in sorted(case['rule_ms'].items()))
+                if lod is not None:
+                    rules += ', error {0:.2%}'.format(case['lod_error'])
+                print("{0:<10} {1:>8} {2:>6} {3:>10.1f} {4:>10.1f}  {5}".format(
+                    case['scenario'], agents, case['steps'], case['steps_per_second'] or 0, case['peak_memory_mb'], rules))
+                sys.stdout.flush()
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+    print("\nResults saved to {0}".format(args.output))
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        if regressions:
+            sys.exit(1)
@@ -4,18 +4,28 @@
 
 from __future__ import division  # required in Python 2.7
 # Necessary to import modules with relative path
-import sys, os.path as path
+import sys, os, os.path as path
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
-from modules.boid import *
-from modules.obstacle import *
+from modules.simulation import *
+from modules.overlay import *
+from modules.renderer import *
+from modules.camera import *
+from modules.pipeline import *
+from modules.sprites import *
+from modules import config
 
 # === main ===
 
 # --- init ---
 
+# Size of the world, numbers of boids... from a scenario file, the environment or the command line (see modules/config.py)
+config.parse_command_line('Boids heading for the mouse around obstacles.')
+
 pygame.init()
 
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), flags)
+# The window shows the part of the world the camera looks at, all of it unless it is larger than the screen
+world = config.world_size()
+screen = pygame.display.set_mode(config.window_size(world), pygame.DOUBLEBUF)
 
 # Set the title of the window
 pygame.display.set_caption('Boids')
@@ -27,101 +37,112 @@ background.fill(BLACK)
 
 # --- objects ---
 
-# lists
-boid_list = pygame.sprite.Group()
-obstacle_list = pygame.sprite.Group()
+# The simulation places the boids and obstacles at random positions on the screen, --integrator, --dt and
+# --min-speed set how the boids move
+simulation = ObstacleSimulation(config.get('num_boids'), config.get('num_obstacles'), seed=config.get('seed'),
+                                integrator=config.get('integrator'), dt=config.get('dt'),
+                                min_speed=config.get('min_speed'))
+flock = simulation.flock
+# With --threaded the simulation runs on a thread of its own and the flocks drawn are interpolated copies of its flocks
+pipeline = Pipeline(simulation, config.get('threaded'))
 # This is a list of every sprite.
 all_sprites_list = pygame.sprite.LayeredDirty()
 
-# --- create boids and obstacles at random positions on the screen ---
-
-# Place boids
-for i in range(NUM_BOIDS):
-    boid = Boid(random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT),
-                100, 40, 5, 10, 100, 60, MAX_BOID_SPEED, "experiments/resources/img/boid.png")
-    # Add the boid to the lists of objects
-    boid_list.add(boid)
-    all_sprites_list.add(boid)
-
-# Place obstacles
-for i in range(NUM_OBSTACLES):
-    obstacle = Obstacle(random.randint(0 + BORDER, SCREEN_WIDTH - BORDER),
-                        random.randint(0 + BORDER, SCREEN_HEIGHT - BORDER))
-    # Add the obstacle to the lists of objects
-    obstacle_list.add(obstacle)
-    all_sprites_list.add(obstacle)
+# The renderer draws the boids, with a strategy that depends on how many of them are on screen.
+# With the render_every setting at k (BOIDS_RENDER_EVERY or --render-every) only every k-th tick is drawn.
+renderer = Renderer(screen, background, all_sprites_list, config.get('render_every'))
+# Only the boids in view are drawn. WASD scroll, the mouse wheel and + and - zoom, Home shows the whole world.
+camera = Camera(screen.get_width(), screen.get_height(), *world)
+renderer.add_flock(pipeline.flock(flock), "experiments/resources/img/boid.png")
+
+# Add the obstacles to the list of objects
+all_sprites_list.add(obstacle_sprites(simulation.obstacles))
+
+# Profiling is turned on by the profile setting (BOIDS_PROFILE or --profile), 1 or a .csv or .json file to save the frame
+# times to on exit.
+# F3 shows the profiling overlay.
+profile = config.get('profile')
+if profile != '0':
+    profiler = Profiler(record=profile != '1')
+    overlay = ProfilerOverlay(profiler)
+    all_sprites_list.add(overlay, layer=1)
+else:
+    profiler = NullProfiler()
+    overlay = None
+simulation.profiler = profiler
 
 clock = pygame.time.Clock()
 running = True
+# Time the last frame took and how many times faster than real time the simulation runs
+frame_time = 0
+speed = 1
 
 # Clear old sprites and replace with background
 all_sprites_list.clear(screen, background)
 
+pipeline.start()
+
 # --- mainloop ---
 
 while running:
 
     # --- events ---
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
+    with profiler.phase('events'):
+        for event in pygame.event.get():
+            if camera.handle(event):
+                continue
+            if event.type == pygame.QUIT:
                 running = False
-
-    text = "Boids Simulation with Obstacles: FPS: {0:.2f}".format(clock.get_fps())
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                # Fast forward with the arrow keys
+                elif event.key == pygame.K_RIGHT:
+                    speed = min(speed * 2, 8)
+                elif event.key == pygame.K_LEFT:
+                    speed = max(speed // 2, 1)
+                elif event.key == pygame.K_F3 and overlay is not None:
+                    overlay.toggle()
+                # N switches between heading straight for the mouse and following paths around the obstacles
+                elif event.key == pygame.K_n:
+                    with pipeline.lock:
+                        simulation.navigate(None if simulation.flow_field is not None else 10)
+
+    text = "Boids Simulation with Obstacles: FPS: {0:.2f} Speed: x{1}{2}".format(
+        clock.get_fps(), speed, " Paths" if simulation.flow_field is not None else "")
     pygame.display.set_caption(text)
 
-    pos = pygame.mouse.get_pos()
-    mouse_x = pos[0]
-    mouse_y = pos[1]
+    # The boids head for the mouse, changes to the simulation hold the lock of the pipeline in case it runs on a thread
+    with pipeline.lock:
+        simulation.goal_x, simulation.goal_y = camera.to_world(*pygame.mouse.get_pos())
 
     # --- updates ---
 
-    # Scan for boids and obstacles to pay attention to
-    for boid in boid_list:
-        closeboid = []
-        visible_obstacles = []
-        avoid = False
-        for otherboid in boid_list:
-            if otherboid == boid:
-                continue
-            distance = boid.distance(otherboid)
-            if distance < boid.field_of_view:
-                closeboid.append(otherboid)
-        for obstacle in obstacle_list:
-            distance = boid.distance(obstacle)
-            if distance <= boid.field_of_view:
-                visible_obstacles.append(obstacle)
-
-        # Apply the rules of the boids
-        boid.cohesion(closeboid)
-        boid.alignment(closeboid)
-        boid.separation(closeboid, 20)
-        if len(visible_obstacles) > 0:
-            for obstacle in visible_obstacles:
-				boid.obstacle_avoidance(obstacle)
-        boid.goal(mouse_x, mouse_y)
-        boid.update(False)
-
-    # Check for collisions
-    # TODO Either make this work or add a genetic algorithm and kill them
-    for boid in boid_list:
-        collisions = pygame.sprite.spritecollide(boid, obstacle_list, False)
-        for obstacle in collisions:
-			boid.velocityX += -1 * (obstacle.real_x - boid.rect.x)
-			boid.velocityY += -1 * (obstacle.real_y - boid.rect.y)
+    pipeline.speed = speed
+    ticks = pipeline.step(frame_time)
 
     # --- draws ---
 
-    # Create list of dirty rects
-    rects = all_sprites_list.draw(screen)
+    with profiler.phase('draw'):
+        if overlay is not None:
+            overlay.update()
+
+        # Create list of dirty rects
+        rects = renderer.draw(ticks, camera.view(), camera.zoom)
+
     # Go ahead and update the screen with what we've drawn.
-    pygame.display.update(rects)
+    with profiler.phase('present'):
+        pygame.display.update(rects)
+
     # Used to manage how fast the screen updates
-    clock.tick(60)
+    with profiler.phase('wait'):
+        frame_time = clock.tick(60) / 1000
+    profiler.frame()
 
 # --- the end ---
+pipeline.close()
+if profile not in ('0', '1'):
+    profiler.export(profile)
 pygame.quit()
 sys.exit()
@@ -4,16 +4,26 @@
 
 from __future__ import division  # required in Python 2.7
 # Necessary to import modules with relative path
-import sys, os.path as path
+import sys, os, os.path as path
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
-from modules.boid import *
+from modules.simulation import *
+from modules.overlay import *
+from modules.renderer import *
+from modules.camera import *
+from modules.pipeline import *
+from modules import config
 
 # === main === (lower_case names)
 
 # --- init ---
 
+# Size of the world, numbers of boids... from a scenario file, the environment or the command line (see modules/config.py)
+config.parse_command_line('Boids hunted by predators.')
+
 pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), flags)
+# The window shows the part of the world the camera looks at, all of it unless it is larger than the screen
+world = config.world_size()
+screen = pygame.display.set_mode(config.window_size(world), pygame.DOUBLEBUF)
 
 # Set the title of the window
 pygame.display.set_caption('Boids with predators')
@@ -23,116 +33,108 @@ background = pygame.Surface(screen.get_size())
 background = background.convert()
 background.fill(BLACK)
 
-# sprite lists
-prey_list = pygame.sprite.Group()
-close_prey = pygame.sprite.Group()
-predator_list = pygame.sprite.Group()
-# This is a list of every sprite.
+# The simulation places the prey and predators at random positions on the screen, --integrator, --dt and
+# --min-speed set how the boids move
+# Eaten prey come back after --respawn ticks, clicking spawns prey at the mouse until there are --capacity of them
+simulation = PredatorSimulation(config.get('num_prey'), config.get('num_predators'), respawn=config.get('respawn'),
+                                capacity=config.get('capacity') or 2 * config.get('num_prey'), seed=config.get('seed'),
+                                integrator=config.get('integrator'), dt=config.get('dt'),
+                                min_speed=config.get('min_speed'))
+prey = simulation.prey
+predators = simulation.predators
+# With --threaded the simulation runs on a thread of its own and the flocks drawn are interpolated copies of its flocks
+pipeline = Pipeline(simulation, config.get('threaded'))
+# This is a list of every sprite. Sprites are only shown for boids on screen, so prey that get eaten just disappear.
 all_sprites_list = pygame.sprite.LayeredDirty()
-
-# --- create boids and obstacles at random positions on the screen ---
-
-# Place boids
-for i in xrange(NUM_PREY):
-    prey = Boid(random.randint(BORDER, SCREEN_WIDTH - BORDER), random.randint(BORDER, SCREEN_HEIGHT - BORDER),
-                100, 40, 5, 15, 0, FIELD_OF_VIEW, MAX_PREY_SPEED, "experiments/resources/img/boid.png")
-    # Add the prey to the lists of objects
-    prey_list.add(prey)
-    all_sprites_list.add(prey)
-
-for i in xrange(NUM_PREDATORS):
-    predator = Boid(random.randint(BORDER, SCREEN_WIDTH - BORDER), random.randint(BORDER, SCREEN_HEIGHT - BORDER),
-                    100, 40, 5, 0, 50, FIELD_OF_VIEW, MAX_PREDATOR_SPEED, "experiments/resources/img/predator.png")
-    # Add the predator to the lists of objects
-    predator_list.add(predator)
-    all_sprites_list.add(predator)
+# The renderer draws the boids, with a strategy that depends on how many of them are on screen.
+# With the render_every setting at k (BOIDS_RENDER_EVERY or --render-every) only every k-th tick is drawn.
+renderer = Renderer(screen, background, all_sprites_list, config.get('render_every'))
+# Only the boids in view are drawn. WASD scroll, the mouse wheel and + and - zoom, Home shows the whole world.
+camera = Camera(screen.get_width(), screen.get_height(), *world)
+renderer.add_flock(pipeline.flock(prey), "experiments/resources/img/boid.png")
+renderer.add_flock(pipeline.flock(predators), "experiments/resources/img/predator.png")
+
+# Profiling is turned on by the profile setting (BOIDS_PROFILE or --profile), 1 or a .csv or .json file to save the frame
+# times to on exit.
+# F3 shows the profiling overlay.
+profile = config.get('profile')
+if profile != '0':
+    profiler = Profiler(record=profile != '1')
+    overlay = ProfilerOverlay(profiler)
+    all_sprites_list.add(overlay, layer=1)
+else:
+    profiler = NullProfiler()
+    overlay = None
+simulation.profiler = profiler
 
 clock = pygame.time.Clock()
 running = True
+# Time the last frame took and how many times faster than real time the simulation runs
+frame_time = 0
+speed = 1
 
 # Clear old sprites and replace with background
 all_sprites_list.clear(screen, background)
 
+pipeline.start()
+
 # --- mainloop ---
 
 while running:
 
     # --- events ---
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
+    with profiler.phase('events'):
+        for event in pygame.event.get():
+            if camera.handle(event):
+                continue
+            if event.type == pygame.QUIT:
                 running = False
-
-    text = "Boids Simulation with Predators: FPS: {0:.2f}".format(clock.get_fps())
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                # Fast forward with the arrow keys
+                elif event.key == pygame.K_RIGHT:
+                    speed = min(speed * 2, 8)
+                elif event.key == pygame.K_LEFT:
+                    speed = max(speed // 2, 1)
+                elif event.key == pygame.K_F3 and overlay is not None:
+                    overlay.toggle()
+            # A burst of new boids where the mouse clicks, taken from the pool of the flock
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                with pipeline.lock:
+                    simulation.population.spawn(10, PREY, *camera.to_world(*event.pos))
+
+    text = "Boids Simulation with Predators: FPS: {0:.2f} Speed: x{1} Prey: {2}".format(
+        clock.get_fps(), speed, simulation.population.flock.count)
     pygame.display.set_caption(text)
 
     # --- updates ---
 
-    # Scan for boids and predators to pay attention to
-    for prey in prey_list:
-        closeboid = []
-        avoid = False
-        for otherboid in prey_list:
-            if otherboid == prey:
-                continue
-            distance = prey.distance(otherboid)
-            if distance < 200:
-                closeboid.append(otherboid)
-        for predator in predator_list:
-            distance = prey.distance(predator)
-            if distance < prey.field_of_view:
-                avoid = True
-
-        # Apply the rules of the boids
-        prey.cohesion(closeboid)
-        prey.alignment(closeboid)
-        prey.separation(closeboid, 20)
-        if avoid:
-            prey.flee(predator)
-        else:
-            prey.go_to_middle()
-        prey.update(True)
-
-    for predator in predator_list:
-        closeboid = []
-        close_prey.empty()
-        for otherboid in predator_list:
-            if otherboid == predator:
-                continue
-            distance = predator.distance(otherboid)
-            if distance < predator.field_of_view:
-                closeboid.append(otherboid)
-        for prey in prey_list:
-            distance = prey.distance(prey)
-            if distance < predator.field_of_view:
-                close_prey.add(prey)
-
-        # Apply the rules of the boids
-        predator.cohesion(closeboid)
-        predator.alignment(closeboid)
-        predator.separation(closeboid, 20)
-        predator.attack(close_prey)
-        predator.update(True)
-
-        # If a predator manages to touch a prey, the prey gets eaten!
-        collisions = pygame.sprite.spritecollide(predator, close_prey, True)
-        # for prey in collisions:
-        # print "munch!"
+    pipeline.speed = speed
+    ticks = pipeline.step(frame_time)
 
     # --- draws ---
 
-    # Create list of dirty sprites
-    rects = all_sprites_list.draw(screen)
+    with profiler.phase('draw'):
+        if overlay is not None:
+            overlay.update()
+
+        # Create list of dirty rects
+        rects = renderer.draw(ticks, camera.view(), camera.zoom)
 
     # Go ahead and update the screen with what we've drawn.
-    pygame.display.update(rects)
-    # pygame.time.delay(10)
+    with profiler.phase('present'):
+        pygame.display.update(rects)
+
     # Used to manage how fast the screen updates
-    clock.tick(60)
+    with profiler.phase('wait'):
+        frame_time = clock.tick(60) / 1000
+    profiler.frame()
 
 # --- the end ---
+pipeline.close()
+if profile not in ('0', '1'):
+    profiler.export(profile)
 pygame.quit()
 sys.exit()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Boid implementation in Python using PyGame
+
+from __future__ import division  # required in Python 2.7
+# Necessary to import modules with relative path
+import sys, os, os.path as path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from modules.simulation import *
+from modules.overlay import *
+from modules.renderer import *
+from modules.camera import *
+from modules.pipeline import *
+from modules import config
+
+# === main === (lower_case names)
+
+# --- init ---
+
+# Size of the world, numbers of boids... from a scenario file, the environment or the command line (see modules/config.py)
+config.parse_command_line('Prey and starlings hunted by predators, all in one flock.')
+
+pygame.init()
+# The window shows the part of the world the camera looks at, all of it unless it is larger than the screen
+world = config.world_size()
+screen = pygame.display.set_mode(config.window_size(world), pygame.DOUBLEBUF)
+
+# Set the title of the window
+pygame.display.set_caption('Boids with species')
+
+# Fill background
+background = pygame.Surface(screen.get_size())
+background = background.convert()
+background.fill(BLACK)
+
+# Every species lives in one flock, what they do about each other is set by SPECIES_INTERACTIONS (see modules/simulation.py)
+species = [(PREY, config.get('num_prey')), (STARLING, config.get('num_prey')), (PREDATOR, config.get('num_predators'))]
+# Eaten boids come back after --respawn ticks, clicking spawns starlings at the mouse until there are --capacity boids.
+# --integrator, --dt and --min-speed set how the boids move.
+simulation = SpeciesSimulation(species, respawn=config.get('respawn'),
+                               capacity=config.get('capacity') or 2 * sum(count for kind, count in species),
+                               seed=config.get('seed'), integrator=config.get('integrator'), dt=config.get('dt'),
+                               min_speed=config.get('min_speed'))
+flock = simulation.flock
+# With --threaded the simulation runs on a thread of its own and the flocks drawn are interpolated copies of its flocks
+pipeline = Pipeline(simulation, config.get('threaded'))
+# This is a list of every sprite. Sprites are only shown for boids on screen, so boids that get eaten just disappear.
+all_sprites_list = pygame.sprite.LayeredDirty()
+# The renderer draws the boids, with a strategy that depends on how many of them are on screen.
+# With the render_every setting at k (BOIDS_RENDER_EVERY or --render-every) only every k-th tick is drawn.
+renderer = Renderer(screen, background, all_sprites_list, config.get('render_every'))
+# Only the boids in view are drawn. WASD scroll, the mouse wheel and + and - zoom, Home shows the whole world.
+camera = Camera(screen.get_width(), screen.get_height(), *world)
+# One image per species, in the order of the species list
+renderer.add_flock(pipeline.flock(flock), ["experiments/resources/img/boid.png",
+                                           "experiments/resources/img/starling.png",
+                                           "experiments/resources/img/predator.png"])
+
+# Profiling is turned on by the profile setting (BOIDS_PROFILE or --profile), 1 or a .csv or .json file to save the frame
+# times to on exit.
+# F3 shows the profiling overlay.
+profile = config.get('profile')
+if profile != '0':
+    profiler = Profiler(record=profile != '1')
+    overlay = ProfilerOverlay(profiler)
+    all_sprites_list.add(overlay, layer=1)
+else:
+    profiler = NullProfiler()
+    overlay = None
+simulation.profiler = profiler
+
+clock = pygame.time.Clock()
+running = True
+# Time the last frame took and how many times faster than real time the simulation runs
+frame_time = 0
+speed = 1
+
+# Clear old sprites and replace with background
+all_sprites_list.clear(screen, background)
+
+pipeline.start()
+
+# --- mainloop ---
+
+while running:
+
+    # --- events ---
+
+    with profiler.phase('events'):
+        for event in pygame.event.get():
+            if camera.handle(event):
+                continue
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                # Fast forward with the arrow keys
+                elif event.key == pygame.K_RIGHT:
+                    speed = min(speed * 2, 8)
+                elif event.key == pygame.K_LEFT:
+                    speed = max(speed // 2, 1)
+                elif event.key == pygame.K_F3 and overlay is not None:
+                    overlay.toggle()
+            # A burst of new boids where the mouse clicks, taken from the pool of the flock
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                with pipeline.lock:
+                    simulation.population.spawn(10, STARLING, *camera.to_world(*event.pos))
+
+    text = "Boids Simulation with Species: FPS: {0:.2f} Speed: x{1} Boids: {2}".format(
+        clock.get_fps(), speed, simulation.population.flock.count)
+    pygame.display.set_caption(text)
+
+    # --- updates ---
+
+    pipeline.speed = speed
+    ticks = pipeline.step(frame_time)
+
+    # --- draws ---
+
+    with profiler.phase('draw'):
+        if overlay is not None:
+            overlay.update()
+
+        # Create list of dirty rects
+        rects = renderer.draw(ticks, camera.view(), camera.zoom)
+
+    # Go ahead and update the screen with what we've drawn.
+    with profiler.phase('present'):
+        pygame.display.update(rects)
+
+    # Used to manage how fast the screen updates
+    with profiler.phase('wait'):
+        frame_time = clock.tick(60) / 1000
+    profiler.frame()
+
+# --- the end ---
+pipeline.close()
+if profile not in ('0', '1'):
+    profiler.export(profile)
+pygame.quit()
+sys.exit()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Check that the kernel backends (modules.kernels) produce exactly the same trajectories as the numpy reference, and that
+# spawning and respawning boids never reallocates the pool of the flock (modules.population)
+from __future__ import division  # required in Python 2.7
+# Necessary to import modules with relative path
+import sys, os, os.path as path
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description='Run seeded scenarios with every kernel backend and compare the trajectories '
+                                             'with the numpy reference, tick by tick. Exits with 1 on any difference. '
+                                             'The predators scenario respawns eaten prey and spawns prey into every free '
+                                             'row of the pool each tick, which must never reallocate the flock.')
+parser.add_argument('--scenarios', nargs='+', default=['basic', 'obstacles', 'predators'],
+                    choices=['basic', 'obstacles', 'predators'])
+parser.add_argument('--backends', nargs='+', default=None,
+                    help='backends to check against numpy (default: numba if installed, python otherwise)')
+parser.add_argument('--boids', type=int, default=100, help='number of boids (prey for the predators scenario)')
+parser.add_argument('--steps', type=int, default=200, help='number of steps to compare')
+parser.add_argument('--seeds', nargs='+', type=int, default=[0, 1, 2], help='seeds to run every scenario with')
+parser.add_argument('--integrators', nargs='+', default=['semi-implicit', 'euler', 'verlet'],
+                    choices=['euler', 'semi-implicit', 'verlet'], help='integrators to run every scenario with')
+parser.add_argument('--respawn', type=int, default=10, help='ticks after which eaten prey come back')
+parser.add_argument('--dt', type=float, default=2, help='ticks of the rules per step for the integrators other than '
+                                                        'semi-implicit, which always runs with 1 as the reference')
+args = parser.parse_args()
+
+# Headless whatever the environment says
+os.environ['BOIDS_HEADLESS'] = '1'
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+import numpy
+from modules.simulation import *
+
+'''
+Build the scenario with the given seed, kernel backend and integrator.
+'''
+def create(scenario, seed, backend, integrator=integrators.SEMI_IMPLICIT):
+    dt = 1 if integrator == integrators.SEMI_IMPLICIT else args.dt
+    if scenario == 'basic':
+        return BasicSimulation(args.boids, seed=seed, backend=backend, integrator=integrator, dt=dt)
+    if scenario == 'obstacles':
+        return ObstacleSimulation(args.boids, seed=seed, backend=backend, integrator=integrator, dt=dt)
+    return PredatorSimulation(args.boids, seed=seed, backend=backend, integrator=integrator, dt=dt, respawn=args.respawn,
+                              capacity=args.boids)
+
+
+'''
+Run the scenario with the numpy reference and with backend side by side, returns the first tick something went wrong at (None when nothing did), what went wrong and how long each run took.
+'''
+def compare(scenario, seed, backend, integrator):
+    reference = create(scenario, seed, kernels.NUMPY, integrator)
+    checked = create(scenario, seed, backend, integrator)
+    seconds = [0.0, 0.0]
+    pools = [[flock.positions for flock in simulation.flocks()] for simulation in (reference, checked)]
+
+    for tick in range(args.steps):
+        for i, simulation in enumerate((reference, checked)):
+            start = time.time()
+            population = getattr(simulation, 'population', None)
+            if population is not None:
+                # Fill the pool, the prey waiting to respawn keep their places
+                population.spawn(population.capacity, 0)
+            simulation.run(1)
+            seconds[i] += time.time() - start
+
+            if any(flock.positions is not pool for flock, pool in zip(simulation.flocks(), pools[i])):
+                return tick + 1, 'REALLOCATED', seconds
+
+        for expected, actual in zip(reference.flocks(), checked.flocks()):
+            n = expected.count
+            if (actual.count != n or not numpy.array_equal(expected.positions[:n], actual.positions[:n]) or
+                    not numpy.array_equal(expected.velocities[:n], actual.velocities[:n])):
+                return tick + 1, 'DIFFERENT', seconds
+    return None, None, seconds
+
+
+# === main ===
+
+backends = args.backends or [kernels.NUMBA if kernels.numba is not None else kernels.PYTHON]
+failures = 0
+for backend in backends:
+    # A few ticks of every scenario first, so that numba compiles the kernels before anything is timed
+    for scenario in args.scenarios:
+        create(scenario, 0, backend).run(2)
+    for scenario in args.scenarios:
+        for integrator in args.integrators:
+            for seed in args.seeds:
+                tick, problem, (numpy_seconds, backend_seconds) = compare(scenario, seed, backend, integrator)
+                if tick is None:
+                    result = 'same'
+                else:
+                    result = '{0} from tick {1}'.format(problem, tick)
+                    failures += 1
+                print("{0:<7} {1:<10} {2:<13} seed {3:<3} {4} ({5:.2f}s with numpy, {6:.2f}s with {0})".format(
+                    backend, scenario, integrator, seed, result, numpy_seconds, backend_seconds))
+                sys.stdout.flush()
+
+sys.exit(1 if failures else 0)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Check which ticks the renderer (modules.renderer) draws with every=k, ticks with a fraction included (as drawn from
+# the interpolated snapshots of modules.pipeline)
+from __future__ import division  # required in Python 2.7
+# Necessary to import modules with relative path
+import sys, os, os.path as path
+
+# The renderer draws to a screen that nobody sees
+os.environ['BOIDS_HEADLESS'] = '1'
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+import pygame
+from modules.renderer import Renderer
+
+# (every, ticks given to draw in turn, the ones expected to be drawn)
+CASES = [
+    (1, [0, 0.25, 0.5, 0.5, 1, 1.75, 2, 2], [0, 0.25, 0.5, 1, 1.75, 2]),
+    (1, [3.5, 1.25, 1.25], [3.5, 1.25]),
+    (2, [0, 0.5, 1, 1.5, 2, 2.25, 3.9, 4, 4], [0, 2, 4]),
+    (2, [0.75, 1.5, 2.25, 3.0], [0.75, 2.25]),
+    (3, [0.9, 1.2, 2.99, 3.0, 3.5, 6.1], [0.9, 3.0, 6.1]),
+    (2, [4, 4.5, 1, 1.5, 3], [4, 1, 3]),
+    (2, [None, 0.5, None, None], [None, 0.5, None, None]),
+]
+
+pygame.display.init()
+screen = pygame.display.set_mode((64, 64))
+background = pygame.Surface(screen.get_size())
+
+failures = 0
+for every, ticks, expected in CASES:
+    renderer = Renderer(screen, background, pygame.sprite.LayeredDirty(), every)
+    drawn = []
+    for tick in ticks:
+        if renderer.due(tick):
+            drawn.append(tick)
+        renderer.draw(tick)
+    result = 'ok' if drawn == expected else 'WRONG, drew {0}'.format(drawn)
+    failures += drawn != expected
+    print("every {0} ticks {1}: {2}".format(every, ticks, result))
+
+sys.exit(1 if failures else 0)
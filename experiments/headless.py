@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Run the boid experiments without a display, as fast as the CPU allows
+from __future__ import division  # required in Python 2.7
+# Necessary to import modules with relative path
+import sys, os, os.path as path
+import argparse
+import time
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from modules import config
+
+parser = argparse.ArgumentParser(description='Run a boids scenario headless (no window, no images).')
+parser.add_argument('scenario', choices=['basic', 'obstacles', 'predators', 'species'])
+parser.add_argument('--steps', type=int, default=1000, help='number of simulation steps to run')
+parser.add_argument('--boids', type=int, default=None, help='number of boids (prey for the predators scenario, prey and starlings each for the species scenario)')
+parser.add_argument('--seed', type=int, help='seed of the random number generators, for reproducible runs')
+parser.add_argument('--workers', type=int, default=1, help='number of worker processes applying the rules')
+parser.add_argument('--lod', type=float, metavar='NEAR',
+                    help='basic scenario: boids further than NEAR only see each other through cell summaries '
+                         '(approximate, faster from 500 boids on, see modules/lod.py)')
+parser.add_argument('--skin', type=float, metavar='PIXELS',
+                    help='keep Verlet neighbor lists with this skin instead of searching the neighbors every step')
+parser.add_argument('--flow-field', type=float, metavar='RESOLUTION',
+                    help='obstacles scenario: follow paths around the obstacles, on a grid of cells of side RESOLUTION')
+parser.add_argument('--respawn', type=int, metavar='TICKS',
+                    help='predators and species scenarios: boids that get eaten come back after TICKS steps')
+parser.add_argument('--backend', choices=['numpy', 'numba', 'python', 'auto'], default='numpy',
+                    help='how the rules that branch on every boid run, see modules/kernels.py')
+parser.add_argument('--threads', action='store_true', help='use worker threads instead of processes')
+parser.add_argument('--integrator', choices=['euler', 'semi-implicit', 'verlet'],
+                    help='how the boids move over a step, see modules/integrators.py (default semi-implicit)')
+parser.add_argument('--dt', type=float, help='ticks of the rules every step covers, fewer steps are then needed for the '
+                                             'same simulated time (default 1)')
+parser.add_argument('--min-speed', type=float,
+                    help='boids slower than this are pulled towards the middle of the world, 0 turns it off (default 2)')
+parser.add_argument('--width', dest='world_width', type=int, metavar='WIDTH',
+                    help='width of the world (default 1280)')
+parser.add_argument('--height', dest='world_height', type=int, metavar='HEIGHT',
+                    help='height of the world (default 720)')
+parser.add_argument('--record', metavar='PATH', help='record every step to PATH, to replay it with experiments/replay.py')
+parser.add_argument('--keyframe-interval', type=int, default=60,
+                    help='steps between the keyframes of the recording, which a run can be resumed from')
+parser.add_argument('--export', metavar='DIRECTORY', help='export the trajectories of every boid to DIRECTORY')
+parser.add_argument('--chunk-ticks', type=int, default=100, help='ticks per chunk of the exported trajectories')
+# Numbers of boids and obstacles, capacity... from a scenario file, the environment or the command line, the flags above
+# that are settings (--seed, --width...) take priority over the scenario file and the environment
+config.add_arguments(parser, skip=('headless', 'threaded', 'render_every', 'profile', 'seed', 'respawn', 'integrator',
+                                   'dt', 'min_speed', 'world_width', 'world_height'))
+args = parser.parse_args()
+if args.skin is not None and args.workers > 1:
+    parser.error('--skin cannot be combined with --workers')
+if args.skin is not None and args.lod is not None:
+    parser.error('--skin cannot be combined with --lod')
+
+# Headless whatever the environment says, the environment comes before anything configured here
+os.environ['BOIDS_HEADLESS'] = '1'
+config.apply_arguments(args)
+
+from modules.simulation import *
+from modules.export import *
+from modules.recording import *
+
+# === main ===
+
+default_boids = {'basic': 'num_boids', 'obstacles': 'num_boids', 'predators': 'num_prey', 'species': 'num_prey'}
+num_boids = args.boids if args.boids is not None else config.get(default_boids[args.scenario])
+settings = dict(seed=config.get('seed'), skin=args.skin, backend=args.backend, integrator=config.get('integrator'),
+                dt=config.get('dt'), min_speed=config.get('min_speed'))
+
+scenario = {'basic': BasicSimulation, 'obstacles': ObstacleSimulation, 'predators': PredatorSimulation,
+            'species': SpeciesSimulation}[args.scenario]
+if scenario is SpeciesSimulation:
+    simulation = scenario([(PREY, num_boids), (STARLING, num_boids), (PREDATOR, config.get('num_predators'))],
+                          respawn=config.get('respawn'), capacity=config.get('capacity'), **settings)
+elif scenario is PredatorSimulation:
+    simulation = scenario(num_boids, respawn=config.get('respawn'), capacity=config.get('capacity'), **settings)
+elif scenario is BasicSimulation:
+    simulation = scenario(num_boids, workers=args.workers, processes=not args.threads, lod=args.lod, **settings)
+else:
+    simulation = scenario(num_boids, workers=args.workers, processes=not args.threads,
+                          flow_resolution=args.flow_field, **settings)
+
+if args.export:
+    # Never loses a tick, a headless run has nobody waiting on it
+    exporter = TrajectoryExporter(args.export, simulation, args.chunk_ticks, block=True)
+    simulation.on_tick.append(exporter.record)
+
+start = time.time()
+if args.record:
+    recorder = Recorder(args.record, simulation, args.keyframe_interval)
+    recorder.record()
+    for i in range(args.steps):
+        simulation.run(1)
+        recorder.record()
+    recorder.close()
+else:
+    simulation.run(args.steps)
+if args.export:
+    exporter.close()
+elapsed = time.time() - start
+if isinstance(simulation, FlockSimulation):
+    simulation.close()
+
+print("{0}: {1} boids, {2} steps in {3:.2f}s ({4:.1f} steps/s)".format(
+    args.scenario, num_boids, args.steps, elapsed, args.steps / elapsed))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Replay a run recorded with experiments/headless.py --record, without simulating it again
+
+from __future__ import division  # required in Python 2.7
+# Necessary to import modules with relative path
+import sys, os, os.path as path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from modules.recording import *
+from modules.renderer import *
+from modules.camera import *
+from modules.sprites import *
+from modules import config
+
+# === main === (lower_case names)
+
+if len(sys.argv) != 2:
+    print("usage: {0} RECORDING".format(sys.argv[0]))
+    sys.exit(2)
+
+recording = Recording(sys.argv[1])
+
+# --- init ---
+
+pygame.init()
+# The window shows the recorded world, scrolling over it when it is larger than the screen
+world = recording.metadata['width'], recording.metadata['height']
+screen = pygame.display.set_mode(config.window_size(world), pygame.DOUBLEBUF)
+
+# Fill background
+background = pygame.Surface(screen.get_size())
+background = background.convert()
+background.fill(BLACK)
+
+# --- objects ---
+
+# The state of every frame is loaded into a simulation of the recorded scenario, which is then drawn like a live one
+simulation = recording.load(0)
+all_sprites_list = pygame.sprite.LayeredDirty()
+
+# Every species is drawn with the image the experiments draw it with (see boids-with-species.py), by name, and with the
+# boid image when it has none of its own
+renderer = Renderer(screen, background, all_sprites_list)
+# WASD scroll, the mouse wheel and + and - zoom (Home goes back to the first frame rather than showing the whole world)
+camera = Camera(screen.get_width(), screen.get_height(), *world)
+boid_image = "experiments/resources/img/boid.png"
+images = {'starling': "experiments/resources/img/starling.png", 'predator': "experiments/resources/img/predator.png"}
+for flock in simulation.flocks():
+    paths = [images.get(species.name, boid_image) for species in flock.species_list] or [boid_image]
+    renderer.add_flock(flock, paths if len(paths) > 1 else paths[0])
+
+obstacles = getattr(simulation, 'obstacles', [])
+all_sprites_list.add(obstacle_sprites(obstacles))
+
+clock = pygame.time.Clock()
+running = True
+# Frame shown and whether the replay is paused
+index = 0
+paused = False
+
+# Clear old sprites and replace with background
+all_sprites_list.clear(screen, background)
+
+# --- mainloop ---
+
+while running:
+
+    # --- events ---
+
+    for event in pygame.event.get():
+        home = event.type == pygame.KEYDOWN and event.key == pygame.K_HOME
+        if not home and camera.handle(event):
+            continue
+        if event.type == pygame.QUIT:
+            running = False
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                running = False
+            elif event.key == pygame.K_SPACE:
+                paused = not paused
+            # Scrub one frame with the left and right arrows, a second with the up and down arrows
+            elif event.key == pygame.K_RIGHT:
+                index += 1
+                paused = True
+            elif event.key == pygame.K_LEFT:
+                index -= 1
+                paused = True
+            elif event.key == pygame.K_UP:
+                index += 60
+            elif event.key == pygame.K_DOWN:
+                index -= 60
+            elif event.key == pygame.K_HOME:
+                index = 0
+
+    # Pick up the frames recorded since the last one shown, the recording may still be going on
+    if index >= len(recording) - 1:
+        recording.refresh()
+    index = max(0, min(index, len(recording) - 1))
+
+    text = "Replay: frame {0}/{1} tick {2}{3}".format(
+        index + 1, len(recording), recording.ticks[index], " (paused)" if paused else "")
+    pygame.display.set_caption(text)
+
+    # --- updates ---
+
+    recording.load(index, simulation)
+    if not paused:
+        index += 1
+
+    # New obstacles replace the old ones on screen
+    if hasattr(simulation, 'obstacles') and simulation.obstacles is not obstacles:
+        all_sprites_list.remove(obstacle_sprites(obstacles))
+        obstacles = simulation.obstacles
+        all_sprites_list.add(obstacle_sprites(obstacles))
+
+    # --- draws ---
+
+    # Create list of dirty rects
+    rects = renderer.draw(simulation.ticks, camera.view(), camera.zoom)
+
+    # Go ahead and update the screen with what we've drawn.
+    pygame.display.update(rects)
+
+    # Used to manage how fast the screen updates
+    clock.tick(60)
+
+# --- the end ---
+pygame.quit()
+sys.exit()
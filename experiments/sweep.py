@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# coding=utf-8
+# Run a scenario headless for many combinations of species parameters and collect summary metrics of every run
+from __future__ import division  # required in Python 2.7
+# Necessary to import modules with relative path
+import sys, os, os.path as path
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+from timeit import default_timer
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+# Species whose parameters a sweep can change, by scenario. Parameters without a species prefix change the first one.
+SWEPT_SPECIES = {
+    'basic': ('boid',),
+    'obstacles': ('boid',),
+    'predators': ('prey', 'predator'),
+}
+
+# Metrics for which lower is better, the summary ranks them from the lowest up by default
+LOWER_IS_BETTER = ('goal_distance', 'collisions')
+
+'''
+Split "species.parameter" into its two parts, the species defaulting to the first one of the scenario.
+'''
+def split_name(scenario, name):
+    species, dot, parameter = name.rpartition('.')
+    species = species or SWEPT_SPECIES[scenario][0]
+    if species not in SWEPT_SPECIES[scenario]:
+        raise ValueError("The {0} scenario has no {1} species".format(scenario, species))
+    return species, parameter
+
+
+'''
+Every combination of the values of grid, a list of (name, values).
+'''
+def grid_runs(grid):
+    names = [name for name, values in grid]
+    for values in itertools.product(*[values for name, values in grid]):
+        yield dict(zip(names, values))
+
+
+'''
+count combinations drawn uniformly from ranges, a list of (name, low, high), using the random generator rng.
+'''
+def random_runs(ranges, count, rng):
+    for i in range(count):
+        yield dict((name, float(rng.uniform(low, high))) for name, low, high in ranges)
+
+
+'''
+Key identifying a run in the results cache: a hash of everything that changes its outcome.
+'''
+def run_key(run):
+    settings = dict((name, value) for name, value in run.items() if name != 'key')
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+'''
+Run a single simulation of the sweep and return its summary metrics. Runs in the worker processes of the pool.
+'''
+def run_case(run):
+    sys.path.append(ROOT)
+    from modules import metrics, simulation
+
+    start = default_timer()
+    try:
+        species = {}
+        for name, base in (('boid', simulation.BOID), ('prey', simulation.PREY), ('predator', simulation.PREDATOR)):
+            species[name] = [getattr(base, parameter) for parameter in simulation.PARAMETERS]
+        if run['scenario'] == 'obstacles':
+            species['boid'] = [getattr(simulation.CAUTIOUS_BOID, parameter) for parameter in simulation.PARAMETERS]
+        for name, value in run['parameters'].items():
+            kind, parameter = split_name(run['scenario'], name)
+            species[kind][simulation.PARAMETERS.index(parameter)] = value
+        species = dict((name, simulation.Species(*values, name=name)) for name, values in species.items())
+
+        world = {'width': run['width'], 'height': run['height'], 'seed': run['seed']}
+        if run['scenario'] == 'basic':
+            sim = simulation.BasicSimulation(run['boids'], species['boid'], **world)
+        elif run['scenario'] == 'obstacles':
+            sim = simulation.ObstacleSimulation(run['boids'], run['obstacles'], species['boid'], **world)
+        else:
+            sim = simulation.PredatorSimulation(run['boids'], run['predators'], species['prey'], species['predator'], **world)
+        flock = sim.flocks()[0]
+
+        # Let the flock settle, then average the metrics over the remaining ticks
+        sim.run(run['warmup'])
+        samples = []
+        for i in range(run['ticks'] - run['warmup']):
+            sim.run(1)
+            sample = {
+                'polarisation': metrics.polarisation(flock),
+                'cohesion_radius': metrics.cohesion_radius(flock),
+                'mean_speed': metrics.mean_speed(flock),
+            }
+            if run['scenario'] == 'obstacles':
+                sample['goal_distance'] = metrics.distance_to(flock, sim.goal_x, sim.goal_y)
+                sample['collisions'] = metrics.collision_fraction(flock, sim.obstacle_field)
+            samples.append(sample)
+
+        result = dict((name, sum(sample[name] for sample in samples) / len(samples)) for name in samples[0]) if samples else {}
+        if run['scenario'] == 'predators':
+            result['prey_left'] = flock.count
+            # Prey eaten per 1000 ticks
+            result['kill_rate'] = 1000 * (run['boids'] - flock.count) / run['ticks']
+        if hasattr(sim, 'close'):
+            sim.close()
+    except Exception as error:
+        return dict(run, error=repr(error))
+
+    return dict(run, metrics=result, seconds=default_timer() - start)
+
+
+'''
+Read the results cache, returns the results of the runs that finished by key.
+'''
+def load_results(filename):
+    results = {}
+    if not path.exists(filename):
+        return results
+
+    with open(filename) as cache:
+        for line in cache:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # Last line of a sweep that was killed while writing it
+                continue
+            if 'error' not in result:
+                results[result['key']] = result
+    return results
+
+
+'''
+Parse "name=a,b,c" into (name, [a, b, c]).
+'''
+def grid_argument(text):
+    name, values = text.split('=', 1)
+    return name, [float(value) for value in values.split(',')]
+
+
+'''
+Parse "name=low:high" into (name, low, high).
+'''
+def range_argument(text):
+    name, bounds = text.split('=', 1)
+    low, high = bounds.split(':')
+    return name, float(low), float(high)
+
+
+# === main ===
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Sweep the species parameters of a scenario over many headless runs.',
+        epilog='Parameters are named after modules.species.PARAMETERS, e.g. cohesion_weight or field_of_view, '
+               'prefixed with the species for the predators scenario (prey.field_of_view, predator.max_speed).')
+    parser.add_argument('scenario', choices=['basic', 'obstacles', 'predators'])
+    parser.add_argument('--grid', nargs='+', type=grid_argument, default=[], metavar='NAME=V1,V2,...',
+                        help='run every combination of these values')
+    parser.add_argument('--random', type=int, metavar='RUNS', help='run RUNS combinations drawn from --range instead')
+    parser.add_argument('--range', nargs='+', type=range_argument, default=[], metavar='NAME=LOW:HIGH',
+                        help='ranges to draw the --random combinations from')
+    parser.add_argument('--sample-seed', type=int, default=0, help='seed used to draw the --random combinations')
+    parser.add_argument('--seeds', type=int, default=1, help='number of runs with different seeds per combination')
+    parser.add_argument('--ticks', type=int, default=600, help='ticks per run')
+    parser.add_argument('--warmup', type=int, default=300, help='ticks run before measuring')
+    parser.add_argument('--boids', type=int, default=None, help='number of boids (prey for the predators scenario)')
+    parser.add_argument('--width', dest='world_width', type=int, metavar='WIDTH',
+                        help='width of the world (default 1280)')
+    parser.add_argument('--height', dest='world_height', type=int, metavar='HEIGHT',
+                        help='height of the world (default 720)')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(), help='number of runs at once')
+    parser.add_argument('--results', default='sweep.jsonl',
+                        help='results cache, one JSON line per run. Runs already in it are not run again')
+    parser.add_argument('--sort', default='polarisation', help='metric to rank the parameters by in the summary')
+    parser.add_argument('--order', choices=['best', 'ascending', 'descending'], default='best',
+                        help='order to rank the parameters in: best first (lowest first for {0}, highest first for the '
+                             'others), ascending or descending'.format(', '.join(LOWER_IS_BETTER)))
+    parser.add_argument('--top', type=int, default=10, help='number of best parameters to print')
+    # Numbers of boids, obstacles and predators and size of the world from a scenario file, the environment or the
+    # command line. Every run gets them from here, the worker processes do not read any settings.
+    sys.path.append(ROOT)
+    from modules import config
+    config.add_arguments(parser, only=('num_boids', 'num_obstacles', 'num_prey', 'num_predators'))
+    args = parser.parse_args()
+
+    # Headless whatever the environment says, the environment comes before anything configured here
+    os.environ['BOIDS_HEADLESS'] = '1'
+    config.apply_arguments(args)
+    import numpy
+    from modules.species import PARAMETERS
+
+    for name in [name for name, values in args.grid] + [name for name, low, high in args.range]:
+        try:
+            species, parameter = split_name(args.scenario, name)
+        except ValueError as error:
+            parser.error(str(error))
+        if parameter not in PARAMETERS:
+            parser.error("unknown parameter {0}".format(name))
+
+    if args.random:
+        combinations = list(random_runs(args.range, args.random, numpy.random.RandomState(args.sample_seed)))
+    else:
+        combinations = list(grid_runs(args.grid))
+
+    boids = args.boids
+    if boids is None:
+        boids = config.get('num_prey' if args.scenario == 'predators' else 'num_boids')
+    width, height = config.world_size()
+    runs = []
+    for parameters in combinations:
+        for seed in range(args.seeds):
+            run = {
+                'scenario': args.scenario,
+                'parameters': parameters,
+                'seed': seed,
+                'ticks': args.ticks,
+                'warmup': min(args.warmup, args.ticks - 1),
+                'boids': boids,
+                'obstacles': config.get('num_obstacles'),
+                'predators': config.get('num_predators'),
+                'width': width,
+                'height': height,
+            }
+            run['key'] = run_key(run)
+            runs.append(run)
+
+    results = load_results(args.results)
+    todo = [run for run in runs if run['key'] not in results]
+    print("{0} runs, {1} already in {2}, {3} to go".format(len(runs), len(runs) - len(todo), args.results, len(todo)))
+    sys.stdout.flush()
+
+    # Results are appended as they come in, a sweep that gets interrupted picks up where it stopped
+    start = default_timer()
+    pool = multiprocessing.Pool(args.processes)
+    try:
+        with open(args.results, 'a') as cache:
+            for done, result in enumerate(pool.imap_unordered(run_case, todo), 1):
+                cache.write(json.dumps(result, sort_keys=True) + '\n')
+                cache.flush()
+                if 'error' in result:
+                    print("run {0} failed: {1}".format(result['parameters'], result['error']))
+                else:
+                    results[result['key']] = result
+                if done % 10 == 0 or done == len(todo):
+                    elapsed = default_timer() - start
+                    print("{0}/{1} runs, {2:.1f} runs/s".format(done, len(todo), done / elapsed))
+                    sys.stdout.flush()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    # Average the metrics over the seeds of every combination and print the best ones
+    by_parameters = {}
+    for run in runs:
+        result = results.get(run['key'])
+        if result is not None:
+            by_parameters.setdefault(json.dumps(run['parameters'], sort_keys=True), []).append(result['metrics'])
+
+    summary = []
+    for parameters, measured in by_parameters.items():
+        average = dict((name, sum(metrics[name] for metrics in measured) / len(measured)) for name in measured[0])
+        summary.append((parameters, average))
+    summary = [(parameters, average) for parameters, average in summary if args.sort in average]
+    ascending = args.order == 'ascending' or (args.order == 'best' and args.sort in LOWER_IS_BETTER)
+    summary.sort(key=lambda item: item[1][args.sort], reverse=not ascending)
+
+    print("\nTop {0} by {1}, {2} first:".format(min(args.top, len(summary)), args.sort,
+                                               'lowest' if ascending else 'highest'))
+    for parameters, average in summary[:args.top]:
+        metrics = ', '.join('{0} {1:.3f}'.format(name, value) for name, value in sorted(average.items()))
+        print("{0}  {1}".format(parameters, metrics))
@@ -1,3 +1,20 @@
 # coding=utf-8
-import pygame
-from pygame.locals import *
+import importlib
+
+
+class _LazyModule(object):
+    '''
+    Stands in for a module that is only imported the first time one of its attributes is used.
+    '''
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+# pygame is only imported once something draws (or asks for the size of the screen), simulations alone never import it
+pygame = _LazyModule('pygame')
@@ -8,28 +8,38 @@ import random
 from operator import itemgetter
 
 from modules.constants import *
+from modules import config
+from modules import surface_cache
 
 # Cohesion, separation, alignment, and update methods and basic boid class design initially based off of http://www.coderholic.com/boids/
 # Boid behavior algorithms and velocity normalization largely from http://www.vergenet.net/~conrad/boids/pseudocode.html
 
 class Boid(pygame.sprite.DirtySprite):
     def __init__(self, x, y, cohesion_weight, alignment_weight, separation_weight,
-                 obstacle_avoidance_weight, goal_weight, field_of_view, max_speed, image):
+                 obstacle_avoidance_weight, goal_weight, field_of_view, max_speed, image=None, rng=random):
         # super(Boid, self).__init__()
         pygame.sprite.DirtySprite.__init__(self)
 
-        # Load image as sprite
-        self.image = pygame.image.load(image).convert_alpha()
+        # Source of randomness, pass a seeded random.Random for reproducible runs
+        self.rng = rng
 
-        # Fetch the rectangle object that has the dimensions of the image
-        self.rect = self.image.get_rect()
+        if image is None:
+            # Headless boid, nothing to draw so only keep a rectangle the size of the boid image
+            self.image = None
+            self.rect = pygame.Rect(0, 0, 10, 10)
+        else:
+            # Load image as sprite, shared with every other boid using the same image
+            self.image = surface_cache.load(image)
+
+            # Fetch the rectangle object that has the dimensions of the image
+            self.rect = self.image.get_rect()
 
         # Coordinates
         self.rect.x = x
         self.rect.y = y
 
-        self.velocityX = random.randint(1, 10) / 10.0
-        self.velocityY = random.randint(1, 10) / 10.0
+        self.velocityX = rng.randint(1, 10) / 10.0
+        self.velocityY = rng.randint(1, 10) / 10.0
 
         # === Attributes ===
 
@@ -161,33 +171,29 @@ class Boid(pygame.sprite.DirtySprite):
             distance = math.sqrt(dist_x * dist_x + dist_y * dist_y)
             target_ids.append([target, distance])
 
-        # Create an list holding the prey furthest from the center of mass of its flock
-        target_id = sorted(target_ids, key=itemgetter(0))
+        # Find the prey furthest from the center of mass of its flock
+        target = max(target_ids, key=itemgetter(1))[0]
         del target_ids
 
         # Update velocity with vector on intercept with where the prey the furthest from the center of mass of the prey flock is going.
-        self.velocityX += ((target_id[0][0].rect.x +
-                            (target_id[0][0].velocityX * 2)) - self.rect.x) / self.goal_weight
-        self.velocityY += ((target_id[0][0].rect.y +
-                            (target_id[0][0].velocityY * 2)) - self.rect.y) / self.goal_weight
-
-        del target_id
+        self.velocityX += ((target.rect.x + (target.velocityX * 2)) - self.rect.x) / self.goal_weight
+        self.velocityY += ((target.rect.y + (target.velocityY * 2)) - self.rect.y) / self.goal_weight
 
     '''
     Prey behavior, avoid the predator by moving in opposite direction of projected predator location. Move in a direction randomized a little from that so that the predator does not just need to outrun the prey in a straight line.
     '''
     def flee(self, predator):
         self.velocityX += -(((predator.rect.x + (2 * predator.velocityX)) - self.rect.x) /
-                            self.obstacle_avoidance_weight) * random.randint(1, 2)
+                            self.obstacle_avoidance_weight) * self.rng.randint(1, 2)
         self.velocityY += -(((predator.rect.y + (2 * predator.velocityY)) - self.rect.y) /
-                            self.obstacle_avoidance_weight) * random.randint(1, 2)
+                            self.obstacle_avoidance_weight) * self.rng.randint(1, 2)
 
     '''
     Update velocity to move boid towards middle of window.
     '''
     def go_to_middle(self):
-        self.velocityX += (SCREEN_WIDTH / 2 - self.rect.x) / 150
-        self.velocityY += (SCREEN_HEIGHT / 2 - self.rect.y) / 150
+        self.velocityX += (config.world_size()[0] / 2 - self.rect.x) / 150
+        self.velocityY += (config.world_size()[1] / 2 - self.rect.y) / 150
 
     '''
     Normalizes the velocity vector with respect to the maximum speed.
@@ -206,23 +212,23 @@ class Boid(pygame.sprite.DirtySprite):
         if wrap:
             # If we leave the screen we reappear on the other side.
             if self.rect.x < 0 and self.velocityX < 0:
-                self.rect.x = SCREEN_WIDTH
-            if self.rect.x > SCREEN_WIDTH and self.velocityX > 0:
+                self.rect.x = config.world_size()[0]
+            if self.rect.x > config.world_size()[0] and self.velocityX > 0:
                 self.rect.x = 0
             if self.rect.y < 0 and self.velocityY < 0:
-                self.rect.y = SCREEN_HEIGHT
-            if self.rect.y > SCREEN_HEIGHT and self.velocityY > 0:
+                self.rect.y = config.world_size()[1]
+            if self.rect.y > config.world_size()[1] and self.velocityY > 0:
                 self.rect.y = 0
         # Bounce off the walls to stay on screen. We lose a random amount of velocity along the axis we collided on.
         else:
             if self.rect.x < 0 and self.velocityX < 0:
-                self.velocityX = -self.velocityX * random.random()
-            if self.rect.x > SCREEN_WIDTH and self.velocityX > 0:
-                self.velocityX = -self.velocityX * random.random()
+                self.velocityX = -self.velocityX * self.rng.random()
+            if self.rect.x > config.world_size()[0] and self.velocityX > 0:
+                self.velocityX = -self.velocityX * self.rng.random()
             if self.rect.y < 0 and self.velocityY < 0:
-                self.velocityY = -self.velocityY * random.random()
-            if self.rect.y > SCREEN_HEIGHT and self.velocityY > 0:
-                self.velocityY = -self.velocityY * random.random()
+                self.velocityY = -self.velocityY * self.rng.random()
+            if self.rect.y > config.world_size()[1] and self.velocityY > 0:
+                self.velocityY = -self.velocityY * self.rng.random()
 
         # Go to middle if the boid is not moving much.
         if abs(math.sqrt(self.velocityX**2 + self.velocityY**2)) < 2:
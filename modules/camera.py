@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+
+from modules.constants import *
+
+# Steps (notches of the mouse wheel, key presses) for the zoom to double. The zoom is 2 ** (level / ZOOM_STEPS) for a
+# whole level, so the same few zooms come back and their scaled images stay cached (see modules.surface_cache).
+ZOOM_STEPS = 4
+
+
+class Camera(object):
+    '''
+    Part of a world larger than the screen that is shown on screen.
+
+    The camera looks at the point (x, y) of the world, zoom screen pixels per world pixel. view() is the rect of the world that is on screen, which is all a Renderer turns into draw calls (see Renderer.draw): boids outside of it cost no drawing at all, however large the world. The view never goes past the edges of the world, a world smaller than the view is centered. The zoom goes from showing the whole world (never more than 1) to max_zoom.
+
+    handle moves the camera with the keyboard and mouse: WASD scroll by a quarter of the screen, the mouse wheel zooms in and out around the mouse pointer, + and - around the middle of the screen, and Home shows the whole world.
+    '''
+    def __init__(self, screen_width, screen_height, world_width, world_height, max_zoom=4):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.world_width = world_width
+        self.world_height = world_height
+
+        # Zoom of the whole world on screen, and the range of zoom levels (zoom 2 ** (level / ZOOM_STEPS))
+        self.min_zoom = min(1, screen_width / world_width, screen_height / world_height)
+        self.min_level = int(math.floor(math.log(self.min_zoom, 2) * ZOOM_STEPS + 1e-9))
+        self.max_level = int(round(math.log(max_zoom, 2) * ZOOM_STEPS))
+        self.level = 0
+
+        # Point of the world in the middle of the screen
+        self.x = world_width / 2
+        self.y = world_height / 2
+
+    @property
+    def zoom(self):
+        return max(2 ** (self.level / ZOOM_STEPS), self.min_zoom)
+
+    '''
+    Rect of the world on screen, a pygame.Rect.
+    '''
+    def view(self):
+        width = self.screen_width / self.zoom
+        height = self.screen_height / self.zoom
+        return pygame.Rect(int(round(self.x - width / 2)), int(round(self.y - height / 2)), int(math.ceil(width)),
+                           int(math.ceil(height)))
+
+    '''
+    Keep the view inside the world.
+    '''
+    def clamp(self):
+        half_width = self.screen_width / self.zoom / 2
+        half_height = self.screen_height / self.zoom / 2
+        if 2 * half_width >= self.world_width:
+            self.x = self.world_width / 2
+        else:
+            self.x = min(max(self.x, half_width), self.world_width - half_width)
+        if 2 * half_height >= self.world_height:
+            self.y = self.world_height / 2
+        else:
+            self.y = min(max(self.y, half_height), self.world_height - half_height)
+
+    '''
+    Point of the world at the point (x, y) of the screen.
+    '''
+    def to_world(self, x, y):
+        view = self.view()
+        return view.left + x / self.zoom, view.top + y / self.zoom
+
+    '''
+    Point of the screen at the point (x, y) of the world.
+    '''
+    def to_screen(self, x, y):
+        view = self.view()
+        return (x - view.left) * self.zoom, (y - view.top) * self.zoom
+
+    '''
+    Scroll by (dx, dy) pixels of the screen.
+    '''
+    def pan(self, dx, dy):
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self.clamp()
+
+    '''
+    Zoom in by steps levels (out when negative), keeping the point (x, y) of the screen (the middle by default) over the same point of the world.
+    '''
+    def zoom_by(self, steps, x=None, y=None):
+        if x is None or y is None:
+            x, y = self.screen_width / 2, self.screen_height / 2
+        world_x, world_y = self.to_world(x, y)
+        self.level = min(max(self.level + steps, self.min_level), self.max_level)
+        self.x = world_x - (x - self.screen_width / 2) / self.zoom
+        self.y = world_y - (y - self.screen_height / 2) / self.zoom
+        self.clamp()
+
+    '''
+    Show the whole world.
+    '''
+    def show_all(self):
+        self.level = self.min_level
+        self.x = self.world_width / 2
+        self.y = self.world_height / 2
+
+    '''
+    Move the camera for the pygame event if it is one of its controls, returns whether it was.
+    '''
+    def handle(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button in (4, 5):
+            # Mouse wheel, up zooms in
+            self.zoom_by(1 if event.button == 4 else -1, *event.pos)
+            return True
+        if event.type != pygame.KEYDOWN:
+            return False
+
+        quarter_x = self.screen_width / 4
+        quarter_y = self.screen_height / 4
+        moves = {pygame.K_w: (0, -quarter_y), pygame.K_s: (0, quarter_y), pygame.K_a: (-quarter_x, 0),
+                 pygame.K_d: (quarter_x, 0)}
+        if event.key in moves:
+            self.pan(*moves[event.key])
+        elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+            self.zoom_by(1)
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self.zoom_by(-1)
+        elif event.key == pygame.K_HOME:
+            self.show_all()
+        else:
+            return False
+        return True
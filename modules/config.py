@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import json
+import os
+
+from modules import constants, integrators
+
+# Settings of a run. Each one comes from, by increasing priority: its default below, a scenario file (JSON object of
+# settings, see load), the environment variable BOIDS_<NAME> (BOIDS_NUM_BOIDS=500) and the command line
+# (--num-boids 500, see add_arguments). Nothing is looked up before it is asked for, and the display is only queried
+# for the size of the world when it is not given and not headless, so importing the simulation never touches pygame.
+SETTINGS = (
+    # Name, type, default, help
+    ('headless', bool, False, 'run without a display, the world is then 1280x720 unless given'),
+    ('world_width', int, None, 'width of the world, the width of the screen by default, the window scrolls over wider '
+                               'worlds'),
+    ('world_height', int, None, 'height of the world, the height of the screen (less 40 pixels) by default, the window '
+                                'scrolls over higher worlds'),
+    ('num_boids', int, constants.NUM_BOIDS, 'number of boids of the basic and obstacles scenarios'),
+    ('num_prey', int, constants.NUM_PREY, 'number of prey of the predators scenario'),
+    ('num_predators', int, constants.NUM_PREDATORS, 'number of predators of the predators scenario'),
+    ('num_obstacles', int, constants.NUM_OBSTACLES, 'number of obstacles of the obstacles scenario'),
+    ('seed', int, None, 'seed of the random number generators, for reproducible runs'),
+    ('respawn', int, None, 'ticks after which boids that get eaten come back, never by default'),
+    ('capacity', int, None, 'most boids that can be alive at once in a flock that boids are spawned into, room for '
+                            'twice as many as at first by default in the experiments'),
+    ('integrator', str, integrators.SEMI_IMPLICIT, 'how the boids move over a tick: one of ' +
+                                                   ', '.join(integrators.INTEGRATORS)),
+    ('dt', float, 1.0, 'ticks of the rules every tick covers, larger runs fewer ticks per simulated second'),
+    ('min_speed', float, 2.0, 'boids slower than this are pulled towards the middle of the world, 0 turns it off'),
+    ('threaded', bool, False, 'run the simulation of the experiments on a thread of its own and draw interpolated '
+                              'snapshots of it, so that slow frames and slow ticks do not hold each other up'),
+    ('render_every', int, 1, 'only draw every N-th tick in the experiments'),
+    ('profile', str, '0', 'profile the experiments: 1 shows the profiler overlay (F3), a .csv or .json file also '
+                          'saves the frame times to it on exit'),
+)
+TYPES = dict((name, kind) for name, kind, default, help in SETTINGS)
+DEFAULTS = dict((name, default) for name, kind, default, help in SETTINGS)
+
+# Size of the screen headless, and so of the world when none is given
+HEADLESS_WORLD = (1280, 720)
+
+# Settings given by a scenario file or the command line, the names of those given on the command line (they take
+# priority over the environment) and the size of the screen once queried
+_settings = {}
+_from_command_line = set()
+_screen_size = None
+
+
+'''
+Convert value (a string from the environment or a value from a scenario file) to the type of the setting name.
+'''
+def _convert(name, value):
+    if value is None:
+        return None
+    if TYPES[name] is bool and not isinstance(value, bool):
+        return str(value).lower() not in ('', '0', 'false', 'no')
+    return TYPES[name](value)
+
+
+'''
+Set settings, by name.
+'''
+def configure(**settings):
+    for name, value in settings.items():
+        if name not in TYPES:
+            raise ValueError("Unknown setting {0}, expected one of {1}".format(name, ', '.join(sorted(TYPES))))
+        _settings[name] = _convert(name, value)
+
+    if get('headless'):
+        # Make sure SDL does not try to open a window if anything initializes the display anyway
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+
+'''
+Read the settings of the scenario file at path, a JSON object such as {"num_boids": 500, "world_width": 4000}.
+'''
+def load(path):
+    with open(path) as scenario:
+        settings = json.load(scenario)
+    if not isinstance(settings, dict):
+        raise ValueError("{0} should hold a JSON object of settings".format(path))
+    configure(**dict((str(name), value) for name, value in settings.items()))
+
+
+'''
+Value of the setting name.
+'''
+def get(name):
+    if name not in TYPES:
+        raise ValueError("Unknown setting {0}".format(name))
+
+    variable = 'BOIDS_' + name.upper()
+    if variable in os.environ and name not in _from_command_line:
+        return _convert(name, os.environ[variable])
+    return _settings.get(name, DEFAULTS[name])
+
+
+'''
+Size of the screen as (width, height), less 40 pixels of height for the title bar and task bar. This needs the display: it is only queried the first time, or headless it is HEADLESS_WORLD.
+'''
+def screen_size():
+    global _screen_size
+    if get('headless'):
+        return HEADLESS_WORLD
+
+    if _screen_size is None:
+        from modules import pygame
+        initialized = pygame.display.get_init()
+        if not initialized:
+            pygame.display.init()
+        info = pygame.display.Info()
+        _screen_size = info.current_w, info.current_h - 40
+        if not initialized:
+            pygame.display.quit()
+    return _screen_size
+
+
+'''
+Size of the world as (width, height). Unless it was given this is the size of the screen (see screen_size).
+'''
+def world_size():
+    width, height = get('world_width'), get('world_height')
+    if width is not None and height is not None:
+        return width, height
+
+    default = screen_size()
+    return width if width is not None else default[0], height if height is not None else default[1]
+
+
+'''
+Size of a window showing a world of size world (the configured one by default): the world, or the screen along the sides where the world is larger. A Camera then moves over the world (see modules.camera).
+'''
+def window_size(world=None):
+    width, height = world or world_size()
+    screen_width, screen_height = screen_size()
+    return min(width, screen_width), min(height, screen_height)
+
+
+'''
+Add a --scenario-file flag and a flag for every setting (--num-boids, --world-width, --headless...) to the argparse parser. Settings that the program already has a flag for (names of the flag without the dashes, e.g. 'seed') are skipped, and with only given the settings not in it are as well. The flags of the program that have the name of a setting as their dest and None as their default are applied by apply_arguments like those added here.
+'''
+def add_arguments(parser, skip=(), only=None):
+    parser.add_argument('--scenario-file', metavar='PATH', help='JSON file of settings, e.g. {"num_boids": 500}')
+    for name, kind, default, help in SETTINGS:
+        if name in skip or (only is not None and name not in only):
+            continue
+        flag = '--' + name.replace('_', '-')
+        if kind is bool:
+            parser.add_argument(flag, action='store_true', default=None, help=help)
+        else:
+            parser.add_argument(flag, type=kind, metavar=name.split('_')[-1].upper(), help=help)
+
+
+'''
+Apply the settings parsed by a parser set up with add_arguments: the scenario file first, then the flags that were given.
+'''
+def apply_arguments(args):
+    if args.scenario_file:
+        load(args.scenario_file)
+
+    given = {}
+    for name in TYPES:
+        value = getattr(args, name, None)
+        if value is not None:
+            given[name] = value
+    configure(**given)
+    _from_command_line.update(given)
+
+
+'''
+Parse the command line of a program that only takes settings, described by description, and apply them.
+'''
+def parse_command_line(description, argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description=description)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    apply_arguments(args)
+    return args
+
+
+if os.environ.get('BOIDS_HEADLESS', '0') not in ('', '0'):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
@@ -2,13 +2,10 @@
 # coding=utf-8
 from modules import pygame
 
-pygame.init()
-flags = pygame.DOUBLEBUF
-# === constants ===
+# Plain values only: importing this never initializes pygame or queries the display. The size of the world and the
+# numbers of boids of a run are settings, see modules.config, the numbers below are their defaults.
 
-infoObject = pygame.display.Info()
-SCREEN_WIDTH, SCREEN_HEIGHT = pygame.display.Info().current_w, pygame.display.Info().current_h - 40
-pygame.quit()
+# === constants ===
 
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
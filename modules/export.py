@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import json
+import os
+import os.path as path
+import threading
+
+try:
+    import queue
+except ImportError:
+    # Python 2
+    import Queue as queue
+
+import numpy
+
+# Columns of a trajectory chunk and their types. There is one row per boid per tick: the tick, the index of the flock in
+# Simulation.flocks(), the id of the boid in its flock (Flock.ids, the same at every tick, so selecting a flock and an id
+# gives the trajectory of one boid), its species, position and velocity.
+COLUMNS = (('tick', numpy.int64), ('flock', numpy.int8), ('id', numpy.int64), ('species', numpy.int16),
+           ('x', numpy.float32), ('y', numpy.float32), ('vx', numpy.float32), ('vy', numpy.float32))
+
+
+class TrajectoryExporter(object):
+    '''
+    Streams the state of every boid at every tick to directory, for offline analysis.
+
+    Hook it into the step loop with simulation.on_tick.append(exporter.record). Every chunk_ticks ticks the rows gathered so far are handed to a background thread which writes them as one .npy file per column (chunk_000000/x.npy, ...) and lists the chunk in manifest.json. The simulation thread only copies the arrays of the tick.
+
+    The queue between the two holds at most queue_size chunks so that a slow disk cannot eat all the memory. When it is full, block=False (the default) drops the chunk rather than stall the simulation; the ticks lost are listed in the manifest. block=True waits for the writer instead and never loses a tick.
+    '''
+    def __init__(self, directory, simulation, chunk_ticks=100, queue_size=8, block=False):
+        self.directory = directory
+        self.simulation = simulation
+        self.chunk_ticks = chunk_ticks
+        self.block = block
+
+        if not path.isdir(directory):
+            os.makedirs(directory)
+
+        # Columns of the ticks of the current chunk, one list of arrays per column
+        self.rows = dict((name, []) for name, dtype in COLUMNS)
+        self.ticks = 0
+        self.first_tick = None
+        self.chunks = 0
+
+        self.manifest = {
+            'scenario': type(simulation).__name__,
+            'width': simulation.width,
+            'height': simulation.height,
+            'seed': simulation.seed,
+            'timestep': simulation.timestep,
+            'integrator': simulation.integrator,
+            'dt': simulation.dt,
+            'min_speed': simulation.min_speed,
+            'columns': [(name, numpy.dtype(dtype).str) for name, dtype in COLUMNS],
+            'chunks': [],
+            # First and last tick of every chunk that was dropped because the writer could not keep up
+            'dropped': [],
+        }
+
+        # The manifest is updated by both threads
+        self.lock = threading.Lock()
+        # Exception raised in the writer thread, raised again by record or close
+        self.error = None
+        self.queue = queue.Queue(queue_size)
+        self.writer = threading.Thread(target=self._write_chunks)
+        self.writer.daemon = True
+        self.writer.start()
+
+    '''
+    Add the state of the simulation at the current tick to the export.
+    '''
+    def record(self):
+        if self.error is not None:
+            raise self.error
+
+        tick = self.simulation.ticks
+        if self.ticks == 0:
+            self.first_tick = tick
+        for i, flock in enumerate(self.simulation.flocks()):
+            n = flock.count
+            self.rows['tick'].append(numpy.full(n, tick, dtype=numpy.int64))
+            self.rows['flock'].append(numpy.full(n, i, dtype=numpy.int8))
+            self.rows['id'].append(flock.ids[:n].copy())
+            self.rows['species'].append(flock.species[:n].copy())
+            self.rows['x'].append(flock.positions[:n, 0].astype(numpy.float32))
+            self.rows['y'].append(flock.positions[:n, 1].astype(numpy.float32))
+            self.rows['vx'].append(flock.velocities[:n, 0].astype(numpy.float32))
+            self.rows['vy'].append(flock.velocities[:n, 1].astype(numpy.float32))
+
+        self.ticks += 1
+        if self.ticks == self.chunk_ticks:
+            self.flush()
+
+    '''
+    Hand the rows gathered so far to the writer as a chunk.
+    '''
+    def flush(self):
+        if self.ticks == 0:
+            return
+
+        chunk = self.chunks, self.first_tick, self.simulation.ticks, self.rows
+        self.rows = dict((name, []) for name, dtype in COLUMNS)
+        self.ticks = 0
+        self.chunks += 1
+
+        try:
+            self.queue.put(chunk, self.block)
+        except queue.Full:
+            with self.lock:
+                self.manifest['dropped'].append(chunk[1:3])
+
+    def _write_chunks(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                return
+            if self.error is not None:
+                continue
+
+            number, first_tick, last_tick, rows = chunk
+            try:
+                name = 'chunk_{0:06d}'.format(number)
+                directory = path.join(self.directory, name)
+                if not path.isdir(directory):
+                    os.makedirs(directory)
+                for column, dtype in COLUMNS:
+                    numpy.save(path.join(directory, column + '.npy'), numpy.concatenate(rows[column]).astype(dtype))
+
+                with self.lock:
+                    self.manifest['chunks'].append({'name': name, 'rows': sum(len(part) for part in rows['tick']),
+                                                    'first_tick': first_tick, 'last_tick': last_tick})
+                    self._write_manifest()
+            except Exception as error:
+                self.error = error
+
+    def _write_manifest(self):
+        # Written next to the old one and then moved over it, so that readers never see half a manifest
+        temporary = path.join(self.directory, 'manifest.json.tmp')
+        with open(temporary, 'w') as output:
+            json.dump(self.manifest, output, indent=2, sort_keys=True)
+        os.rename(temporary, path.join(self.directory, 'manifest.json'))
+
+    '''
+    Write what is left and wait for the writer to finish.
+    '''
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.writer.join()
+        with self.lock:
+            self._write_manifest()
+        if self.error is not None:
+            raise self.error
+
+
+'''
+Load the columns (all of them by default) of the trajectories exported to directory, as a dict of arrays. Chunks are memory mapped and concatenated.
+'''
+def load_trajectories(directory, columns=None):
+    with open(path.join(directory, 'manifest.json')) as manifest:
+        manifest = json.load(manifest)
+    if columns is None:
+        columns = [name for name, dtype in manifest['columns']]
+
+    result = {}
+    for column in columns:
+        parts = [numpy.load(path.join(directory, chunk['name'], column + '.npy'), mmap_mode='r')
+                 for chunk in manifest['chunks']]
+        dtype = dict(manifest['columns'])[column]
+        result[column] = numpy.concatenate(parts) if parts else numpy.zeros(0, dtype=dtype)
+    return result
@@ -0,0 +1,553 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import random
+
+from multiprocessing.sharedctypes import RawArray
+
+import numpy
+
+from modules.constants import *
+from modules import config, integrators
+from modules.spatial_grid import neighbor_pairs
+from modules.species import *
+
+# The Flock applies the same rules as modules.boid.Boid, but to a whole flock at once. State is kept in contiguous arrays (one row per boid) and every rule is a handful of array operations instead of one Python method call per boid.
+
+# Names of the per boid arrays of a Flock
+ARRAYS = ('positions', 'velocities', 'next_velocities', 'accelerations', 'ids', 'species')
+
+
+class Flock(object):
+    '''
+    Every boid only stores its position, its velocities, its last acceleration (for velocity Verlet, see update), its id and the index of its species, 74 bytes in all. Boids change index when the flock is sorted or boids are removed, the id of a boid never changes and is never given to another boid of the flock. The weights, field of view and maximum speed are shared by the whole species: the flock keeps one small array per parameter (see modules.species.PARAMETERS) indexed by species, so the weight of boid i is cohesion_weight[species[i]].
+
+    The state is double buffered: the rules only read positions and velocities (the state of tick t) and only write next_velocities, which update() turns into tick t+1. Which boids see which and how they move over a tick therefore does not depend on the order boids are processed in, and the rules can be applied to separate ranges of boids (see find_neighbors) in parallel. The exact result does depend on the indexes of the boids: the random bounces are drawn in index order and the sums of the rules add up neighbors in index order, so the same boids at other indexes end up apart by rounding and then by chance.
+    '''
+    def __init__(self, width=None, height=None, capacity=64, size=10, rng=numpy.random, kernels=None):
+        # Size of the world the flock lives in, the configured one by default (see modules.config.world_size)
+        if width is None or height is None:
+            width, height = config.world_size()
+        self.width = width
+        self.height = height
+
+        # Side of the square sprite used for the boids (needed for collisions)
+        self.size = size
+
+        # Source of randomness, pass a seeded numpy.random.RandomState for reproducible runs
+        self.rng = rng
+
+        # Loops replacing the numpy code of the rules that branch on every boid, see modules.kernels.load. None runs the
+        # numpy code.
+        self.kernels = kernels
+
+        # Number of boids in the flock, rows past count are unused
+        self.count = 0
+
+        # === State ===
+
+        self.positions = numpy.zeros((capacity, 2))
+        self.velocities = numpy.zeros((capacity, 2))
+        # Velocities of the next tick, written by the rules
+        self.next_velocities = numpy.zeros((capacity, 2))
+        # Change of velocity per tick of the rules over the last tick, nan for new boids which have had no tick yet
+        self.accelerations = numpy.zeros((capacity, 2))
+
+        # Id of every boid, given in the order the boids are added, and the id of the next boid added
+        self.ids = numpy.zeros(capacity, dtype=numpy.int64)
+        self.next_id = 0
+
+        # Index of the species of every boid in species_list
+        self.species = numpy.zeros(capacity, dtype=numpy.int16)
+
+        # === Parameters, one row per species ===
+
+        self.species_list = []
+        for name in PARAMETERS:
+            setattr(self, name, numpy.zeros(0))
+
+        # Whether the boids are currently sorted by x coordinate, see sort_by_x
+        self.sorted_by_x = False
+        # Whether the arrays live in shared memory, see share
+        self.shared = False
+        # Changes every time boids change index or are added, removed or moved other than by update, so that whatever
+        # caches boid indexes (see modules.neighbor_list) knows to start over
+        self.layout = 0
+        # Order the last sort_by_x put the boids in (new index to old index) and the layout it led to: when that is the
+        # current layout, caches can follow the boids to their new indexes instead of starting over
+        self.sort_order = None
+        self.sorted_layout = None
+
+        # Neighbor pairs found by the last call to find_neighbors
+        self.pairs = None
+
+        # Sprites drawing the flock, see create_sprites
+        self.sprites = []
+        self.sprite_image = None
+        self.sprite_group = None
+
+    '''
+    Return the index of the Species species in species_list, adding its parameters to the flock the first time.
+    '''
+    def species_index(self, species):
+        for index, known in enumerate(self.species_list):
+            if known is species:
+                return index
+
+        if self.shared:
+            raise RuntimeError("A flock in shared memory cannot get new species, add them before sharing it")
+        self.species_list.append(species)
+        for name in PARAMETERS:
+            setattr(self, name, numpy.append(getattr(self, name), getattr(species, name)))
+        return len(self.species_list) - 1
+
+    '''
+    Add a boid of the Species species to the flock at (x, y) and return its index.
+    '''
+    def add(self, x, y, species):
+        species = self.species_index(species)
+        if self.count == len(self.positions):
+            self.grow(max(2 * len(self.positions), 1))
+
+        index = self.count
+        self.count += 1
+        self.sorted_by_x = False
+        self.layout += 1
+
+        self.positions[index] = x, y
+        self.velocities[index] = self.rng.randint(1, 11, 2) / 10.0
+        self.accelerations[index] = numpy.nan
+        self.ids[index] = self.next_id
+        self.next_id += 1
+        self.species[index] = species
+
+        return index
+
+    '''
+    Add a boid of species at every position of positions (an array of shape (count, 2)) in one go and return the indexes of the new boids. species is a Species, or an array of indexes in species_list with one per position.
+
+    The rows past count are free, new boids take the first of them: nothing is allocated unless the flock is full (see reserve).
+    '''
+    def spawn(self, positions, species):
+        if isinstance(species, Species):
+            species = self.species_index(species)
+        count = len(positions)
+        if self.count + count > len(self.positions):
+            self.grow(max(2 * len(self.positions), self.count + count))
+
+        start = self.count
+        end = start + count
+        self.count = end
+        self.sorted_by_x = False
+        self.layout += 1
+
+        self.positions[start:end] = positions
+        self.velocities[start:end] = self.rng.randint(1, 11, (count, 2)) / 10.0
+        self.accelerations[start:end] = numpy.nan
+        self.ids[start:end] = numpy.arange(self.next_id, self.next_id + count)
+        self.next_id += count
+        self.species[start:end] = species
+
+        return numpy.arange(start, end)
+
+    '''
+    Remove the boids at indexes from the flock. The last boids are moved into the holes so that the flock stays packed.
+    '''
+    def remove(self, indexes):
+        n = self.count
+        removed = numpy.zeros(n, dtype=bool)
+        removed[indexes] = True
+        remaining = n - int(removed.sum())
+
+        # Boids past the new end that survive fill the holes before the new end
+        holes = numpy.nonzero(removed[:remaining])[0]
+        movers = numpy.nonzero(~removed[remaining:])[0] + remaining
+        for name in ARRAYS:
+            array = getattr(self, name)
+            array[holes] = array[movers]
+
+        self.count = remaining
+        self.sorted_by_x = False
+        self.layout += 1
+
+    '''
+    Reallocate every array to hold capacity boids.
+    '''
+    def grow(self, capacity):
+        if self.shared:
+            raise RuntimeError("A flock in shared memory cannot grow, create it with enough capacity")
+
+        for name in ARRAYS:
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    '''
+    Make room for capacity boids up front, so that adding boids up to that many never reallocates the arrays mid run.
+    '''
+    def reserve(self, capacity):
+        if capacity > len(self.positions):
+            self.grow(capacity)
+
+    '''
+    Move every per boid array into shared memory, so that processes forked afterwards work on the same flock (see modules.parallel). The flock cannot grow or get new species any more once shared.
+    '''
+    def share(self):
+        if self.shared:
+            return
+
+        for name in ARRAYS:
+            old = getattr(self, name)
+            new = numpy.frombuffer(RawArray(old.dtype.char, old.size), dtype=old.dtype).reshape(old.shape)
+            new[:] = old
+            setattr(self, name, new)
+        self.shared = True
+
+    '''
+    Reorder the boids by x coordinate. Consecutive ranges of boids are then vertical stripes of the world, so find_neighbors on a range only has to look at the boids of nearby stripes.
+    '''
+    def sort_by_x(self):
+        n = self.count
+        order = numpy.argsort(self.positions[:n, 0], kind='mergesort')
+        self.sorted_by_x = True
+        # Boids that are still in order keep their indexes
+        if (order == numpy.arange(n)).all():
+            return
+
+        for name in ARRAYS:
+            array = getattr(self, name)
+            array[:n] = array[:n][order]
+        self.layout += 1
+        self.sort_order = order
+        self.sorted_layout = self.layout
+
+    '''
+    Start a tick: the velocities of the next tick start out as the current ones. Must be called once per tick before the flocking rules.
+    '''
+    def begin_tick(self):
+        n = self.count
+        self.next_velocities[:n] = self.velocities[:n]
+
+    '''
+    Find every pair of boids that can see each other, for the boids start to end (all of them by default). The pairs are returned as (start, end, ids, others, distances) and are what the flocking rules work on.
+
+    Each boid only pays attention to the boids closer than its own field of view, just like the neighbor scan done for Boid objects, unless a radius is given for every boid.
+    '''
+    def find_neighbors(self, start=0, end=None, radius=None):
+        n = self.count
+        if end is None:
+            end = n
+
+        if start >= end:
+            ids, others, distances = neighbor_pairs(self.positions[:0], 1)
+            self.pairs = start, end, ids, others, distances
+            return self.pairs
+
+        queries = self.positions[start:end]
+        # Without a fixed radius every boid sees as far as the field of view of its species
+        by_species = radius is None
+        if by_species:
+            radius = self.field_of_view[self.species[start:end]].max()
+
+        # When the boids are sorted by x only those in range of the x coordinates of the queries can be neighbors
+        low, high = 0, n
+        if self.sorted_by_x:
+            x = self.positions[:n, 0]
+            low = numpy.searchsorted(x, queries[:, 0].min() - radius, 'left')
+            high = numpy.searchsorted(x, queries[:, 0].max() + radius, 'right')
+
+        ids, others, distances = neighbor_pairs(queries, radius, self.positions[low:high])
+        ids += start
+        others += low
+        keep = ids != others
+        if by_species and len(self.species_list) > 1:
+            keep &= distances < self.field_of_view[self.species[ids]]
+
+        self.pairs = start, end, ids[keep], others[keep], distances[keep]
+        return self.pairs
+
+    '''
+    Boids want to stay close to each other, move every boid towards the center of mass of the boids it can see.
+
+    far adds the boids seen through cell summaries, see modules.lod.approximate_neighbors.
+    '''
+    def cohesion(self, pairs=None, far=None):
+        start, end, ids, others, distances = pairs or self.pairs
+        ids = ids - start
+        counts = numpy.bincount(ids, minlength=end - start)
+        sum_x = numpy.bincount(ids, self.positions[others, 0], end - start)
+        sum_y = numpy.bincount(ids, self.positions[others, 1], end - start)
+        if far is not None:
+            far_counts, far_positions, far_velocities = far
+            counts = counts + far_counts
+            sum_x = sum_x + far_positions[:, 0]
+            sum_y = sum_y + far_positions[:, 1]
+        seen = counts > 0
+
+        center_x = sum_x[seen] / counts[seen]
+        center_y = sum_y[seen] / counts[seen]
+
+        positions = self.positions[start:end][seen]
+        weight = self.cohesion_weight[self.species[start:end][seen]]
+        self.next_velocities[start:end, 0][seen] += (center_x - positions[:, 0]) / weight
+        self.next_velocities[start:end, 1][seen] += (center_y - positions[:, 1]) / weight
+
+    '''
+    Boids want to move in the same direction, move every boid along the average velocity of the boids it can see.
+
+    far adds the boids seen through cell summaries, see modules.lod.approximate_neighbors.
+    '''
+    def alignment(self, pairs=None, far=None):
+        start, end, ids, others, distances = pairs or self.pairs
+        ids = ids - start
+        counts = numpy.bincount(ids, minlength=end - start)
+        sum_x = numpy.bincount(ids, self.velocities[others, 0], end - start)
+        sum_y = numpy.bincount(ids, self.velocities[others, 1], end - start)
+        if far is not None:
+            far_counts, far_positions, far_velocities = far
+            counts = counts + far_counts
+            sum_x = sum_x + far_velocities[:, 0]
+            sum_y = sum_y + far_velocities[:, 1]
+        seen = counts > 0
+
+        average_x = sum_x[seen] / counts[seen]
+        average_y = sum_y[seen] / counts[seen]
+
+        weight = self.alignment_weight[self.species[start:end][seen]]
+        self.next_velocities[start:end, 0][seen] += average_x / weight
+        self.next_velocities[start:end, 1][seen] += average_y / weight
+
+    '''
+    Boids want to maintain some distance with respect to each other, move every boid away from the boids closer than min_distance.
+    '''
+    def separation(self, min_distance, pairs=None):
+        start, end, ids, others, distances = pairs or self.pairs
+        if self.kernels is not None:
+            change = self.kernels.separation(start, end, ids, others, distances, min_distance, self.positions)
+            change_x, change_y = change[:, 0], change[:, 1]
+        else:
+            close = distances < min_distance
+            ids = ids[close]
+            others = others[close]
+
+            change_x = numpy.bincount(ids - start, self.positions[ids, 0] - self.positions[others, 0], end - start)
+            change_y = numpy.bincount(ids - start, self.positions[ids, 1] - self.positions[others, 1], end - start)
+
+        weight = self.separation_weight[self.species[start:end]]
+        self.next_velocities[start:end, 0] += change_x / weight
+        self.next_velocities[start:end, 1] += change_y / weight
+
+    '''
+    Move the boids start to end (all of them by default) away from the obstacles within their field of view, using the precomputed ObstacleField field.
+
+    As in Boid.obstacle_avoidance, boids closer than the danger distance of the field (45 pixels) to an obstacle drop their velocity and head straight away from it. When several obstacles are that close the nearest one wins.
+    '''
+    def obstacle_avoidance(self, field, start=0, end=None):
+        if end is None:
+            end = self.count
+        if start >= end:
+            return
+
+        positions = self.positions[start:end]
+        velocities = self.next_velocities[start:end]
+        columns, rows = field.cells(positions)
+        if self.kernels is not None:
+            weights = self.obstacle_avoidance_weight[self.species[start:end]]
+            self.kernels.obstacle_avoidance(positions, velocities, weights, columns, rows, field)
+            return
+
+        # Sum of (position - center) over every visible obstacle
+        count = field.visible_count[columns, rows][:, numpy.newaxis]
+        away = count * positions - field.visible_centers[columns, rows]
+        velocities += away / self.obstacle_avoidance_weight[self.species[start:end], numpy.newaxis]
+
+        # Avoid collision with obstacles at all cost
+        danger = numpy.isfinite(field.nearest_danger[columns, rows])
+        velocities[danger] = positions[danger] - field.danger_centers[columns[danger], rows[danger]]
+
+    '''
+    Push every boid that overlaps an obstacle of the ObstacleField field away from its center. Applies to the current velocities, so it is meant to be called between ticks, after update().
+    '''
+    def obstacle_collisions(self, field):
+        n = self.count
+        positions = numpy.floor(self.positions[:n])
+        columns, rows = field.cells(positions)
+
+        count = field.collision_count[columns, rows][:, numpy.newaxis]
+        self.velocities[:n] += count * positions - field.collision_centers[columns, rows]
+
+    '''
+    Move the boids start to end (all of them by default) that have a goal weight towards the point (goal_x, goal_y).
+    '''
+    def goal(self, goal_x, goal_y, start=0, end=None):
+        if end is None:
+            end = self.count
+        weight = self.goal_weight[self.species[start:end]]
+        seeking = weight != 0
+        positions = self.positions[start:end][seeking]
+        weight = weight[seeking]
+        self.next_velocities[start:end, 0][seeking] += (goal_x - positions[:, 0]) / weight
+        self.next_velocities[start:end, 1][seeking] += (goal_y - positions[:, 1]) / weight
+
+    '''
+    Move the boids start to end (all of them by default) that have a goal weight towards the goal of the FlowField field, along the shortest path around the obstacles. As with goal, the pull is the distance left to go over the goal weight, only that distance is measured along the path. Boids in the cell of the goal, or that cannot reach it, head straight for it.
+    '''
+    def follow(self, field, start=0, end=None):
+        if end is None:
+            end = self.count
+        weight = self.goal_weight[self.species[start:end]]
+        seeking = weight != 0
+        positions = self.positions[start:end][seeking]
+        weight = weight[seeking]
+
+        columns, rows = field.cells(positions)
+        distances = field.distances[columns, rows]
+        pull = numpy.array(field.goal, dtype=float) - positions
+        on_path = numpy.isfinite(distances) & (distances > 0)
+        pull[on_path] = field.directions[columns[on_path], rows[on_path]] * distances[on_path, numpy.newaxis]
+
+        self.next_velocities[start:end, 0][seeking] += pull[:, 0] / weight
+        self.next_velocities[start:end, 1][seeking] += pull[:, 1] / weight
+
+    '''
+    Move the selected boids (all of them by default) towards the middle of the world, as much as dt ticks of the rules move them.
+    '''
+    def go_to_middle(self, selected=None, dt=1):
+        n = self.count
+        if selected is None:
+            selected = numpy.ones(n, dtype=bool)
+        self.next_velocities[:n, 0][selected] += (self.width / 2 - self.positions[:n, 0][selected]) / 150 * dt
+        self.next_velocities[:n, 1][selected] += (self.height / 2 - self.positions[:n, 1][selected]) / 150 * dt
+
+    '''
+    Normalizes the velocity vectors of the next tick with respect to the maximum speed.
+    '''
+    def limit_speed(self):
+        n = self.count
+        velocities = self.next_velocities[:n]
+        speed = numpy.sqrt(velocities[:, 0] ** 2 + velocities[:, 1] ** 2)
+        max_speed = self.max_speed[self.species[:n]]
+        fast = speed > max_speed
+        velocities[fast] *= (max_speed[fast] / speed[fast])[:, numpy.newaxis]
+
+    '''
+    Finish a tick covering dt ticks of the rules: update positions based off of the velocities with integrator (see modules.integrators), wrapping around or bouncing off the edges of the world. Boids slower than min_speed are pulled towards the middle, 0 turns that off. The new velocities become the current ones.
+
+    With velocity Verlet the rules see the velocities predicted by the last tick (its velocity plus its acceleration), which are only corrected to the mean of both accelerations once the rules give the acceleration of this tick.
+    '''
+    def update(self, wrap, dt=1, integrator=integrators.SEMI_IMPLICIT, min_speed=2):
+        n = self.count
+        positions = self.positions[:n]
+        velocities = self.next_velocities[:n]
+        # Velocities at the start of the tick
+        previous = self.velocities[:n]
+        size = numpy.array([self.width, self.height])
+        weight = integrators.weight(integrator)
+
+        if integrator == integrators.VERLET:
+            # Correct the velocities the rules saw with the mean of the last acceleration and this one, then predict those
+            # of the next tick. The rules changed the velocities by as much as they would over a single tick.
+            accelerations = self.accelerations[:n]
+            change = velocities - previous
+            # New boids have no last acceleration, theirs is taken to be this one so that they start with no correction
+            fresh = numpy.isnan(accelerations)
+            accelerations[fresh] = change[fresh]
+            previous += (change - accelerations) * (dt / 2)
+            accelerations[:] = change
+            velocities[:] = previous + change * dt
+        elif dt != 1:
+            # The rules changed the velocities by as much as they would over a single tick
+            velocities -= previous
+            velocities *= dt
+            velocities += previous
+
+        if self.kernels is not None:
+            self.kernels.update(positions, velocities, previous, self.max_speed[self.species[:n]], self.width,
+                                self.height, wrap, dt, weight, min_speed, self.rng)
+            self.velocities[:n] = velocities
+            self.sorted_by_x = False
+            return
+
+        if wrap:
+            # If we leave the world we reappear on the other side.
+            low = (positions < 0) & (velocities < 0)
+            high = (positions > size) & (velocities > 0)
+            positions[low] = numpy.broadcast_to(size, positions.shape)[low]
+            positions[high] = 0
+        else:
+            # Bounce off the walls. We lose a random amount of velocity along the axis we collided on.
+            bounce = ((positions < 0) & (velocities < 0)) | ((positions > size) & (velocities > 0))
+            velocities[bounce] = -velocities[bounce] * self.rng.random_sample(bounce.sum())
+
+        # Go to middle if the boid is not moving much.
+        self.go_to_middle(numpy.sqrt(velocities[:, 0] ** 2 + velocities[:, 1] ** 2) < min_speed, dt)
+
+        self.limit_speed()
+
+        if weight == 1:
+            positions += velocities * dt
+        else:
+            positions += ((1 - weight) * previous + weight * velocities) * dt
+        self.velocities[:n] = velocities
+        self.sorted_by_x = False
+
+    '''
+    Draw the flock with image (or a list of images, one per species), using sprites added to the sprite group group. Sprites are only made for the boids that are on screen, by sync_sprites, returns the sprites made so far.
+    '''
+    def create_sprites(self, image, group):
+        self.sprite_image = image
+        self.sprite_group = group
+        return self.sprites
+
+    '''
+    Return the indexes of the boids whose sprite is at least partly inside view (a rect of the world with left, top, right and bottom, such as a pygame.Rect), in index order.
+
+    When the boids are sorted by x (see sort_by_x) only those in the x range of view are looked at, found with a binary search like in find_neighbors. Otherwise it is a single array test of every position, still no Python per boid.
+    '''
+    def within(self, view):
+        n = self.count
+        low, high = 0, n
+        if self.sorted_by_x:
+            x = self.positions[:n, 0]
+            low = numpy.searchsorted(x, view.left - self.size, 'right')
+            high = numpy.searchsorted(x, view.right, 'left')
+
+        x = self.positions[low:high, 0]
+        y = self.positions[low:high, 1]
+        inside = (x > view.left - self.size) & (x < view.right) & (y > view.top - self.size) & (y < view.bottom)
+        return numpy.nonzero(inside)[0] + low
+
+    '''
+    Show the boids inside view (a pygame.Rect of the world, the whole world by default) with the sprites of the flock, so that they can be drawn, zoom pixels of the screen per pixel of the world. shown are the indexes of those boids when already known (see within).
+
+    Sprites are not tied to a boid: the first sprites are handed to whichever boids are on screen this frame and the rest are hidden, more sprites are only made when more boids than ever before are on screen at once. A flock much larger than the screen then costs no more sprites than what fits on it.
+    '''
+    def sync_sprites(self, view=None, zoom=1, shown=None):
+        # Only imported once something draws, simulating never needs pygame
+        from modules.sprites import FlockSprite
+        if view is None:
+            view = pygame.Rect(0, 0, self.width, self.height)
+        if shown is None:
+            shown = self.within(view)
+
+        images = self.sprite_image if isinstance(self.sprite_image, list) else [self.sprite_image]
+        while len(self.sprites) < len(shown):
+            sprite = FlockSprite(images[0])
+            self.sprites.append(sprite)
+            self.sprite_group.add(sprite)
+
+        last = len(images) - 1
+        for sprite, index, (x, y) in zip(self.sprites, shown.tolist(), self.positions[shown].tolist()):
+            sprite.index = index
+            sprite.show(images[min(self.species[index], last)], zoom)
+            sprite.rect.x = (x - view.left) * zoom
+            sprite.rect.y = (y - view.top) * zoom
+            sprite.visible = 1
+            sprite.dirty = 1
+
+        for sprite in self.sprites[len(shown):]:
+            if sprite.visible:
+                sprite.visible = 0
+                sprite.dirty = 1
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+
+import numpy
+
+# Moves between neighboring cells of a FlowField, as (column step, row step, length in cells)
+MOVES = [(dx, dy, math.hypot(dx, dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+
+class FlowField(object):
+    '''
+    Shortest paths to a goal around obstacles, for every point of the world at once.
+
+    The world is cut into square cells of side resolution. Cells within clearance of an obstacle (for a boid of side boid_size, measured from its top left corner like everything else) are blocked. For a goal, the field holds the length of the shortest path from every cell to the cell of the goal, moving between the 8 neighbors of a cell without cutting the corners of blocked cells, and the direction of the first step of that path. A boid following the field only needs a lookup of its cell, however many obstacles and boids there are.
+
+    Paths are worked out with a vectorized Bellman-Ford: every pass relaxes every cell from its 8 neighbors at once, and it stops once a pass changes nothing, after about as many passes as the longest path has cells. set_goal only does it again when the goal moves to another cell, so a goal that moves within a cell (or stays put) costs nothing. The fields of the last few goal cells are kept (cache_size), a goal going back and forth does not pay for them twice.
+
+    Cells that cannot reach the goal have an infinite distance.
+    '''
+    def __init__(self, obstacles, width, height, resolution=10, boid_size=10, clearance=5, cache_size=16):
+        self.resolution = resolution
+        self.columns = int(math.ceil(width / resolution))
+        self.rows = int(math.ceil(height / resolution))
+        self.cache_size = cache_size
+
+        # Cells whose middle is within clearance of a boid touching an obstacle
+        self.blocked = numpy.zeros((self.columns, self.rows), dtype=bool)
+        middles_x = (numpy.arange(self.columns) + 0.5) * resolution
+        middles_y = (numpy.arange(self.rows) + 0.5) * resolution
+        for obstacle in obstacles:
+            left, top, size = obstacle.x, obstacle.y, obstacle.size
+            inside_x = (middles_x > left - boid_size - clearance) & (middles_x < left + size + clearance)
+            inside_y = (middles_y > top - boid_size - clearance) & (middles_y < top + size + clearance)
+            self.blocked |= inside_x[:, numpy.newaxis] & inside_y[numpy.newaxis, :]
+
+        # Goal the field leads to, its cell, and the fields of the last goal cells
+        self.goal = None
+        self.goal_cell = None
+        self.cache = {}
+        self.distances = None
+        self.directions = None
+
+        # Number of times the paths were worked out, to see how often the goal changes cell
+        self.updates = 0
+
+    '''
+    Window of padded (an array with a border of one cell) over the cells of the field, moved by (dx, dy): the value of the neighbor (x + dx, y + dy) of every cell.
+    '''
+    def shifted(self, padded, dx, dy):
+        return padded[1 + dx:1 + dx + self.columns, 1 + dy:1 + dy + self.rows]
+
+    '''
+    Return the indexes (columns, rows) of the cells containing positions, clipped to the field.
+    '''
+    def cells(self, positions):
+        columns = numpy.floor(positions[:, 0] / self.resolution).astype(numpy.intp)
+        rows = numpy.floor(positions[:, 1] / self.resolution).astype(numpy.intp)
+        numpy.clip(columns, 0, self.columns - 1, out=columns)
+        numpy.clip(rows, 0, self.rows - 1, out=rows)
+        return columns, rows
+
+    '''
+    Lead the field to the point (x, y).
+    '''
+    def set_goal(self, x, y):
+        columns, rows = self.cells(numpy.array([[x, y]], dtype=float))
+        cell = int(columns[0]), int(rows[0])
+        if cell == self.goal_cell:
+            self.goal = x, y
+            return
+
+        if cell not in self.cache:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[cell] = self.paths(cell)
+            self.updates += 1
+        self.use((x, y), cell, self.cache[cell])
+
+    '''
+    The goal, its cell and the paths (distances, directions) set_goal led the field to last, for use.
+    '''
+    def current(self):
+        return self.goal, self.goal_cell, (self.distances, self.directions)
+
+    '''
+    Lead the field to the point goal, in the cell cell, with the paths (distances, directions) worked out for that cell (by paths, or by set_goal on another FlowField of the same obstacles, see current). The cell is set last, so that a field is never seen with the cell of a goal and the paths of another.
+    '''
+    def use(self, goal, cell, paths):
+        self.distances, self.directions = paths
+        self.goal = goal
+        self.goal_cell = cell
+
+    '''
+    Lengths (in pixels) of the shortest paths from every cell to the cell goal, and unit vectors along their first step.
+
+    Boids do end up in blocked cells, pushed by the others or cutting a corner. Blocked cells get the path of their neighbor that is closest to the goal, blocked or not, so such boids find their way out. Free cells never go through blocked ones.
+    '''
+    def paths(self, goal):
+        # Moves allowed out of every cell: from a free cell into a free cell (or the goal), and diagonally only when both
+        # cells beside the move are free too. Any move out of a blocked cell.
+        free = ~self.blocked
+        free[goal] = True
+        padded_free = numpy.pad(free, 1, 'constant')
+        allowed = []
+        for dx, dy, length in MOVES:
+            into = self.shifted(padded_free, dx, dy)
+            if dx and dy:
+                into = into & self.shifted(padded_free, dx, 0) & self.shifted(padded_free, 0, dy)
+            allowed.append((into & free) | self.blocked)
+
+        distances = numpy.empty((self.columns, self.rows))
+        distances.fill(numpy.inf)
+        distances[goal] = 0
+
+        padded = numpy.empty((self.columns + 2, self.rows + 2))
+        padded.fill(numpy.inf)
+        while True:
+            padded[1:-1, 1:-1] = distances
+            relaxed = distances.copy()
+            for (dx, dy, length), moves in zip(MOVES, allowed):
+                through = self.shifted(padded, dx, dy) + length
+                better = moves & (through < relaxed)
+                relaxed[better] = through[better]
+            if (relaxed == distances).all():
+                break
+            distances = relaxed
+
+        # First step: the neighbor closest to the goal
+        padded[1:-1, 1:-1] = distances
+        best = numpy.empty((self.columns, self.rows))
+        best.fill(numpy.inf)
+        directions = numpy.zeros((self.columns, self.rows, 2))
+        for (dx, dy, length), moves in zip(MOVES, allowed):
+            through = numpy.where(moves, self.shifted(padded, dx, dy) + length, numpy.inf)
+            better = through < best
+            best[better] = through[better]
+            directions[better] = dx / length, dy / length
+        directions[goal] = 0
+
+        return distances * self.resolution, directions
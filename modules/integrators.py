@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+# How a Flock moves its boids over a tick once the rules changed their velocities (see Flock.update). Positions and
+# velocities are floats, a tick can cover any number dt of ticks of the rules (the rules change velocities by as much as
+# they would over one of them, dt ticks change them dt times as much), and the distance moved over the tick is:
+#
+# - EULER (explicit Euler): the velocity at the start of the tick times dt. First order, drifts outwards on curves.
+# - SEMI_IMPLICIT (semi-implicit or symplectic Euler): the velocity at the end of the tick times dt, so a change of
+#   velocity shows in the position at once. First order but stable, what the flocks always did.
+# - VERLET (velocity Verlet): the mean of both times dt, v dt + a dt^2 / 2, and the velocity changes by the mean of the
+#   accelerations at the start and at the end of the tick. Second order for positions and velocities. The rules depend
+#   on the velocities, so they see the velocity predicted with the acceleration of the start of the tick, and the Flock
+#   keeps every acceleration until the next tick to correct it (see Flock.update).
+EULER = 'euler'
+SEMI_IMPLICIT = 'semi-implicit'
+VERLET = 'verlet'
+INTEGRATORS = (EULER, SEMI_IMPLICIT, VERLET)
+
+# Share of the velocity at the end of the tick in the distance moved, the rest is the velocity at its start
+_WEIGHTS = {EULER: 0.0, SEMI_IMPLICIT: 1.0, VERLET: 0.5}
+
+
+'''
+Share of the velocity at the end of a tick in the distance the integrator name moves boids over the tick.
+'''
+def weight(name):
+    if name not in _WEIGHTS:
+        raise ValueError("Unknown integrator {0}, expected one of {1}".format(name, ', '.join(INTEGRATORS)))
+    return _WEIGHTS[name]
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+
+import numpy
+
+from modules.spatial_grid import neighbor_pairs
+
+# What a boid does about a boid of another (or the same) species it can see, the entries of an interaction matrix:
+# flock with it (cohesion, alignment and separation), flee from it, attack it, or ignore it.
+IGNORE = 'ignore'
+FLOCK = 'flock'
+FLEE = 'flee'
+ATTACK = 'attack'
+# The matrix stores the index of the interaction in this tuple
+INTERACTIONS = (IGNORE, FLOCK, FLEE, ATTACK)
+
+
+class Interactions(object):
+    '''
+    Interaction matrix of the species of a Flock holding any number of species: entry [a, b] is what boids of species a do about the boids of species b they can see.
+
+    Every species lives in the same Flock, so a single neighbor search finds every pair of boids that can see each other whatever their species (see Flock.find_neighbors), and split sorts those pairs by the entry of the matrix for their species. The rules then run once per kind of interaction rather than once per pair of species: adding a species adds boids to the one search, not another search.
+
+    Species are indexed like the species_list of the flock, add them to the flock (Flock.species_index) in the order given here before adding any boid. Species that flee need a non zero obstacle avoidance weight and species that attack a non zero goal weight, like the prey and predators of modules.predation.
+    '''
+    def __init__(self, species, matrix=None, default=IGNORE, eat=True):
+        self.species = list(species)
+        n = len(self.species)
+        self.matrix = numpy.empty((n, n), dtype=numpy.int8)
+        self.matrix.fill(INTERACTIONS.index(default))
+        for (species, other), interaction in (matrix or {}).items():
+            self.set(species, other, interaction)
+
+        # Whether boids that touch a boid they attack eat it
+        self.eat = eat
+
+    '''
+    Return the index of species, a Species or the name of one.
+    '''
+    def index(self, species):
+        for index, known in enumerate(self.species):
+            if known is species or known.name == species:
+                return index
+        raise ValueError("Unknown species {0!r}".format(species))
+
+    '''
+    Make the boids of species do interaction about the boids of other (species are Species or their names).
+    '''
+    def set(self, species, other, interaction):
+        if interaction not in INTERACTIONS:
+            raise ValueError("Unknown interaction {0}, expected one of {1}".format(interaction, ', '.join(INTERACTIONS)))
+        self.matrix[self.index(species), self.index(other)] = INTERACTIONS.index(interaction)
+
+    def get(self, species, other):
+        return INTERACTIONS[self.matrix[self.index(species), self.index(other)]]
+
+    '''
+    Whether any boid of the species with index species flees or attacks.
+    '''
+    def roams(self, species):
+        row = self.matrix[species]
+        return bool((row == INTERACTIONS.index(FLEE)).any() or (row == INTERACTIONS.index(ATTACK)).any())
+
+    '''
+    Sort the neighbor pairs (start, end, ids, others, distances) of flock, as given by Flock.find_neighbors, by interaction. Returns a dictionary of pairs in the same form by interaction (ignored pairs are dropped).
+    '''
+    def split(self, flock, pairs):
+        start, end, ids, others, distances = pairs
+        kinds = self.matrix[flock.species[ids], flock.species[others]]
+
+        split = {}
+        for code, interaction in enumerate(INTERACTIONS):
+            if interaction == IGNORE:
+                continue
+            selected = kinds == code
+            split[interaction] = start, end, ids[selected], others[selected], distances[selected]
+        return split
+
+    '''
+    Every boid that can see a boid it flees from moves away from where the nearest one of them is going, by a random factor of 1 or 2 along each axis (see Predation.flee). Returns whether each boid of start to end flees.
+    '''
+    def flee(self, flock, pairs):
+        start, end, ids, others, distances = pairs
+        ids = ids - start
+
+        # Nearest boid fled from, found with a per boid minimum instead of a sort
+        nearest = numpy.empty(end - start)
+        nearest.fill(numpy.inf)
+        numpy.minimum.at(nearest, ids, distances)
+        chosen = distances == nearest[ids]
+        hunter = numpy.empty(end - start, dtype=numpy.intp)
+        # When two are exactly as close the first pair wins
+        hunter[ids[chosen][::-1]] = others[chosen][::-1]
+
+        fleeing = numpy.isfinite(nearest)
+        fleeing_ids = numpy.nonzero(fleeing)[0] + start
+        hunter = hunter[fleeing]
+        projected = flock.positions[hunter] + 2 * flock.velocities[hunter]
+        randomness = flock.rng.randint(1, 3, (len(fleeing_ids), 2))
+        weight = flock.obstacle_avoidance_weight[flock.species[fleeing_ids], numpy.newaxis]
+        flock.next_velocities[fleeing_ids] += -((projected - flock.positions[fleeing_ids]) / weight) * randomness
+        return fleeing
+
+    '''
+    Every boid that can see boids it attacks moves towards where the one of them furthest from their center of mass is going (see Predation.attack). Returns whether each boid of start to end attacks.
+    '''
+    def attack(self, flock, pairs):
+        start, end, ids, others, distances = pairs
+        ids = ids - start
+        n = end - start
+
+        counts = numpy.bincount(ids, minlength=n)
+        attacking = counts > 0
+        center_x = numpy.bincount(ids, flock.positions[others, 0], n) / numpy.maximum(counts, 1)
+        center_y = numpy.bincount(ids, flock.positions[others, 1], n) / numpy.maximum(counts, 1)
+
+        # Target furthest from the center of mass of the visible targets, selected with a per boid maximum
+        spread = numpy.sqrt((center_x[ids] - flock.positions[others, 0]) ** 2 +
+                            (center_y[ids] - flock.positions[others, 1]) ** 2)
+        furthest = numpy.empty(n)
+        furthest.fill(-numpy.inf)
+        numpy.maximum.at(furthest, ids, spread)
+        chosen = spread == furthest[ids]
+        target = numpy.empty(n, dtype=numpy.intp)
+        target[ids[chosen][::-1]] = others[chosen][::-1]
+
+        attacking_ids = numpy.nonzero(attacking)[0] + start
+        target = target[attacking]
+        intercept = flock.positions[target] + 2 * flock.velocities[target]
+        weight = flock.goal_weight[flock.species[attacking_ids], numpy.newaxis]
+        flock.next_velocities[attacking_ids] += (intercept - flock.positions[attacking_ids]) / weight
+        return attacking
+
+    '''
+    Boids of the species that flee or attack go back towards the middle of the world while they do neither, busy tells which boids of the flock do.
+    '''
+    def roam(self, flock, busy):
+        n = flock.count
+        roaming = numpy.array([self.roams(species) for species in range(len(self.species))], dtype=bool)
+        flock.go_to_middle(roaming[flock.species[:n]] & ~busy)
+
+    '''
+    Every boid touched by a boid that attacks it gets eaten and is removed from the flock, all at once, by despawn (Flock.remove by default, see Predation.kills). Call after update, returns the number of boids eaten.
+    '''
+    def kills(self, flock, despawn=None):
+        n = flock.count
+        attack = self.matrix == INTERACTIONS.index(ATTACK)
+        if not self.eat or n == 0 or not attack.any():
+            return 0
+
+        # Only the boids that attack anything look for boids to eat
+        positions = numpy.trunc(flock.positions[:n])
+        hunters = numpy.nonzero(attack.any(axis=1)[flock.species[:n]])[0]
+        reach = flock.size
+        ids, others, distances = neighbor_pairs(positions[hunters], reach * math.sqrt(2), positions)
+        ids = hunters[ids]
+        keep = (ids != others) & attack[flock.species[ids], flock.species[others]]
+        ids, others = ids[keep], others[keep]
+
+        delta = numpy.abs(positions[ids] - positions[others])
+        touching = (delta[:, 0] < reach) & (delta[:, 1] < reach)
+        eaten = numpy.unique(others[touching])
+        if len(eaten) > 0:
+            (despawn or flock.remove)(eaten)
+        return len(eaten)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+
+import numpy
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Per boid loops of the rules that branch on every boid, written out one boid at a time so that they can be compiled
+# with numba. The numpy code of Flock is the reference implementation, every kernel gives exactly the same result.
+
+# Backends of a Flock: numpy (the reference), numba (the loops below, compiled), python (the loops below, interpreted,
+# very slow but runs anywhere, to check the loops without numba) and auto (numba when it is installed, numpy otherwise).
+NUMPY = 'numpy'
+NUMBA = 'numba'
+PYTHON = 'python'
+AUTO = 'auto'
+BACKENDS = (NUMPY, NUMBA, PYTHON, AUTO)
+
+
+def _separation(start, ids, others, distances, min_distance, positions, change):
+    for k in range(len(ids)):
+        if distances[k] < min_distance:
+            i = ids[k]
+            j = others[k]
+            change[i - start, 0] += positions[i, 0] - positions[j, 0]
+            change[i - start, 1] += positions[i, 1] - positions[j, 1]
+
+
+def _obstacle_avoidance(positions, velocities, weights, columns, rows, visible_count, visible_centers, nearest_danger,
+                        danger_centers):
+    for k in range(len(positions)):
+        column = columns[k]
+        row = rows[k]
+        if nearest_danger[column, row] < numpy.inf:
+            # Avoid collision with obstacles at all cost
+            velocities[k, 0] = positions[k, 0] - danger_centers[column, row, 0]
+            velocities[k, 1] = positions[k, 1] - danger_centers[column, row, 1]
+        else:
+            count = visible_count[column, row]
+            velocities[k, 0] += (count * positions[k, 0] - visible_centers[column, row, 0]) / weights[k]
+            velocities[k, 1] += (count * positions[k, 1] - visible_centers[column, row, 1]) / weights[k]
+
+
+def _count_bounces(positions, velocities, width, height):
+    bounces = 0
+    for i in range(len(positions)):
+        for axis in range(2):
+            size = width if axis == 0 else height
+            if (positions[i, axis] < 0 and velocities[i, axis] < 0) or (positions[i, axis] > size and velocities[i, axis] > 0):
+                bounces += 1
+    return bounces
+
+
+def _edges(positions, velocities, width, height, wrap, samples):
+    bounce = 0
+    for i in range(len(positions)):
+        for axis in range(2):
+            size = width if axis == 0 else height
+            low = positions[i, axis] < 0 and velocities[i, axis] < 0
+            high = positions[i, axis] > size and velocities[i, axis] > 0
+            if wrap:
+                if low:
+                    positions[i, axis] = size
+                elif high:
+                    positions[i, axis] = 0
+            elif low or high:
+                velocities[i, axis] = -velocities[i, axis] * samples[bounce]
+                bounce += 1
+
+
+def _move(positions, velocities, previous, max_speeds, width, height, dt, weight, min_speed):
+    for i in range(len(positions)):
+        # Go to middle if the boid is not moving much
+        if math.sqrt(velocities[i, 0] * velocities[i, 0] + velocities[i, 1] * velocities[i, 1]) < min_speed:
+            velocities[i, 0] += (width / 2 - positions[i, 0]) / 150 * dt
+            velocities[i, 1] += (height / 2 - positions[i, 1]) / 150 * dt
+
+        speed = math.sqrt(velocities[i, 0] * velocities[i, 0] + velocities[i, 1] * velocities[i, 1])
+        if speed > max_speeds[i]:
+            scale = max_speeds[i] / speed
+            velocities[i, 0] *= scale
+            velocities[i, 1] *= scale
+
+        # weight is the share of the new velocity in the distance moved, see modules.integrators
+        if weight == 1:
+            positions[i, 0] += velocities[i, 0] * dt
+            positions[i, 1] += velocities[i, 1] * dt
+        else:
+            positions[i, 0] += ((1 - weight) * previous[i, 0] + weight * velocities[i, 0]) * dt
+            positions[i, 1] += ((1 - weight) * previous[i, 1] + weight * velocities[i, 1]) * dt
+
+
+class LoopKernels(object):
+    '''
+    The per boid loops of this module, run through compile: numba.njit to compile them, or as they are.
+    '''
+    def __init__(self, name, compile=None):
+        self.name = name
+        wrap = compile or (lambda function: function)
+        self.separation_loop = wrap(_separation)
+        self.obstacle_avoidance_loop = wrap(_obstacle_avoidance)
+        self.count_bounces = wrap(_count_bounces)
+        self.edges_loop = wrap(_edges)
+        self.move_loop = wrap(_move)
+
+    '''
+    Sum of the offsets from the boids closer than min_distance, by boid of start to end.
+    '''
+    def separation(self, start, end, ids, others, distances, min_distance, positions):
+        change = numpy.zeros((end - start, 2))
+        self.separation_loop(start, ids, others, distances, min_distance, positions, change)
+        return change
+
+    '''
+    Obstacle avoidance of Flock, velocities are changed in place.
+    '''
+    def obstacle_avoidance(self, positions, velocities, weights, columns, rows, field):
+        self.obstacle_avoidance_loop(positions, velocities, weights, columns, rows, field.visible_count,
+                                     field.visible_centers, field.nearest_danger, field.danger_centers)
+
+    '''
+    Everything Flock.update does to positions and velocities once they are scaled to dt, in place. previous are the velocities at the start of the tick and weight the share of the new ones in the distance moved (see modules.integrators.weight). The random slowdowns of the bounces are drawn from rng, as many and in the same order as Flock.update draws them.
+    '''
+    def update(self, positions, velocities, previous, max_speeds, width, height, wrap, dt, weight, min_speed, rng):
+        if wrap:
+            samples = numpy.zeros(0)
+        else:
+            samples = rng.random_sample(self.count_bounces(positions, velocities, width, height))
+        self.edges_loop(positions, velocities, width, height, wrap, samples)
+        self.move_loop(positions, velocities, previous, max_speeds, width, height, dt, weight, min_speed)
+
+
+# Kernels already loaded, by backend
+_loaded = {}
+
+
+'''
+Kernels of the backend name for Flock.kernels, None for the numpy reference. auto falls back to numpy when numba is not installed, asking for numba then raises a RuntimeError.
+'''
+def load(name=AUTO):
+    if name not in BACKENDS:
+        raise ValueError("Unknown kernel backend {0}, expected one of {1}".format(name, ', '.join(BACKENDS)))
+    if name == AUTO:
+        name = NUMBA if numba is not None else NUMPY
+    if name == NUMPY:
+        return None
+
+    if name not in _loaded:
+        if name == NUMBA:
+            if numba is None:
+                raise RuntimeError("The numba kernel backend needs numba, which is not installed")
+            _loaded[name] = LoopKernels(name, numba.njit(cache=True))
+        else:
+            _loaded[name] = LoopKernels(name)
+    return _loaded[name]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+
+import numpy
+
+# Level of detail for the flocking rules: boids far from each other only see each other through per cell summaries,
+# in the manner of Barnes-Hut.
+
+# Fewest boids for which approximating pays off in BasicSimulation, see approximate_neighbors
+MIN_BOIDS = 500
+
+
+class CellAggregates(object):
+    '''
+    Summary of the boids of a Flock by square cell of side cell_size: how many boids are in every cell and the sums of their positions and velocities. Cells are indexed by (floor(x / cell_size), floor(y / cell_size)), the summary covers the cells from the top left to the bottom right boid.
+    '''
+    def __init__(self, flock, cell_size):
+        n = flock.count
+        self.cell_size = cell_size
+
+        cells = numpy.floor(flock.positions[:n] / cell_size).astype(numpy.intp)
+        self.first = cells.min(axis=0) if n else numpy.zeros(2, dtype=numpy.intp)
+        self.shape = tuple((cells.max(axis=0) - self.first + 1).tolist()) if n else (0, 0)
+
+        size = self.shape[0] * self.shape[1]
+        flat = (cells[:, 0] - self.first[0]) * self.shape[1] + (cells[:, 1] - self.first[1])
+        self.count = numpy.bincount(flat, minlength=size)
+        self.position_sums = numpy.column_stack([numpy.bincount(flat, flock.positions[:n, 0], size),
+                                                 numpy.bincount(flat, flock.positions[:n, 1], size)])
+        self.velocity_sums = numpy.column_stack([numpy.bincount(flat, flock.velocities[:n, 0], size),
+                                                 numpy.bincount(flat, flock.velocities[:n, 1], size)])
+
+    '''
+    Flat indexes of the cells (x, y), -1 for the cells outside of the summary.
+    '''
+    def index(self, x, y):
+        x = x - self.first[0]
+        y = y - self.first[1]
+        inside = (x >= 0) & (x < self.shape[0]) & (y >= 0) & (y < self.shape[1])
+        return numpy.where(inside, x * self.shape[1] + y, -1)
+
+
+'''
+Sums over the far cells of every boid of flock, as (counts, position sums, velocity sums) by boid: for every boid the cells within its field of view but not near its own cell (see approximate_neighbors) count as a whole, as many boids as the cell holds, all at the center of mass of the cell and moving at its mean velocity. Since that only depends on the cell of a boid (and its species), it is worked out once per cell rather than once per boid.
+
+This only depends on the state of the whole flock, simulations work it out once per tick and share it between the ranges of boids of approximate_neighbors.
+'''
+def far_neighbors(flock, near, cell_size=None):
+    n = flock.count
+    if cell_size is None:
+        cell_size = near / 2
+    diagonal = cell_size * math.sqrt(2)
+    positions = flock.positions
+    field_of_view = flock.field_of_view
+
+    counts = numpy.zeros(n)
+    position_sums = numpy.zeros((n, 2))
+    velocity_sums = numpy.zeros((n, 2))
+    if n == 0:
+        return counts, position_sums, velocity_sums
+
+    # The sums over the cells around every cell are a convolution of the summary with a ring shaped kernel, done with
+    # FFTs. The summary is padded so that the convolution does not wrap around.
+    aggregates = CellAggregates(flock, cell_size)
+    reach = int(math.ceil(field_of_view.max() / cell_size))
+    shape = (aggregates.shape[0] + 2 * reach, aggregates.shape[1] + 2 * reach)
+    summary = numpy.column_stack([aggregates.count, aggregates.position_sums, aggregates.velocity_sums])
+    summary = numpy.fft.rfft2(summary.T.reshape((5,) + aggregates.shape), shape)
+
+    steps = numpy.arange(-reach, reach + 1)
+    center_distances = cell_size * numpy.sqrt(steps[:, numpy.newaxis] ** 2 + steps ** 2)
+    cells = numpy.floor(positions[:n] / cell_size).astype(numpy.intp) - aggregates.first + reach
+    kinds = flock.species[:n]
+    for kind in numpy.unique(kinds):
+        kernel = (center_distances >= near + diagonal) & (center_distances < field_of_view[kind])
+        sums = numpy.fft.irfft2(summary * numpy.fft.rfft2(kernel, shape), shape)
+        boids = numpy.flatnonzero(kinds == kind)
+        x = cells[boids, 0]
+        y = cells[boids, 1]
+        counts[boids] = numpy.round(sums[0, x, y])
+        position_sums[boids] = sums[1:3, x, y].T
+        velocity_sums[boids] = sums[3:5, x, y].T
+
+    return counts, position_sums, velocity_sums
+
+
+'''
+Neighbors of the boids start to end (all of them by default) of flock, exact up close and approximate further away.
+
+The world is cut into square cells of side cell_size (half of near by default). Two cells are near each other when their centers are closer than near plus a cell diagonal, which holds for the cells of any two boids closer than near. Boids see the boids of the cells near their own one by one, exactly as find_neighbors would, and the cells further away but within the field of view through their summaries (see far_neighbors). far is what far_neighbors returned for the current state of the flock, worked out here when not given.
+
+Separation stays exact as long as its minimum distance is below near. Larger values of near are more accurate and slower, cell_size trades the cost of the near pairs (more of them with larger cells) against the cost of the cell summaries (more cells to look at with smaller cells).
+
+The summaries cost about the same whatever the number of boids, a few FFTs over the cells of the world, while the near pairs they save grow with the density of the flock. In the default 1280x720 world with near at 50 the exact search is faster up to about MIN_BOIDS boids, below which BasicSimulation does not approximate.
+
+Returns (pairs, far): the pairs of boids in near cells, as returned by find_neighbors, and the sums over the far cells as (counts, position sums, velocity sums) by boid, for Flock.cohesion and Flock.alignment.
+'''
+def approximate_neighbors(flock, near, cell_size=None, start=0, end=None, far=None):
+    if end is None:
+        end = flock.count
+    if cell_size is None:
+        cell_size = near / 2
+    diagonal = cell_size * math.sqrt(2)
+    positions = flock.positions
+
+    # Near cells, every boid in them is closer than near + 2 diagonals
+    pairs = flock.find_neighbors(start, end, near + 2 * diagonal)
+    start, end, ids, others, distances = pairs
+    offsets = numpy.floor(positions[others] / cell_size) - numpy.floor(positions[ids] / cell_size)
+    cell_distances = cell_size * numpy.sqrt((offsets ** 2).sum(axis=1))
+    keep = (cell_distances < near + diagonal) & (distances < flock.field_of_view[flock.species[ids]])
+    pairs = start, end, ids[keep], others[keep], distances[keep]
+    flock.pairs = pairs
+
+    if far is None:
+        far = far_neighbors(flock, near, cell_size)
+    counts, position_sums, velocity_sums = far
+    return pairs, (counts[start:end], position_sums[start:end], velocity_sums[start:end])
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import numpy
+
+# Summary measures of the state of a Flock, used to compare runs (see experiments/sweep.py). Distances ignore wrapping
+# around the edges of the world.
+
+
+'''
+How much the boids head the same way: the length of the average of their unit velocity vectors, 1 when they all fly in the same direction and close to 0 when their headings are random.
+'''
+def polarisation(flock):
+    velocities = flock.velocities[:flock.count]
+    speed = numpy.sqrt(velocities[:, 0] ** 2 + velocities[:, 1] ** 2)
+    moving = speed > 0
+    if not moving.any():
+        return 0.0
+    heading = velocities[moving] / speed[moving, numpy.newaxis]
+    return float(numpy.sqrt((heading.mean(axis=0) ** 2).sum()))
+
+
+'''
+How spread out the flock is: the average distance of the boids to their center of mass.
+'''
+def cohesion_radius(flock):
+    positions = flock.positions[:flock.count]
+    if len(positions) == 0:
+        return 0.0
+    offsets = positions - positions.mean(axis=0)
+    return float(numpy.sqrt(offsets[:, 0] ** 2 + offsets[:, 1] ** 2).mean())
+
+
+'''
+Average speed of the boids.
+'''
+def mean_speed(flock):
+    velocities = flock.velocities[:flock.count]
+    if len(velocities) == 0:
+        return 0.0
+    return float(numpy.sqrt(velocities[:, 0] ** 2 + velocities[:, 1] ** 2).mean())
+
+
+'''
+Average distance of the boids to the point (x, y).
+'''
+def distance_to(flock, x, y):
+    positions = flock.positions[:flock.count]
+    if len(positions) == 0:
+        return 0.0
+    return float(numpy.sqrt((positions[:, 0] - x) ** 2 + (positions[:, 1] - y) ** 2).mean())
+
+
+'''
+Fraction of the boids overlapping an obstacle of the ObstacleField field.
+'''
+def collision_fraction(flock, field):
+    if flock.count == 0:
+        return 0.0
+    columns, rows = field.cells(numpy.floor(flock.positions[:flock.count]))
+    return float((field.collision_count[columns, rows] > 0).mean())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import numpy
+
+
+class NeighborList(object):
+    '''
+    Verlet neighbor list of a Flock: the pairs of boids closer than the field of view plus skin are searched once and reused over the next ticks, only their distances are measured again.
+
+    Two boids cannot close a gap by more than the difference of how far they moved, so as long as the moves of any two boids since the list was built differ by at most skin every pair within the field of view is still among the cached ones. That difference is bounded both by twice the longest move and by the spread of the moves, which stays small while the flock flies along together even when it flies fast. The list is built again once the bound goes past skin, or when the boids change index (Flock.layout) or a different range or radius is asked for. When the boids only changed index because the whole flock was sorted (Flock.sort_by_x, which flock simulations do every tick) the cached pairs of the whole flock follow the boids to their new indexes instead.
+
+    A list caches the neighbors of one range of boids at a time, which is why simulations do not take a skin together with workers (whose ranges change every tick anyway, the flock being sorted again).
+
+    find_neighbors takes the same arguments and returns the same pairs as Flock.find_neighbors, so either can be used by the rules.
+    '''
+    def __init__(self, flock, skin=40):
+        self.flock = flock
+        self.skin = skin
+
+        # Candidate pairs (ids, others) of the last build, and what they were built for
+        self.ids = None
+        self.others = None
+        self.key = None
+        # Positions of the boids at the last build
+        self.reference = None
+
+        # Number of builds so far, to see how often the cache misses
+        self.builds = 0
+
+    '''
+    Whether the cached candidates can still be used for key.
+    '''
+    def valid(self, key):
+        if key != self.key:
+            return False
+
+        n = self.flock.count
+        moved = self.flock.positions[:n] - self.reference
+        longest = numpy.sqrt((moved[:, 0] ** 2 + moved[:, 1] ** 2).max())
+        spread = moved.max(axis=0) - moved.min(axis=0)
+        return min(2 * longest, numpy.sqrt((spread ** 2).sum())) <= self.skin
+
+    '''
+    Whether the cached candidates are those of the whole flock for key but for a sort of the flock since they were built.
+    '''
+    def sorted_since(self, key):
+        flock = self.flock
+        start, end, reach, n, layout = key
+        return (self.key is not None and self.key[:4] == key[:4] and (start, end) == (0, n) and
+                self.key[4] + 1 == layout == flock.sorted_layout)
+
+    '''
+    Move the cached candidates and reference positions to the indexes the last sort gave the boids.
+    '''
+    def follow_sort(self, key):
+        order = self.flock.sort_order
+        index = numpy.empty(len(order), dtype=numpy.intp)
+        index[order] = numpy.arange(len(order))
+        self.ids = index[self.ids]
+        self.others = index[self.others]
+        self.reference = self.reference[order]
+        self.key = key
+
+    '''
+    Cache the candidate pairs ids, others sorted by the ids of their boids (Flock.ids), then by those of their neighbors. The rules add up the pairs in order and the ids of the boids do not change when they are sorted, so the pairs found are in the same order however long ago the list was built: a run gives exactly the same result as a run resumed from a recording of it (see modules.recording), whose lists start empty.
+    '''
+    def store(self, ids, others):
+        flock = self.flock
+        # Every pair is there once, so a single key per pair sorts them
+        order = numpy.argsort(flock.ids[ids] * flock.next_id + flock.ids[others])
+        self.ids = ids[order]
+        self.others = others[order]
+
+    '''
+    Forget the cached candidates, the next call to find_neighbors searches them from scratch.
+    '''
+    def reset(self):
+        self.ids = None
+        self.others = None
+        self.key = None
+        self.reference = None
+
+    '''
+    Search the candidate pairs of the boids start to end from scratch, up to radius + skin.
+    '''
+    def build(self, key, start, end, radius):
+        flock = self.flock
+        pairs = flock.find_neighbors(start, end, radius + self.skin)
+        self.store(pairs[2], pairs[3])
+        self.key = key
+        self.reference = flock.positions[:flock.count].copy()
+        self.builds += 1
+
+    def find_neighbors(self, start=0, end=None, radius=None):
+        flock = self.flock
+        n = flock.count
+        if end is None:
+            end = n
+        if start >= end:
+            return flock.find_neighbors(start, end, radius)
+
+        by_species = radius is None
+        reach = flock.field_of_view[flock.species[start:end]].max() if by_species else radius
+        key = start, end, reach, n, flock.layout
+        if self.sorted_since(key):
+            self.follow_sort(key)
+        if not self.valid(key):
+            self.build(key, start, end, reach)
+
+        ids, others = self.ids, self.others
+        delta = flock.positions[ids] - flock.positions[others]
+        distances = numpy.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        if by_species and len(flock.species_list) > 1:
+            keep = distances < flock.field_of_view[flock.species[ids]]
+        else:
+            keep = distances < reach
+
+        flock.pairs = start, end, ids[keep], others[keep], distances[keep]
+        return flock.pairs
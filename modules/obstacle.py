@@ -1,29 +1,20 @@
 #!/usr/bin/env python
 # coding=utf-8
-from modules.constants import *
 
 
-class Obstacle(pygame.sprite.DirtySprite):
-    def __init__(self, x, y):
-        pygame.sprite.DirtySprite.__init__(self)
-
-        # Draw obstacles (squares)
-        self.image = pygame.Surface([30, 30])
-        self.image.fill(RED)
-
-        # Fetch the rectangle object that has the dimensions of the image
-        self.rect = self.image.get_rect()
-
+class Obstacle(object):
+    '''
+    Square obstacle of side size, with its top left corner at (x, y). Obstacles are plain data so that simulations never need pygame, modules.sprites.obstacle_sprites makes the sprites that draw them.
+    '''
+    def __init__(self, x, y, size=30):
         # Coordinates
-        self.rect.x = x
-        self.rect.y = y
+        self.x = x
+        self.y = y
+        self.size = size
 
         # Actual coordinates (center of block)
-        self.real_x = self.rect.x + 15
-        self.real_y = self.rect.y + 15
-
-        self.dirty = 0
+        self.real_x = self.x + size // 2
+        self.real_y = self.y + size // 2
 
-    def update(self):
-        """Just in case I want to expand this"""
-        pass
+        # Sprite drawing the obstacle, made on demand
+        self.sprite = None
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+
+import numpy
+
+
+class ObstacleField(object):
+    '''
+    Precomputed obstacle avoidance and collision data over the whole world.
+
+    Obstacles never move, so everything a boid needs to know about them only depends on where the boid is. The world is cut into square cells of side resolution, and for every cell the field stores:
+
+    - how many obstacles are within field_of_view of the middle of the cell and the sum of their centers, which is all obstacle avoidance needs since the push away from every visible obstacle is (position - center) / weight,
+    - the center of the nearest obstacle closer than danger_distance, if any, which overrides the velocity of the boid,
+    - how many obstacles a boid of side boid_size with its top left corner at the top left corner of the cell would overlap and the sum of their centers, for the collision response.
+
+    Avoidance and collisions then cost a single lookup per boid, however many obstacles there are. Positions are rounded to their cell, so a smaller resolution is more accurate (a resolution of 1 gives the exact collisions) but takes more memory.
+
+    The field covers the world plus a border of one field of view, since boids can stray a little outside of the world before they bounce back in. Boids further out see the nearest edge cell.
+    '''
+    def __init__(self, obstacles, field_of_view, width, height, resolution=4, boid_size=10, danger_distance=45):
+        self.field_of_view = field_of_view
+        self.resolution = resolution
+        self.boid_size = boid_size
+        self.danger_distance = danger_distance
+
+        self.origin = -field_of_view
+        self.columns = int(math.ceil((width + 2 * field_of_view) / resolution)) + 1
+        self.rows = int(math.ceil((height + 2 * field_of_view) / resolution)) + 1
+        shape = (self.columns, self.rows)
+
+        self.visible_count = numpy.zeros(shape)
+        self.visible_centers = numpy.zeros(shape + (2,))
+        self.nearest_danger = numpy.empty(shape)
+        self.nearest_danger.fill(numpy.inf)
+        self.danger_centers = numpy.zeros(shape + (2,))
+        self.collision_count = numpy.zeros(shape)
+        self.collision_centers = numpy.zeros(shape + (2,))
+
+        self.obstacles = []
+        for obstacle in obstacles:
+            self.add(obstacle)
+
+    '''
+    Return the cells covering the box from (left, top) to (right, bottom) as two slices into the field and the x and y coordinates of the points sampled in those cells, offset cells from their top left corner (the middle by default).
+    '''
+    def block(self, left, top, right, bottom, offset=0.5):
+        first_x = max(int(math.floor((left - self.origin) / self.resolution)), 0)
+        last_x = min(int(math.floor((right - self.origin) / self.resolution)) + 1, self.columns)
+        first_y = max(int(math.floor((top - self.origin) / self.resolution)), 0)
+        last_y = min(int(math.floor((bottom - self.origin) / self.resolution)) + 1, self.rows)
+
+        xs = self.origin + (numpy.arange(first_x, max(last_x, first_x)) + offset) * self.resolution
+        ys = self.origin + (numpy.arange(first_y, max(last_y, first_y)) + offset) * self.resolution
+        return slice(first_x, last_x), slice(first_y, last_y), xs, ys
+
+    '''
+    Add a single obstacle to the field.
+    '''
+    def add(self, obstacle):
+        self.obstacles.append(obstacle)
+        x, y = obstacle.x, obstacle.y
+        center = obstacle.real_x, obstacle.real_y
+
+        # Boids measure their distance to the corner of an obstacle, like Boid.distance does
+        reach = self.field_of_view
+        columns, rows, xs, ys = self.block(x - reach, y - reach, x + reach, y + reach)
+        distances = numpy.sqrt((xs[:, numpy.newaxis] - x) ** 2 + (ys[numpy.newaxis, :] - y) ** 2)
+
+        visible = distances <= self.field_of_view
+        self.visible_count[columns, rows] += visible
+        self.visible_centers[columns, rows][visible] += center
+
+        closer = (distances < self.danger_distance) & (distances < self.nearest_danger[columns, rows])
+        self.nearest_danger[columns, rows][closer] = distances[closer]
+        self.danger_centers[columns, rows][closer] = center
+
+        # A boid overlaps the obstacle when its top left corner is within boid_size above or left of the obstacle, or inside it.
+        # Collisions are checked on whole pixel positions (like sprite rects), so the top left corners of the cells are sampled.
+        size = self.boid_size
+        columns, rows, xs, ys = self.block(x - size, y - size, x + obstacle.size, y + obstacle.size, 0)
+        overlap = (((xs > x - size) & (xs < x + obstacle.size))[:, numpy.newaxis] &
+                   ((ys > y - size) & (ys < y + obstacle.size))[numpy.newaxis, :])
+        self.collision_count[columns, rows] += overlap
+        self.collision_centers[columns, rows][overlap] += center
+
+    '''
+    Return the indexes (columns, rows) of the cells containing positions.
+    '''
+    def cells(self, positions):
+        columns = numpy.floor((positions[:, 0] - self.origin) / self.resolution).astype(numpy.intp)
+        rows = numpy.floor((positions[:, 1] - self.origin) / self.resolution).astype(numpy.intp)
+        numpy.clip(columns, 0, self.columns - 1, out=columns)
+        numpy.clip(rows, 0, self.rows - 1, out=rows)
+        return columns, rows
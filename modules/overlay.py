@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+from modules.constants import *
+
+WHITE = (255, 255, 255)
+GREY = (128, 128, 128)
+
+
+class ProfilerOverlay(pygame.sprite.DirtySprite):
+    '''
+    On screen view of a Profiler: p50/p99 frame time, p50/p99 of every phase and a histogram of the recent frame times.
+
+    Add it to the LayeredDirty group of the experiment on a layer above the boids and call update() once per frame. It starts hidden, toggle() shows or hides it. The text is only rendered again every refresh frames.
+    '''
+    def __init__(self, profiler, refresh=15, width=280, histogram_height=60):
+        pygame.sprite.DirtySprite.__init__(self)
+
+        self.profiler = profiler
+        self.refresh = refresh
+        self.width = width
+        self.histogram_height = histogram_height
+        self.font = pygame.font.Font(None, 18)
+        self.frames = 0
+
+        self.image = pygame.Surface((width, histogram_height))
+        self.rect = self.image.get_rect()
+        self.rect.x = 5
+        self.rect.y = 5
+
+        self.visible = 0
+        self.dirty = 0
+
+    def toggle(self):
+        self.visible = 0 if self.visible else 1
+        self.dirty = 1
+        self.frames = 0
+
+    def update(self):
+        if not self.visible:
+            return
+
+        self.frames += 1
+        if self.frames % self.refresh != 1 and self.refresh > 1:
+            return
+
+        profiler = self.profiler
+        lines = []
+        if profiler.percentile(50) is not None:
+            lines.append("frame  p50 {0:6.2f} ms  p99 {1:6.2f} ms".format(
+                1000 * profiler.percentile(50), 1000 * profiler.percentile(99)))
+            for name in profiler.phases():
+                lines.append("{0:<18} {1:6.2f} {2:6.2f}".format(
+                    name, 1000 * profiler.percentile(50, name), 1000 * profiler.percentile(99, name)))
+
+        line_height = self.font.get_linesize()
+        height = line_height * len(lines) + self.histogram_height + 10
+        self.image = pygame.Surface((self.width, height))
+        self.image.fill(BLACK)
+
+        for i, line in enumerate(lines):
+            self.image.blit(self.font.render(line, True, WHITE), (5, 5 + i * line_height))
+
+        # Histogram of the frame times of the window, from fastest (left) to slowest (right)
+        counts, edges = profiler.histogram(self.width // 8)
+        if len(counts) > 0:
+            top = height - self.histogram_height - 5
+            tallest = max(counts)
+            for i, count in enumerate(counts):
+                bar = int(round(count / tallest * self.histogram_height))
+                if bar > 0:
+                    self.image.fill(GREY, (i * 8 + 1, top + self.histogram_height - bar, 6, bar))
+
+        self.rect = self.image.get_rect(topleft=self.rect.topleft)
+        self.dirty = 1
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding=utf-8
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+# Simulation handled by the worker processes, inherited from the parent when the pool forks
+_simulation = None
+
+
+def _init_process(simulation):
+    global _simulation
+    _simulation = simulation
+
+
+def _run_in_process(task):
+    state, start, end = task
+    # The parent may have changed since the fork, catch up with it before applying the rules
+    _simulation.sync(state)
+    _simulation.rules(start, end)
+
+
+class WorkerPool(object):
+    '''
+    Splits the rules of a FlockSimulation across several workers.
+
+    The boids must be sorted by x coordinate (Flock.sort_by_x), they are cut into as many consecutive ranges (vertical stripes of the world) as there are tasks. Every worker applies FlockSimulation.rules to its own ranges. The rules only read the state of the current tick and only write the next velocities of their own range (see Flock), so the workers never need to lock anything.
+
+    With processes=True the workers are forked processes sharing the arrays of the flock through shared memory (Flock.share), which lets the whole rule pipeline run on every core. Forking is needed to share the memory, so this only works on platforms that can fork. With processes=False the workers are threads of this process, which only run in parallel while numpy has released the global interpreter lock.
+    '''
+    def __init__(self, simulation, workers, processes=True, tasks_per_worker=2):
+        self.simulation = simulation
+        self.workers = workers
+        self.processes = processes
+        # More tasks than workers evens out stripes that happen to be more crowded than others
+        self.tasks = workers * tasks_per_worker
+
+        if processes:
+            simulation.flock.share()
+            try:
+                context = multiprocessing.get_context('fork')
+            except AttributeError:
+                # Python 2 always forks
+                context = multiprocessing
+            self.pool = context.Pool(workers, _init_process, (simulation,))
+        else:
+            self.pool = ThreadPool(workers)
+
+    '''
+    Split the boids 0 to count into ranges of about the same size.
+    '''
+    def ranges(self, count):
+        bounds = [count * i // self.tasks for i in range(self.tasks + 1)]
+        return [(bounds[i], bounds[i + 1]) for i in range(self.tasks) if bounds[i] < bounds[i + 1]]
+
+    '''
+    Apply the rules to every boid of the flock, returns once all the workers are done.
+    '''
+    def run(self):
+        ranges = self.ranges(self.simulation.flock.count)
+
+        if self.processes:
+            state = self.simulation.state()
+            self.pool.map(_run_in_process, [(state, start, end) for start, end in ranges])
+        else:
+            rules = self.simulation.rules
+            self.pool.map(lambda bounds: rules(*bounds), ranges)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
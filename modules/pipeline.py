@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import threading
+import time
+from collections import deque
+from timeit import default_timer
+
+import numpy
+
+from modules.flock import *
+
+
+class Snapshot(object):
+    '''
+    Positions of the boids of a simulation at one tick, copied so that they can be drawn while the simulation goes on. The arrays are read only, nothing changes a snapshot once it is published.
+
+    flocks holds (positions, species, ids) for every flock of the simulation (Simulation.flocks), published the default_timer() time it was taken at.
+    '''
+    def __init__(self, simulation, published):
+        self.tick = simulation.ticks
+        self.published = published
+        self.flocks = []
+        for flock in simulation.flocks():
+            n = flock.count
+            state = flock.positions[:n].copy(), flock.species[:n].copy(), flock.ids[:n].copy()
+            for array in state:
+                array.flags.writeable = False
+            self.flocks.append(state)
+
+
+class Pipeline(object):
+    '''
+    Runs a simulation for a window, either one step per frame on the thread that draws (threaded=False, the simulation is then drawn as is) or on a thread of its own, from start to close.
+
+    Threaded, the simulation thread is the producer: it steps the simulation against the clock, speed times faster than real time, and publishes a Snapshot after every tick into a ring buffer of the last size snapshots, dropping the oldest. The thread that draws is the consumer: step copies the newest snapshots into flocks of its own (see flock) and the renderer draws those, so a slow frame never holds up the simulation and a slow tick never holds up the display. pygame only draws and gets events on the main thread, which is why the simulation is the one moved to another thread.
+
+    The copies are interpolated between the two newest ticks: a frame drawn a fraction of a timestep after the newest tick was published shows the boids that fraction of the way from the tick before to it, so the boids move smoothly whatever the frame rate and tick rate. This draws one tick behind the simulation. Boids are matched between the two ticks by id (Flock.ids), whatever their indexes. Boids spawned at the newest tick and boids that wrapped around the world are drawn at the newest tick.
+
+    Anything that changes the simulation from the drawing thread (goal, spawns...) must hold lock, which the simulation thread holds while it steps. Exceptions raised by the simulation are raised again by step or close.
+    '''
+    def __init__(self, simulation, threaded=False, speed=1, size=4):
+        self.simulation = simulation
+        self.threaded = threaded
+        # How many times faster than real time the simulation runs
+        self.speed = speed
+        self.lock = threading.RLock()
+
+        # Ticks published so far, the newest of them last
+        self.snapshots = deque(maxlen=size)
+        self.snapshots_lock = threading.Lock()
+        # Flocks drawn instead of those of the simulation when threaded, in the order of Simulation.flocks()
+        self.flocks = []
+        for flock in simulation.flocks():
+            copy = flock
+            if threaded:
+                copy = Flock(flock.width, flock.height, max(len(flock.positions), 1), flock.size)
+                copy.species_list = flock.species_list
+            self.flocks.append(copy)
+
+        # Exception raised in the simulation thread, raised again by step or close
+        self.error = None
+        self.running = False
+        self.thread = None
+
+    '''
+    Start the simulation thread when threaded, once everything the simulation needs is set up (profiler...).
+    '''
+    def start(self):
+        if not self.threaded or self.thread is not None:
+            return
+        self.simulation.on_tick.append(self.publish)
+        self.publish()
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    '''
+    Flock to draw for the flock of the simulation: a copy of it updated by step when threaded, the flock itself otherwise.
+    '''
+    def flock(self, flock):
+        for original, copy in zip(self.simulation.flocks(), self.flocks):
+            if original is flock:
+                return copy
+        raise ValueError("The flock is not one of the simulation")
+
+    '''
+    Publish the state of the simulation at the current tick. Called by the simulation thread after every tick.
+    '''
+    def publish(self):
+        snapshot = Snapshot(self.simulation, default_timer())
+        with self.snapshots_lock:
+            self.snapshots.append(snapshot)
+
+    def _run(self):
+        simulation = self.simulation
+        last = default_timer()
+        try:
+            while self.running:
+                now = default_timer()
+                with self.lock:
+                    simulation.step((now - last) * self.speed)
+                    # Time until the next tick is due
+                    wait = (simulation.timestep - simulation.accumulator) / self.speed
+                last = now
+                # Sleeping lets the drawing thread run, even when the next tick is already due
+                time.sleep(max(wait, 0.0005))
+        except Exception as error:
+            self.error = error
+
+    '''
+    Advance by a frame that took dt seconds and return the tick drawn. Unthreaded this steps the simulation, threaded it only updates the flocks to draw from the newest snapshots and the tick drawn has a fraction (see interpolate).
+    '''
+    def step(self, dt):
+        if not self.threaded:
+            self.simulation.step(dt * self.speed)
+            return self.simulation.ticks
+        if self.error is not None:
+            raise self.error
+
+        with self.snapshots_lock:
+            newest = self.snapshots[-1]
+            previous = self.snapshots[-2] if len(self.snapshots) > 1 else newest
+        fraction = min((default_timer() - newest.published) * self.speed / self.simulation.timestep, 1)
+
+        for copy, before, after in zip(self.flocks, previous.flocks, newest.flocks):
+            self.interpolate(copy, before, after, fraction)
+        return previous.tick + (newest.tick - previous.tick) * fraction
+
+    '''
+    Set the boids of flock fraction of the way from the flock state before to the flock state after, (positions, species, ids) like in a Snapshot.
+    '''
+    def interpolate(self, flock, before, after, fraction):
+        positions, species, ids = after
+        n = len(positions)
+        if len(flock.positions) < n:
+            flock.grow(max(2 * len(flock.positions), n))
+        flock.count = n
+        flock.species[:n] = species
+        flock.ids[:n] = ids
+        flock.sorted_by_x = False
+        flock.layout += 1
+
+        earlier, earlier_ids = before[0], before[2]
+        if len(earlier_ids) == 0:
+            flock.positions[:n] = positions
+            return
+        if not numpy.array_equal(earlier_ids, ids):
+            # Find every boid in the tick before by its id, boids that were not there yet do not move
+            order = numpy.argsort(earlier_ids)
+            found = numpy.minimum(numpy.searchsorted(earlier_ids[order], ids), len(order) - 1)
+            known = earlier_ids[order][found] == ids
+            earlier = numpy.where(known[:, numpy.newaxis], earlier[order][found], positions)
+
+        # Boids that moved more than half of the world wrapped around it, they jump straight to their new place
+        moves = positions - earlier
+        moves[numpy.abs(moves) > (flock.width / 2, flock.height / 2)] = 0
+        flock.positions[:n] = positions - (1 - fraction) * moves
+
+    '''
+    Stop the simulation thread and wait for it, raising whatever it failed with.
+    '''
+    def close(self):
+        if self.thread is not None:
+            self.running = False
+            self.thread.join()
+            self.thread = None
+            self.simulation.on_tick.remove(self.publish)
+        if self.error is not None:
+            raise self.error
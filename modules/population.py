@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import numpy
+
+from modules.constants import *
+from modules.species import *
+
+
+class Population(object):
+    '''
+    Births, deaths and respawns of the boids of a Flock during a run, without allocating anything per tick.
+
+    The flock gets room for capacity boids up front (Flock.reserve), which is the pool: its rows past Flock.count are the free list. spawn hands out the first free rows (Flock.spawn) and despawn gives rows back by moving the last boids into the holes (Flock.remove), so the boids stay packed for the rules and the arrays are never reallocated. Boids are drawn by the pooled sprites of the flock (Flock.sync_sprites), spawning does not make sprites or load images either. A spawn that does not fit in the pool only adds the boids that do.
+
+    With respawn set, every boid that is despawned comes back respawn ticks later (calls to tick), as a boid of the same species at a random place of the world. The respawns waiting are kept in arrays of capacity rows as well. A boid waiting to respawn still holds its place in the pool: living boids and respawns waiting are never more than capacity together, and a respawn that finds no free row waits for one.
+    '''
+    def __init__(self, flock, capacity=None, respawn=None, border=BORDER):
+        self.flock = flock
+        self.capacity = max(capacity or 0, flock.count)
+        flock.reserve(self.capacity)
+        self.respawn = respawn
+        # Boids are spawned at random places at least border away from the edges of the world
+        self.border = border
+
+        # Respawns waiting, in their first pending rows: the tick each is due at and its species
+        self.due = numpy.zeros(self.capacity, dtype=numpy.int64)
+        self.due_species = numpy.zeros(self.capacity, dtype=numpy.int16)
+        self.pending = 0
+
+        # Ticks so far, and the boids born (spawned or respawned) and dead (despawned) in them
+        self.ticks = 0
+        self.births = 0
+        self.deaths = 0
+
+    '''
+    Return count random positions inside the world, or within spread of (x, y) when given.
+    '''
+    def positions(self, count, x=None, y=None, spread=20):
+        flock = self.flock
+        if x is None or y is None:
+            low = min(self.border, flock.width / 2), min(self.border, flock.height / 2)
+            high = flock.width - low[0], flock.height - low[1]
+        else:
+            low = x - spread, y - spread
+            high = x + spread, y + spread
+        return flock.rng.uniform(low, high, (count, 2))
+
+    '''
+    Add up to count boids of species (a Species or its index in the species list of the flock), at random places or around (x, y). Returns the indexes of the new boids, fewer than count when the pool runs out, the places of the boids waiting to respawn included.
+    '''
+    def spawn(self, count, species, x=None, y=None, spread=20):
+        count = max(min(count, self.capacity - self.flock.count - self.pending), 0)
+        if isinstance(species, Species):
+            species = self.flock.species_index(species)
+        self.births += count
+        return self.flock.spawn(self.positions(count, x, y, spread), species)
+
+    '''
+    Remove the boids at indexes from the flock (an array of distinct indexes), and queue them for respawn if it is set.
+    '''
+    def despawn(self, indexes):
+        count = len(indexes)
+        if count == 0:
+            return
+        if self.respawn is not None:
+            waiting = slice(self.pending, self.pending + count)
+            self.due[waiting] = self.ticks + self.respawn
+            self.due_species[waiting] = self.flock.species[indexes]
+            self.pending += count
+        self.flock.remove(indexes)
+        self.deaths += count
+
+    '''
+    Advance by a tick, respawning the boids that are due, as many as there are free rows in the pool. Call once per tick, after the boids died.
+    '''
+    def tick(self):
+        self.ticks += 1
+        if self.pending == 0:
+            return
+
+        due = self.due[:self.pending] <= self.ticks
+        # The first ones queued come back first, the others stay queued until rows are free again
+        free = max(self.capacity - self.flock.count, 0)
+        due[numpy.nonzero(due)[0][free:]] = False
+        ready = int(due.sum())
+        if ready == 0:
+            return
+
+        species = self.due_species[:self.pending][due]
+        waiting = ~due
+        left = self.pending - ready
+        self.due[:left] = self.due[:self.pending][waiting]
+        self.due_species[:left] = self.due_species[:self.pending][waiting]
+        self.pending = left
+
+        self.flock.spawn(self.positions(ready), species)
+        self.births += ready
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import numpy
+
+from modules.spatial_grid import neighbor_pairs
+
+
+class Predation(object):
+    '''
+    Interactions between a Flock of prey and a Flock of predators, batched over both flocks.
+
+    A single neighbor search between the two flocks (find) answers both "which predators can this prey see" and "which prey can this predator see". flee, attack and kills then work on those pairs with array operations, like the rules of Flock. As with the rules, call them between begin_tick and update of both flocks, except for kills which comes after update.
+    '''
+    def __init__(self, prey, predators):
+        self.prey = prey
+        self.predators = predators
+
+        # Pairs (predator ids, prey ids, distances) found by the last call to find
+        self.pairs = None
+
+    '''
+    Find every pair of a predator and a prey where at least one of them can see the other.
+    '''
+    def find(self):
+        prey, predators = self.prey, self.predators
+        if prey.count == 0 or predators.count == 0:
+            self.pairs = numpy.empty(0, dtype=numpy.intp), numpy.empty(0, dtype=numpy.intp), numpy.empty(0)
+            return self.pairs
+
+        radius = max(prey.field_of_view[prey.species[:prey.count]].max(),
+                     predators.field_of_view[predators.species[:predators.count]].max())
+        self.pairs = neighbor_pairs(predators.positions[:predators.count], radius, prey.positions[:prey.count])
+        return self.pairs
+
+    '''
+    Prey behavior, every prey that can see a predator moves away from where the nearest one of them is going, by a random factor of 1 or 2 along each axis so that the predator does not just need to outrun the prey in a straight line. Prey that do not see any predator go back towards the middle of the world.
+    '''
+    def flee(self):
+        prey, predators = self.prey, self.predators
+        hunters, ids, distances = self.pairs
+        seen = distances < prey.field_of_view[prey.species[ids]]
+        hunters, ids, distances = hunters[seen], ids[seen], distances[seen]
+
+        # Nearest predator of every prey, found with a per prey minimum instead of a sort
+        nearest = numpy.empty(prey.count)
+        nearest.fill(numpy.inf)
+        numpy.minimum.at(nearest, ids, distances)
+        chosen = distances == nearest[ids]
+        hunter = numpy.empty(prey.count, dtype=numpy.intp)
+        # When two predators are exactly as close the first pair wins
+        hunter[ids[chosen][::-1]] = hunters[chosen][::-1]
+
+        fleeing = numpy.isfinite(nearest)
+        fleeing_ids = numpy.nonzero(fleeing)[0]
+        hunter = hunter[fleeing]
+        projected = predators.positions[hunter] + 2 * predators.velocities[hunter]
+        randomness = prey.rng.randint(1, 3, (len(fleeing_ids), 2))
+        weight = prey.obstacle_avoidance_weight[prey.species[fleeing_ids], numpy.newaxis]
+        prey.next_velocities[fleeing_ids] += -((projected - prey.positions[fleeing_ids]) / weight) * randomness
+
+        prey.go_to_middle(~fleeing)
+
+    '''
+    Predatory behavior, every predator moves towards where the prey it can see that is furthest from the center of mass of those prey is going. Predators that do not see any prey go back towards the middle of the world.
+    '''
+    def attack(self):
+        prey, predators = self.prey, self.predators
+        n = predators.count
+        if n == 0:
+            return
+        hunters, ids, distances = self.pairs
+        seen = distances < predators.field_of_view[predators.species[hunters]]
+        hunters, ids = hunters[seen], ids[seen]
+
+        counts = numpy.bincount(hunters, minlength=n)
+        hunting = counts > 0
+        center_x = numpy.bincount(hunters, prey.positions[ids, 0], n) / numpy.maximum(counts, 1)
+        center_y = numpy.bincount(hunters, prey.positions[ids, 1], n) / numpy.maximum(counts, 1)
+
+        # Prey furthest from the center of mass of the visible prey, selected with a per predator maximum instead of a sort
+        spread = numpy.sqrt((center_x[hunters] - prey.positions[ids, 0]) ** 2 +
+                            (center_y[hunters] - prey.positions[ids, 1]) ** 2)
+        furthest = numpy.empty(n)
+        furthest.fill(-numpy.inf)
+        numpy.maximum.at(furthest, hunters, spread)
+        chosen = spread == furthest[hunters]
+        target = numpy.empty(n, dtype=numpy.intp)
+        target[hunters[chosen][::-1]] = ids[chosen][::-1]
+
+        hunting_ids = numpy.nonzero(hunting)[0]
+        target = target[hunting]
+        intercept = prey.positions[target] + 2 * prey.velocities[target]
+        weight = predators.goal_weight[predators.species[hunting_ids], numpy.newaxis]
+        predators.next_velocities[hunting_ids] += (intercept - predators.positions[hunting_ids]) / weight
+
+        predators.go_to_middle(~hunting)
+
+    '''
+    If a predator manages to touch a prey, the prey gets eaten! Every prey overlapping a predator is removed from its flock, all at once, by despawn (called with their indexes, Flock.remove of the prey by default, see modules.population.Population.despawn). Call after update, returns the number of prey eaten.
+    '''
+    def kills(self, despawn=None):
+        prey, predators = self.prey, self.predators
+        if prey.count == 0 or predators.count == 0:
+            return 0
+
+        # Sprites overlap when their whole pixel positions (truncated like sprite rects) are closer than the size of the sprites along both axes
+        reach = (prey.size + predators.size) / 2
+        predator_positions = numpy.trunc(predators.positions[:predators.count])
+        prey_positions = numpy.trunc(prey.positions[:prey.count])
+        hunters, ids, distances = neighbor_pairs(predator_positions, reach * numpy.sqrt(2), prey_positions)
+        delta = numpy.abs(predator_positions[hunters] - prey_positions[ids])
+        touching = (delta[:, 0] < reach) & (delta[:, 1] < reach)
+
+        eaten = numpy.unique(ids[touching])
+        if len(eaten) > 0:
+            (despawn or prey.remove)(eaten)
+        return len(eaten)
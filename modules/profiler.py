@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import csv
+import json
+import threading
+from collections import deque
+from timeit import default_timer
+
+
+class Profiler(object):
+    '''
+    Measures the time spent in named phases of the simulation and of the main loop.
+
+        with profiler.phase('cohesion'):
+            flock.cohesion()
+
+    Calling frame() once per rendered frame closes the current frame. The last window frames are kept for the rolling statistics (percentile, histogram), and every frame is kept for export when record is true.
+
+    Phases can be measured from another thread than the one calling frame (a simulation running on a thread of its own, see modules.pipeline), they count in the frame they end in.
+    '''
+    def __init__(self, window=600, record=False):
+        # Total seconds and number of calls per phase since the last reset
+        self.totals = {}
+        self.calls = {}
+
+        # Rolling window of (frame seconds, {phase: seconds}) for the last frames
+        self.frames = deque(maxlen=window)
+        # Every frame since the last reset, if recording
+        self.record = record
+        self.trace = []
+
+        # Seconds per phase in the frame being measured
+        self.current = {}
+        self.last_frame = None
+        # Held to add to the current frame or close it, frames are never changed once closed
+        self.lock = threading.Lock()
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    '''
+    Forget everything measured so far.
+    '''
+    def reset(self):
+        self.totals.clear()
+        self.calls.clear()
+        self.frames.clear()
+        del self.trace[:]
+        self.current = {}
+        self.last_frame = None
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.current[name] = self.current.get(name, 0.0) + seconds
+
+    '''
+    Mark the end of a frame. The time of a frame is the time between two calls.
+    '''
+    def frame(self):
+        now = default_timer()
+        with self.lock:
+            if self.last_frame is not None:
+                entry = (now - self.last_frame, self.current)
+                self.frames.append(entry)
+                if self.record:
+                    self.trace.append(entry)
+            self.current = {}
+            self.last_frame = now
+
+    '''
+    Names of every phase seen in the window, in alphabetical order.
+    '''
+    def phases(self):
+        names = set()
+        for frame_seconds, phases in self.frames:
+            names.update(phases)
+        return sorted(names)
+
+    '''
+    Per frame seconds of a phase over the window, or of whole frames if name is None. Frames where the phase did not run count as 0.
+    '''
+    def samples(self, name=None):
+        if name is None:
+            return [frame_seconds for frame_seconds, phases in self.frames]
+        return [phases.get(name, 0.0) for frame_seconds, phases in self.frames]
+
+    '''
+    The p-th percentile (0 to 100) of the per frame seconds of a phase, or of whole frames if name is None. None if there is nothing measured yet.
+    '''
+    def percentile(self, p, name=None):
+        values = sorted(self.samples(name))
+        if len(values) == 0:
+            return None
+        return values[int(round(p / 100 * (len(values) - 1)))]
+
+    '''
+    Histogram of the per frame seconds of a phase (or of whole frames) over the window. Returns the counts of the bins and the bin edges.
+    '''
+    def histogram(self, bins=20, name=None):
+        values = self.samples(name)
+        if len(values) == 0:
+            return [], []
+
+        low, high = min(values), max(values)
+        width = (high - low) / bins or 1.0
+        counts = [0] * bins
+        for value in values:
+            counts[min(int((value - low) / width), bins - 1)] += 1
+
+        return counts, [low + i * width for i in range(bins + 1)]
+
+    '''
+    Summary of the window: frame time and time per phase, in milliseconds.
+    '''
+    def summary(self):
+        names = [None] + self.phases()
+        result = {}
+        for name in names:
+            values = self.samples(name)
+            if len(values) == 0:
+                continue
+            result[name or 'frame'] = {
+                'mean_ms': 1000 * sum(values) / len(values),
+                'p50_ms': 1000 * self.percentile(50, name),
+                'p99_ms': 1000 * self.percentile(99, name),
+            }
+        return result
+
+    '''
+    Write the recorded frames to path, as CSV (one row per frame, one column per phase) if it ends in .csv and as JSON otherwise.
+    '''
+    def export(self, path):
+        frames = self.trace if self.record else list(self.frames)
+        names = set()
+        for frame_seconds, phases in frames:
+            names.update(phases)
+        names = sorted(names)
+
+        with open(path, 'w') as output:
+            if path.endswith('.csv'):
+                writer = csv.writer(output)
+                writer.writerow(['frame', 'frame_ms'] + [name + '_ms' for name in names])
+                for i, (frame_seconds, phases) in enumerate(frames):
+                    writer.writerow([i, 1000 * frame_seconds] + [1000 * phases.get(name, 0.0) for name in names])
+            else:
+                json.dump({
+                    'summary': self.summary(),
+                    'phases': names,
+                    'frames': [dict([('frame_ms', 1000 * frame_seconds)] +
+                                    [(name + '_ms', 1000 * seconds) for name, seconds in phases.items()])
+                               for frame_seconds, phases in frames],
+                }, output, indent=1, sort_keys=True)
+
+
+class _Phase(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = default_timer()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, default_timer() - self.start)
+
+
+class NullProfiler(object):
+    '''
+    Profiler that measures nothing, used when profiling is off. Every phase is the same do nothing context manager, so no objects are created or clocks read.
+    '''
+    totals = {}
+    calls = {}
+
+    def phase(self, name):
+        return _null_phase
+
+    def reset(self):
+        pass
+
+    def add(self, name, seconds):
+        pass
+
+    def frame(self):
+        pass
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_phase = _NullPhase()
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import json
+import math
+import struct
+
+import numpy
+
+from modules import integrators, simulation as simulations
+from modules.obstacle import *
+from modules.species import *
+
+# A recording is a file header, JSON metadata about the run and then frames, one after the other. Everything is little
+# endian and every section is padded to a multiple of 8 bytes, so that the arrays of a frame can be read in place from a
+# memory map of the file.
+#
+# Frame:
+#   FRAME_HEADER   magic, size of the frame in bytes, tick, flags, number of flocks, number of obstacles, goal x and y
+#   per flock:
+#     FLOCK_HEADER number of boids n, number of species s
+#     float64      parameters (s, len(PARAMETERS)), see modules.species
+#     float64      positions (n, 2)
+#     float64      velocities (n, 2)
+#     int64        ids (n), see Flock.ids (version 3 on)
+#     int16        species (n), padded
+#   float64        obstacle centers (Obstacle.real_x, real_y) (number of obstacles, 2)
+#   int64          obstacle sides (Obstacle.size) (number of obstacles), version 5 on
+#   keyframes only:
+#     float64      accumulator, Python gauss_next (nan for None), numpy cached gaussian
+#     int64        Python state version, numpy position, numpy has_gauss
+#     uint32       Python random state (625) then numpy random state (624), padded
+#     per flock (version 2 on):
+#       float64    last accelerations (n, 2), for velocity Verlet (see Flock.update)
+#     int64        id of the next boid of every flock (Flock.next_id) (version 3 on)
+#     scenarios with a Population (capacity in the metadata), version 4 on:
+#       int64      ticks, births, deaths and number of respawns waiting p, see modules.population
+#       int64      ticks the respawns are due at (p)
+#       int16      species of the respawns (p), padded
+
+MAGIC = b'BOIDREC\x00'
+VERSION = 5
+# Oldest version that can still be read. Version 1 keyframes have no accelerations, boids have no ids before version 3,
+# respawns are not recorded before version 4 and obstacles are all of side 30 before version 5.
+MIN_VERSION = 1
+FILE_HEADER = struct.Struct('<8sII')
+
+FRAME_MAGIC = b'FRAM'
+FRAME_HEADER = struct.Struct('<4sIQIIIIdd')
+FLOCK_HEADER = struct.Struct('<II')
+
+# Frame flags
+KEYFRAME = 1
+
+PYTHON_STATE = 625
+NUMPY_STATE = 624
+KEYFRAME_SIZE = 3 * 8 + 3 * 8 + (PYTHON_STATE + NUMPY_STATE) * 4
+
+
+def _padding(size):
+    return -size % 8
+
+
+def _flock_size(count, species):
+    return FLOCK_HEADER.size + species * len(PARAMETERS) * 8 + count * 40 + count * 2 + _padding(count * 2)
+
+
+class Recorder(object):
+    '''
+    Records a Simulation to path, one frame per call to record().
+
+    Frames are only ever appended to the file, a recording is readable (see Recording) while it is still being written and a run that crashes keeps every frame written before. Every keyframe_interval frames the frame is a keyframe, which also saves the state of the random generators and of the accumulator so that the run can be resumed from it exactly. The other frames hold what replaying needs: the boids, the species, the obstacles and the goal.
+    '''
+    def __init__(self, path, simulation, keyframe_interval=60):
+        self.simulation = simulation
+        self.keyframe_interval = keyframe_interval
+        self.frames = 0
+
+        metadata = {
+            'scenario': type(simulation).__name__,
+            'width': simulation.width,
+            'height': simulation.height,
+            'seed': simulation.seed,
+            'timestep': simulation.timestep,
+            'max_ticks_per_step': simulation.max_ticks_per_step,
+            'integrator': simulation.integrator,
+            'dt': simulation.dt,
+            'min_speed': simulation.min_speed,
+            'skin': simulation.skin,
+            # Settings of only some of the scenarios, None for the others
+            'flow_resolution': getattr(simulation, 'flow_resolution', None),
+            'lod': getattr(simulation, 'lod', None),
+            'respawn': None,
+            'capacity': None,
+            'parameters': list(PARAMETERS),
+            # Names of the species known when the recording started, by flock
+            'species': [[species.name for species in flock.species_list] for flock in simulation.flocks()],
+        }
+        population = getattr(simulation, 'population', None)
+        if population is not None:
+            metadata['respawn'] = population.respawn
+            metadata['capacity'] = population.capacity
+        metadata = json.dumps(metadata).encode('utf-8')
+        metadata += b' ' * _padding(FILE_HEADER.size + len(metadata))
+
+        self.file = open(path, 'wb')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, len(metadata)))
+        self.file.write(metadata)
+
+    '''
+    Append the current state of the simulation to the recording.
+    '''
+    def record(self):
+        simulation = self.simulation
+        flocks = simulation.flocks()
+        obstacles = getattr(simulation, 'obstacles', [])
+        population = getattr(simulation, 'population', None)
+        keyframe = self.frames % self.keyframe_interval == 0
+
+        size = FRAME_HEADER.size + len(obstacles) * 24
+        size += sum(_flock_size(flock.count, len(flock.species_list)) for flock in flocks)
+        if keyframe:
+            size += KEYFRAME_SIZE + _padding(KEYFRAME_SIZE) + sum(flock.count * 16 + 8 for flock in flocks)
+            if population is not None:
+                size += 32 + population.pending * 10 + _padding(population.pending * 2)
+
+        goal_x = getattr(simulation, 'goal_x', float('nan'))
+        goal_y = getattr(simulation, 'goal_y', float('nan'))
+        write = self.file.write
+        write(FRAME_HEADER.pack(FRAME_MAGIC, size, simulation.ticks, KEYFRAME if keyframe else 0,
+                                len(flocks), len(obstacles), 0, goal_x, goal_y))
+
+        for flock in flocks:
+            n = flock.count
+            write(FLOCK_HEADER.pack(n, len(flock.species_list)))
+            write(numpy.column_stack([getattr(flock, name) for name in PARAMETERS]).astype('<f8').tobytes())
+            write(flock.positions[:n].astype('<f8').tobytes())
+            write(flock.velocities[:n].astype('<f8').tobytes())
+            write(flock.ids[:n].astype('<i8').tobytes())
+            write(flock.species[:n].astype('<i2').tobytes())
+            write(b'\0' * _padding(n * 2))
+
+        write(numpy.array([(obstacle.real_x, obstacle.real_y) for obstacle in obstacles], dtype='<f8').tobytes())
+        write(numpy.array([obstacle.size for obstacle in obstacles], dtype='<i8').tobytes())
+
+        if keyframe:
+            version, python_state, gauss_next = simulation.rng.getstate()
+            name, numpy_state, position, has_gauss, cached_gaussian = simulation.numpy_rng.get_state()
+            write(numpy.array([simulation.accumulator, numpy.nan if gauss_next is None else gauss_next,
+                               cached_gaussian], dtype='<f8').tobytes())
+            write(numpy.array([version, position, has_gauss], dtype='<i8').tobytes())
+            write(numpy.array(python_state, dtype='<u4').tobytes())
+            write(numpy.asarray(numpy_state, dtype='<u4').tobytes())
+            write(b'\0' * _padding(KEYFRAME_SIZE))
+            for flock in flocks:
+                write(flock.accelerations[:flock.count].astype('<f8').tobytes())
+            write(numpy.array([flock.next_id for flock in flocks], dtype='<i8').tobytes())
+            if population is not None:
+                pending = population.pending
+                write(numpy.array([population.ticks, population.births, population.deaths, pending],
+                                  dtype='<i8').tobytes())
+                write(population.due[:pending].astype('<i8').tobytes())
+                write(population.due_species[:pending].astype('<i2').tobytes())
+                write(b'\0' * _padding(pending * 2))
+
+        self.frames += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+'''
+State of a single flock in a frame of a Recording. The arrays are read only views into the recording. ids are None in recordings older than version 3, accelerations and next_id are only recorded in keyframes (of version 2 and 3 on), None otherwise.
+'''
+class RecordedFlock(object):
+    def __init__(self, count, parameters, positions, velocities, species, ids=None, accelerations=None, next_id=None):
+        self.count = count
+        self.parameters = parameters
+        self.positions = positions
+        self.velocities = velocities
+        self.species = species
+        self.ids = ids
+        self.accelerations = accelerations
+        self.next_id = next_id
+
+
+'''
+A frame of a Recording: the tick it was recorded at, the goal, a RecordedFlock per flock, the obstacle centers and sides (None before version 5, when they were all 30) and, for keyframes only, what is needed to resume the run (random generator states, accumulator and, for scenarios with a Population, its ticks, births, deaths and the due ticks and species of its respawns waiting, None otherwise).
+'''
+class Frame(object):
+    def __init__(self, tick, goal, flocks, obstacles, obstacle_sizes=None, python_state=None, numpy_state=None,
+                 accumulator=None, population=None):
+        self.tick = tick
+        self.goal = goal
+        self.flocks = flocks
+        self.obstacles = obstacles
+        self.obstacle_sizes = obstacle_sizes
+        self.python_state = python_state
+        self.numpy_state = numpy_state
+        self.accumulator = accumulator
+        self.population = population
+
+    @property
+    def keyframe(self):
+        return self.python_state is not None
+
+
+class Recording(object):
+    '''
+    A recording written by Recorder, memory mapped so that opening it only reads the frame headers and any frame can be read straight away, in any order, to replay or scrub through the run.
+
+    load(index) puts the state of a frame into a Simulation, which is enough to draw it. resume(index) gives a simulation that continues the recorded run exactly: it loads the last keyframe at or before index and simulates the ticks from there.
+    '''
+    def __init__(self, path):
+        self.path = path
+
+        self.data = numpy.memmap(path, dtype=numpy.uint8, mode='r')
+        magic, version, length = FILE_HEADER.unpack(self.data[:FILE_HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError("{0} is not a boids recording".format(path))
+        if not MIN_VERSION <= version <= VERSION:
+            raise ValueError("{0} is a version {1} recording, only versions {2} to {3} are supported".format(
+                path, version, MIN_VERSION, VERSION))
+        self.version = version
+        self.metadata = json.loads(self.data[FILE_HEADER.size:FILE_HEADER.size + length].tobytes().decode('utf-8'))
+
+        # Offset, tick and flags of every frame
+        self.offsets = []
+        self.ticks = []
+        self.keyframes = []
+        self.end = FILE_HEADER.size + length
+        self.scan()
+
+    '''
+    Index the frames from the end of the last frame indexed, stopping at the end of the file or at a frame that is not completely written yet.
+    '''
+    def scan(self):
+        data = self.data
+        while self.end + FRAME_HEADER.size <= len(data):
+            header = FRAME_HEADER.unpack(data[self.end:self.end + FRAME_HEADER.size].tobytes())
+            magic, size, tick, flags = header[:4]
+            if magic != FRAME_MAGIC or self.end + size > len(data):
+                break
+
+            if flags & KEYFRAME:
+                self.keyframes.append(len(self.offsets))
+            self.offsets.append(self.end)
+            self.ticks.append(tick)
+            self.end += size
+
+    '''
+    Map the file again and index the frames appended to it since it was opened (or last refreshed).
+    '''
+    def refresh(self):
+        self.data = numpy.memmap(self.path, dtype=numpy.uint8, mode='r')
+        self.scan()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    '''
+    Return the index of the last keyframe at or before the frame index, None if there is none.
+    '''
+    def keyframe_before(self, index):
+        before = [keyframe for keyframe in self.keyframes if keyframe <= index]
+        return before[-1] if before else None
+
+    def _array(self, offset, dtype, count, shape=None):
+        array = self.data[offset:offset + count * numpy.dtype(dtype).itemsize].view(dtype)
+        if shape is not None:
+            array = array.reshape(shape)
+        return array, offset + count * numpy.dtype(dtype).itemsize
+
+    '''
+    Read the frame index, returns a Frame.
+    '''
+    def frame(self, index):
+        offset = self.offsets[index]
+        header = FRAME_HEADER.unpack(self.data[offset:offset + FRAME_HEADER.size].tobytes())
+        magic, size, tick, flags, num_flocks, num_obstacles, unused, goal_x, goal_y = header
+        offset += FRAME_HEADER.size
+
+        flocks = []
+        for i in range(num_flocks):
+            count, num_species = FLOCK_HEADER.unpack(self.data[offset:offset + FLOCK_HEADER.size].tobytes())
+            offset += FLOCK_HEADER.size
+            parameters, offset = self._array(offset, '<f8', num_species * len(PARAMETERS), (num_species, len(PARAMETERS)))
+            positions, offset = self._array(offset, '<f8', count * 2, (count, 2))
+            velocities, offset = self._array(offset, '<f8', count * 2, (count, 2))
+            ids = None
+            if self.version >= 3:
+                ids, offset = self._array(offset, '<i8', count)
+            species, offset = self._array(offset, '<i2', count)
+            offset += _padding(count * 2)
+            flocks.append(RecordedFlock(count, parameters, positions, velocities, species, ids))
+
+        obstacles, offset = self._array(offset, '<f8', num_obstacles * 2, (num_obstacles, 2))
+        sizes = None
+        if self.version >= 5:
+            sizes, offset = self._array(offset, '<i8', num_obstacles)
+        frame = Frame(tick, (goal_x, goal_y), flocks, obstacles, sizes)
+
+        if flags & KEYFRAME:
+            floats, offset = self._array(offset, '<f8', 3)
+            integers, offset = self._array(offset, '<i8', 3)
+            python_state, offset = self._array(offset, '<u4', PYTHON_STATE)
+            numpy_state, offset = self._array(offset, '<u4', NUMPY_STATE)
+
+            accumulator, gauss_next, cached_gaussian = floats.tolist()
+            version, position, has_gauss = integers.tolist()
+            frame.accumulator = accumulator
+            frame.python_state = (version, tuple(python_state.tolist()), None if math.isnan(gauss_next) else gauss_next)
+            frame.numpy_state = ('MT19937', numpy.array(numpy_state, dtype=numpy.uint32), position, has_gauss,
+                                 cached_gaussian)
+            offset += _padding(KEYFRAME_SIZE)
+
+            if self.version >= 2:
+                for flock in flocks:
+                    flock.accelerations, offset = self._array(offset, '<f8', flock.count * 2, (flock.count, 2))
+            if self.version >= 3:
+                next_ids, offset = self._array(offset, '<i8', len(flocks))
+                for flock, next_id in zip(flocks, next_ids.tolist()):
+                    flock.next_id = next_id
+            if self.version >= 4 and self.metadata.get('capacity') is not None:
+                counts, offset = self._array(offset, '<i8', 4)
+                ticks, births, deaths, pending = counts.tolist()
+                due, offset = self._array(offset, '<i8', pending)
+                due_species, offset = self._array(offset, '<i2', pending)
+                offset += _padding(pending * 2)
+                frame.population = ticks, births, deaths, due, due_species
+
+        return frame
+
+    '''
+    Create a simulation of the recorded scenario, with the same world, timestep, integrator and settings. Its boids and obstacles are those of a new run until a frame is loaded into it.
+    '''
+    def simulation(self):
+        metadata = self.metadata
+        scenario = getattr(simulations, metadata['scenario'])
+        # Settings of only some of the scenarios are only passed to those they were recorded for
+        options = dict((name, metadata[name]) for name in ('skin', 'flow_resolution', 'lod', 'respawn', 'capacity')
+                       if metadata.get(name) is not None)
+        # Recordings made before integrators were added all moved the boids the semi-implicit way, one tick at a time, and
+        # pulled those slower than 2 towards the middle
+        return scenario(width=metadata['width'], height=metadata['height'], seed=metadata['seed'],
+                        timestep=metadata['timestep'], max_ticks_per_step=metadata['max_ticks_per_step'],
+                        integrator=metadata.get('integrator', integrators.SEMI_IMPLICIT),
+                        dt=metadata.get('dt', 1), min_speed=metadata.get('min_speed', 2), **options)
+
+    '''
+    Put the state of the frame index into simulation (a new one from simulation() by default) and return the simulation.
+
+    Random generators and respawns waiting are only restored from keyframes, which is all drawing a frame needs. Use resume to continue the run.
+    '''
+    def load(self, index, simulation=None):
+        if simulation is None:
+            simulation = self.simulation()
+        frame = self.frame(index)
+
+        names = self.metadata['species']
+        for i, (flock, recorded) in enumerate(zip(simulation.flocks(), frame.flocks)):
+            known = names[i] if i < len(names) else []
+            self._load_flock(flock, recorded, known)
+
+        goal_x, goal_y = frame.goal
+        if not math.isnan(goal_x):
+            simulation.goal_x, simulation.goal_y = goal_x, goal_y
+
+        # Obstacles are only replaced when they moved, every new set of obstacles means a new ObstacleField
+        if hasattr(simulation, 'place_obstacles'):
+            current = [(obstacle.real_x, obstacle.real_y, obstacle.size) for obstacle in simulation.obstacles]
+            sizes = [30] * len(frame.obstacles) if frame.obstacle_sizes is None else frame.obstacle_sizes.tolist()
+            recorded = [(x, y, size) for (x, y), size in zip(frame.obstacles.tolist(), sizes)]
+            if current != recorded:
+                simulation.place_obstacles([Obstacle(int(x) - size // 2, int(y) - size // 2, size)
+                                            for x, y, size in recorded])
+
+        simulation.ticks = frame.tick
+        simulation.reset_neighbors()
+        if frame.keyframe:
+            simulation.accumulator = frame.accumulator
+            simulation.rng.setstate(frame.python_state)
+            simulation.numpy_rng.set_state(frame.numpy_state)
+        if frame.population is not None:
+            population = simulation.population
+            population.ticks, population.births, population.deaths, due, due_species = frame.population
+            population.pending = len(due)
+            population.due[:len(due)] = due
+            population.due_species[:len(due)] = due_species
+
+        return simulation
+
+    def _load_flock(self, flock, recorded, names):
+        n = recorded.count
+        if len(flock.positions) < n:
+            flock.grow(n)
+
+        flock.count = n
+        flock.positions[:n] = recorded.positions
+        flock.velocities[:n] = recorded.velocities
+        flock.next_velocities[:n] = recorded.velocities
+        # Without recorded accelerations velocity Verlet starts over, like for new boids
+        flock.accelerations[:n] = numpy.nan if recorded.accelerations is None else recorded.accelerations
+        # Boids of recordings older than version 3 get the ids of their indexes
+        flock.ids[:n] = numpy.arange(n) if recorded.ids is None else recorded.ids
+        if recorded.next_id is not None:
+            flock.next_id = recorded.next_id
+        else:
+            flock.next_id = max(flock.next_id, int(flock.ids[:n].max()) + 1 if n else 0)
+        flock.species[:n] = recorded.species
+        flock.sorted_by_x = False
+        flock.layout += 1
+        flock.pairs = None
+
+        # Species of the scenario are kept by name, so that Flock.species_index still finds them (as Population.spawn
+        # does), only species it does not know get a new Species
+        known = dict((species.name, species) for species in reversed(flock.species_list) if species.name)
+        flock.species_list = []
+        for i, row in enumerate(recorded.parameters.tolist()):
+            name = names[i] if i < len(names) else ''
+            flock.species_list.append(known.get(name) or Species(*row, name=name))
+        for i, name in enumerate(PARAMETERS):
+            setattr(flock, name, numpy.array(recorded.parameters[:, i]))
+
+    '''
+    Return a simulation that continues the recorded run from the frame index, exactly as the recorded simulation did.
+    '''
+    def resume(self, index, simulation=None):
+        keyframe = self.keyframe_before(index)
+        if keyframe is None:
+            raise ValueError("No keyframe at or before frame {0}".format(index))
+
+        simulation = self.load(keyframe, simulation)
+        simulation.run(self.ticks[index] - self.ticks[keyframe])
+        return simulation
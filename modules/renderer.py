@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+import numpy
+
+from modules.constants import *
+from modules import surface_cache
+
+# Drawing strategies of a Renderer, from the fewest boids on screen to the most
+SPRITES = 'sprites'
+FULL = 'full'
+POINTS = 'points'
+
+
+'''
+Merge the list of rects into fewer, larger rects covering at least the same area: every tile of side tile that a rect touches is marked, and runs of marked tiles are merged row by row, then rows covering the same columns are merged together. At most one rect per tile comes out, however many go in.
+'''
+def merge_rects(rects, width, height, tile=64):
+    if len(rects) < 2:
+        return rects
+
+    columns = -(-width // tile)
+    rows = -(-height // tile)
+    marked = numpy.zeros((rows, columns), dtype=bool)
+    for rect in rects:
+        left = max(rect.left // tile, 0)
+        right = min((rect.right - 1) // tile, columns - 1)
+        top = max(rect.top // tile, 0)
+        bottom = min((rect.bottom - 1) // tile, rows - 1)
+        if left <= right and top <= bottom:
+            marked[top:bottom + 1, left:right + 1] = True
+
+    # Runs of marked tiles along every row, as (first column, last column) by row
+    merged = []
+    open_runs = {}
+    for row in range(rows):
+        line = numpy.concatenate(([False], marked[row], [False]))
+        edges = numpy.flatnonzero(line[1:] != line[:-1])
+        runs = set(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+        # Runs that do not go on in this row are finished
+        for run in list(open_runs):
+            if run not in runs:
+                top = open_runs.pop(run)
+                merged.append(pygame.Rect(run[0] * tile, top * tile, (run[1] - run[0]) * tile, (row - top) * tile))
+        for run in runs:
+            open_runs.setdefault(run, row)
+
+    for run, top in open_runs.items():
+        merged.append(pygame.Rect(run[0] * tile, top * tile, (run[1] - run[0]) * tile, (rows - top) * tile))
+
+    screen = pygame.Rect(0, 0, width, height)
+    return [rect.clip(screen) for rect in merged]
+
+
+class Renderer(object):
+    '''
+    Draws flocks on screen with a strategy that depends on how many boids are on screen:
+
+    - SPRITES: one FlockSprite per boid in the LayeredDirty group sprites, only the dirty rects are updated, merged into a few larger ones (merge_rects) so that the display gets a short list.
+    - FULL: past sprite_limit boids nearly all the screen is dirty anyway, so the whole frame is drawn in one go: background, every boid blitted in a single batch, then the other sprites.
+    - POINTS: past point_limit boids every boid is drawn as a small square of pixels of the average color of its image, written straight into the pixels of the screen.
+
+    The strategy only goes back down once the boids drop under 80% of a limit, so that it does not flicker between two. The other sprites of the group (obstacles, profiler overlay) are drawn by every strategy.
+
+    Only the boids inside the view (see Flock.within, and modules.camera.Camera for worlds larger than the screen) count and become draw calls, the others cost nothing to draw. Sprites of the group that live in the world (with a place method, like ObstacleSprite) are moved whenever the view moves or zooms.
+
+    With every=k only every k-th simulation tick is drawn, draw returns no rects for the others. A tick is never drawn twice. Ticks with a fraction (interpolated between two ticks, see modules.pipeline) are all drawn when every is 1; otherwise only the whole part of ticks counts, and a tick is drawn once its whole part is every past the whole part of the last tick drawn.
+    '''
+    def __init__(self, screen, background, sprites, every=1, sprite_limit=1000, point_limit=10000, point_size=2):
+        self.screen = screen
+        self.background = background
+        self.sprites = sprites
+        self.every = every
+        self.sprite_limit = sprite_limit
+        self.point_limit = point_limit
+        self.point_size = point_size
+
+        # Flocks drawn, with the paths of their images and the colors used for them as points, by species (a single one
+        # for a flock drawn with a single image)
+        self.flocks = []
+        self.mode = SPRITES
+        # Tick last drawn, its whole part, and the view and zoom it was drawn with
+        self.drawn = None
+        self.whole = None
+        self.view = None
+
+    '''
+    Draw flock with image, or with a list of images, one per species of the flock (in the order of Flock.species_list).
+    '''
+    def add_flock(self, flock, image):
+        flock.create_sprites(image, self.sprites)
+
+        paths = image if isinstance(image, list) else [image]
+        colors = []
+        for path in paths:
+            surface = surface_cache.load(path)
+            # Average color of the visible pixels of the image
+            pixels = pygame.surfarray.array3d(surface)[pygame.surfarray.array_alpha(surface) > 0]
+            color = pixels.mean(axis=0).astype(int) if len(pixels) else (255, 255, 255)
+            colors.append(self.screen.map_rgb(tuple(color)))
+        self.flocks.append((flock, paths, colors))
+
+    '''
+    Pick the strategy for count boids on screen.
+    '''
+    def choose(self, count):
+        if count > self.point_limit:
+            return POINTS
+        if count > self.sprite_limit:
+            return POINTS if self.mode == POINTS and count > 0.8 * self.point_limit else FULL
+        if self.mode != SPRITES and count > 0.8 * self.sprite_limit:
+            return FULL if self.mode == POINTS else self.mode
+        return SPRITES
+
+    '''
+    Boids of flock inside view: their indexes, their positions on screen (top left corners) with zoom pixels of the screen per pixel of the world, and the image to draw each of them with (index in the images of the flock, out of images of them).
+    '''
+    def on_screen(self, flock, view, images=1, zoom=1):
+        shown = flock.within(view)
+        kinds = numpy.minimum(flock.species[shown], images - 1)
+        return shown, ((flock.positions[shown] - (view.left, view.top)) * zoom).astype(int), kinds
+
+    '''
+    Whether tick ticks is to be drawn (see every), going back to an earlier tick always draws it.
+    '''
+    def due(self, ticks):
+        if ticks is None or self.drawn is None:
+            return True
+        if ticks == self.drawn:
+            return False
+        return self.every == 1 or not 0 <= math.floor(ticks) - self.whole < self.every
+
+    '''
+    Draw the state of the simulation at tick ticks (always drawn when None) and return the list of rects of the screen to update. view is the rect of the world shown on screen, the top left of the world by default, and zoom the number of pixels of the screen per pixel of the world (see Camera.view and Camera.zoom).
+    '''
+    def draw(self, ticks=None, view=None, zoom=1):
+        if not self.due(ticks):
+            return []
+        self.drawn = ticks
+        self.whole = None if ticks is None else math.floor(ticks)
+
+        if view is None:
+            view = pygame.Rect(0, 0, int(self.screen.get_width() / zoom), int(self.screen.get_height() / zoom))
+        moved = (tuple(view), zoom) != self.view
+        if moved:
+            self.view = tuple(view), zoom
+            for sprite in self.sprites.sprites():
+                if hasattr(sprite, 'place'):
+                    sprite.place(view, zoom)
+
+        positions = [self.on_screen(flock, view, len(paths), zoom) for flock, paths, colors in self.flocks]
+        mode = self.choose(sum(len(shown) for shown, points, kinds in positions))
+
+        if mode == SPRITES:
+            if self.mode != SPRITES or moved:
+                # Whatever the other strategies left on screen, or the world under the old view, has to go
+                self.sprites.repaint_rect(self.screen.get_rect())
+            self.mode = mode
+            for (flock, paths, colors), (shown, points, kinds) in zip(self.flocks, positions):
+                flock.sync_sprites(view, zoom, shown)
+            rects = self.sprites.draw(self.screen)
+            return merge_rects(rects, self.screen.get_width(), self.screen.get_height())
+
+        if self.mode == SPRITES:
+            # The sprites of the boids are not used any more, hide them from the group
+            for flock, paths, colors in self.flocks:
+                for sprite in flock.sprites:
+                    sprite.visible = 0
+        self.mode = mode
+
+        self.screen.blit(self.background, (0, 0))
+        if mode == FULL:
+            for (flock, paths, colors), (shown, points, kinds) in zip(self.flocks, positions):
+                for kind, path in enumerate(paths):
+                    blit_all(self.screen, surface_cache.load(path, 0, zoom), points[kinds == kind].tolist())
+        else:
+            self.draw_points(positions, zoom)
+
+        # Obstacles, overlay and anything else in the group, in layer order
+        for sprite in self.sprites.sprites():
+            if sprite.visible:
+                self.screen.blit(sprite.image, sprite.rect)
+        return [self.screen.get_rect()]
+
+    '''
+    Draw every boid as a square of point_size pixels, straight into the pixels of the screen.
+    '''
+    def draw_points(self, positions, zoom=1):
+        pixels = pygame.surfarray.pixels2d(self.screen)
+        width, height = pixels.shape
+        for (flock, paths, colors), (shown, points, kinds) in zip(self.flocks, positions):
+            # Middle of the boid image
+            images = [surface_cache.load(path, 0, zoom) for path in paths]
+            x = points[:, 0] + numpy.array([image.get_width() // 2 for image in images])[kinds]
+            y = points[:, 1] + numpy.array([image.get_height() // 2 for image in images])[kinds]
+            color = numpy.array(colors)[kinds]
+            for dx in range(self.point_size):
+                for dy in range(self.point_size):
+                    inside = (x + dx >= 0) & (x + dx < width) & (y + dy >= 0) & (y + dy < height)
+                    pixels[x[inside] + dx, y[inside] + dy] = color[inside]
+        # The screen stays locked as long as the pixel array exists
+        del pixels
+
+
+'''
+Blit image at every position of positions onto surface, in a single call when pygame has Surface.blits.
+'''
+def blit_all(surface, image, positions):
+    if hasattr(surface, 'blits'):
+        surface.blits([(image, position) for position in positions], False)
+    else:
+        for position in positions:
+            surface.blit(image, position)
@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import random
+
+import numpy
+
+from modules import config, integrators, kernels
+from modules.flock import *
+from modules.flow_field import *
+from modules.interactions import *
+from modules.lod import *
+from modules.neighbor_list import *
+from modules.obstacle import *
+from modules.obstacle_field import *
+from modules.parallel import *
+from modules.population import *
+from modules.predation import *
+from modules.profiler import *
+from modules.spatial_grid import *
+from modules.species import *
+
+# === Species of the scenarios ===
+
+BOID = Species(100, 40, 5, 10, 100, 200, MAX_BOID_SPEED, 'boid')
+# Boids that only look 60 pixels ahead, among obstacles
+CAUTIOUS_BOID = Species(100, 40, 5, 10, 100, 60, MAX_BOID_SPEED, 'cautious boid')
+PREY = Species(100, 40, 5, 15, 0, FIELD_OF_VIEW, MAX_PREY_SPEED, 'prey')
+PREDATOR = Species(100, 40, 5, 0, 50, FIELD_OF_VIEW, MAX_PREDATOR_SPEED, 'predator')
+# Prey that flock tighter and see further than the others
+STARLING = Species(60, 20, 5, 15, 0, 90, MAX_PREY_SPEED, 'starling')
+
+# What the species of SpeciesSimulation do about each other by default: prey and starlings each keep to their own kind
+# and flee the predators, which hunt both
+SPECIES_INTERACTIONS = {
+    ('prey', 'prey'): FLOCK,
+    ('prey', 'predator'): FLEE,
+    ('starling', 'starling'): FLOCK,
+    ('starling', 'predator'): FLEE,
+    ('predator', 'predator'): FLOCK,
+    ('predator', 'prey'): ATTACK,
+    ('predator', 'starling'): ATTACK,
+}
+
+
+class Simulation(object):
+    '''
+    Fixed timestep simulation, independent of rendering.
+
+    Subclasses set up a scenario and implement tick(), which advances it by exactly one timestep. step(dt) feeds real (or any other) elapsed time into an accumulator and runs as many ticks as fit in it, so the simulation runs at the same pace whatever the frame rate, and can be fast forwarded by passing a larger dt or by calling run() with no rendering at all.
+
+    All randomness comes from generators seeded with seed, so two simulations of the same scenario built with the same seed produce the same run. The size of the world defaults to the configured one (modules.config.world_size), and so do the numbers of boids and obstacles of the scenarios (the num_boids, num_obstacles, num_prey and num_predators settings).
+
+    With skin set the neighbors of the boids are kept in Verlet lists (modules.neighbor_list) and only searched again once boids have moved far enough for skin not to cover it, instead of every tick.
+
+    backend picks how the rules that branch on every boid run (see modules.kernels): numpy, numba, python or auto. Every backend gives the same run.
+
+    Every tick moves the boids as far as dt ticks of the rules would (with 1/60 of a second of real time per tick by default), with integrator (see modules.integrators): with a larger dt the boids need fewer ticks per second for the same motion. Boids slower than min_speed get pulled towards the middle of the world, a leftover of the boids that stalled on whole pixel positions which 0 turns off: the pull switches on and off as the speed crosses min_speed, which no integrator follows smoothly.
+    '''
+    def __init__(self, width=None, height=None, seed=None, timestep=None, max_ticks_per_step=10,
+                 skin=None, backend=kernels.NUMPY, integrator=integrators.SEMI_IMPLICIT, dt=1, min_speed=2):
+        # Size of the world
+        if width is None or height is None:
+            width, height = config.world_size()
+        self.width = width
+        self.height = height
+
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.numpy_rng = numpy.random.RandomState(self.rng.randint(0, 2 ** 32 - 1))
+
+        # Ticks of the rules per tick and how the boids move over them, an unknown integrator fails here rather than on
+        # the first tick
+        integrators.weight(integrator)
+        self.integrator = integrator
+        self.dt = dt
+        self.min_speed = min_speed
+
+        # Simulated time per tick, in seconds
+        self.timestep = timestep if timestep is not None else dt / 60
+        # Time fed to step() that has not been simulated yet
+        self.accumulator = 0.0
+        # If simulating falls behind by more than this many ticks the backlog is dropped instead of trying to catch up
+        self.max_ticks_per_step = max_ticks_per_step
+
+        # Number of ticks run so far
+        self.ticks = 0
+
+        # Functions called with no arguments after every tick, to watch the run (see modules.export)
+        self.on_tick = []
+
+        # Time spent in every rule, set to a Profiler to measure it
+        self.profiler = NullProfiler()
+
+        self.skin = skin
+        # Every NeighborList created by neighbor_search, see reset_neighbors
+        self.neighbor_lists = []
+        # Kernels handed to every Flock of the scenario
+        self.kernels = kernels.load(backend)
+
+    '''
+    Advance the simulation by dt seconds and return the number of ticks that were run.
+    '''
+    def step(self, dt):
+        self.accumulator += dt
+        ticks = 0
+        while self.accumulator >= self.timestep:
+            if ticks == self.max_ticks_per_step:
+                self.accumulator = 0.0
+                break
+            self.tick()
+            self.ticks += 1
+            for callback in self.on_tick:
+                callback()
+            self.accumulator -= self.timestep
+            ticks += 1
+
+        return ticks
+
+    '''
+    Run the given number of ticks straight away.
+    '''
+    def run(self, ticks):
+        for i in range(ticks):
+            self.tick()
+            self.ticks += 1
+            for callback in self.on_tick:
+                callback()
+
+    '''
+    Every Flock of the simulation, in a fixed order (used to save and restore the state, see modules.recording).
+    '''
+    def flocks(self):
+        return []
+
+    '''
+    Advance the simulation by a single timestep.
+    '''
+    def tick(self):
+        raise NotImplementedError
+
+    '''
+    What the neighbors of the boids of flock are found with: a NeighborList when skin is set, the flock itself otherwise.
+    '''
+    def neighbor_search(self, flock):
+        if self.skin is None:
+            return flock
+        neighbors = NeighborList(flock, self.skin)
+        self.neighbor_lists.append(neighbors)
+        return neighbors
+
+    '''
+    Forget the neighbors cached by the neighbor lists, they are searched from scratch on the next tick (see Recording.load).
+    '''
+    def reset_neighbors(self):
+        for neighbors in self.neighbor_lists:
+            neighbors.reset()
+
+
+class FlockSimulation(Simulation):
+    '''
+    Simulation of a single Flock.
+
+    Subclasses split their tick into rules(start, end), which applies the rules that only depend on the state of the current tick to the boids start to end, and whatever has to happen to the whole flock at once afterwards (update, collisions). With workers > 1 the rules are applied to separate ranges of boids in parallel, by forked processes sharing the flock (processes=True) or by threads. The per rule times of the profiler are then measured inside the workers and only a single 'rules' phase is reported. The boids are sorted by x every tick whatever the number of workers, so a seeded run gives exactly the same result with any number of workers. Workers cannot be combined with a skin (see modules.neighbor_list).
+    '''
+    def __init__(self, workers=1, processes=True, **kwargs):
+        Simulation.__init__(self, **kwargs)
+        if workers > 1 and self.skin is not None:
+            raise ValueError("A skin cannot be used with workers, the neighbor lists cache the neighbors of the whole "
+                             "flock (see modules.neighbor_list)")
+
+        self.workers = workers
+        self.processes = processes
+        # Created on the first tick, once the subclass has set up everything the workers need
+        self.pool = None
+
+    '''
+    Apply the rules to the boids start to end, reading only the state of the current tick.
+    '''
+    def rules(self, start, end):
+        raise NotImplementedError
+
+    '''
+    Everything that can change between ticks and that the rules depend on. Forked workers catch up with it (sync) before applying the rules.
+    '''
+    def state(self):
+        return {'count': self.flock.count, 'sorted_by_x': self.flock.sorted_by_x, 'layout': self.flock.layout}
+
+    def sync(self, state):
+        self.flock.count = state['count']
+        self.flock.sorted_by_x = state['sorted_by_x']
+        self.flock.layout = state['layout']
+
+    def flocks(self):
+        return [self.flock]
+
+    '''
+    Work out what the rules of every range of boids share, once per tick before they are applied. Nothing by default, anything the workers need from it goes into state.
+    '''
+    def prepare(self):
+        pass
+
+    '''
+    Start a tick and apply the rules to the whole flock.
+    '''
+    def apply_rules(self):
+        self.flock.begin_tick()
+        # Sorted whatever the number of workers, so that the boids have the same indexes (which the random bounces and
+        # the order of the sums of the rules follow) and a seeded run gives the same result with any number of workers
+        self.flock.sort_by_x()
+        self.prepare()
+        if self.workers <= 1:
+            self.rules(0, self.flock.count)
+            return
+
+        if self.pool is None:
+            self.pool = WorkerPool(self, self.workers, self.processes)
+        with self.profiler.phase('rules'):
+            self.pool.run()
+
+    '''
+    Stop the workers, if any.
+    '''
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+
+'''
+Flock of boids following the three basic rules (experiments/basic.py).
+
+With lod set to a radius, boids further away than lod only contribute to cohesion and alignment through cell summaries (see modules.lod.approximate_neighbors), which is much faster for dense flocks. Flocks of fewer than MIN_BOIDS boids (see modules.lod) are cheaper to search exactly and are not approximated. lod cannot be combined with a skin, the neighbor lists only cache exact neighbors.
+'''
+class BasicSimulation(FlockSimulation):
+    def __init__(self, num_boids=None, species=BOID, lod=None, **kwargs):
+        FlockSimulation.__init__(self, **kwargs)
+        if lod is not None and self.skin is not None:
+            raise ValueError("A skin cannot be used with lod, the neighbor lists only cache exact neighbors (see "
+                             "modules.neighbor_list)")
+        self.lod = lod
+        # Sums over the far cells of every boid for the current tick (see modules.lod.far_neighbors), None when the
+        # neighbors are exact
+        self.far = None
+        if num_boids is None:
+            num_boids = config.get('num_boids')
+
+        self.flock = Flock(self.width, self.height, num_boids, rng=self.numpy_rng, kernels=self.kernels)
+        for i in range(num_boids):
+            self.flock.add(self.rng.randint(0, self.width), self.rng.randint(0, self.height), species)
+        self.neighbors = self.neighbor_search(self.flock)
+
+    def state(self):
+        state = FlockSimulation.state(self)
+        state['lod'] = self.lod
+        # The far sums prepare worked out, so that the workers do not work them out again
+        state['far'] = self.far
+        return state
+
+    def sync(self, state):
+        FlockSimulation.sync(self, state)
+        self.lod = state['lod']
+        self.far = state['far']
+
+    def prepare(self):
+        self.far = None
+        if self.lod is not None and self.flock.count >= MIN_BOIDS:
+            with self.profiler.phase('far cells'):
+                self.far = far_neighbors(self.flock, self.lod)
+
+    def rules(self, start, end):
+        profiler = self.profiler
+        with profiler.phase('neighbors'):
+            if self.far is None:
+                pairs, far = self.neighbors.find_neighbors(start, end), None
+            else:
+                pairs, far = approximate_neighbors(self.flock, self.lod, start=start, end=end, far=self.far)
+        with profiler.phase('cohesion'):
+            self.flock.cohesion(pairs, far)
+        with profiler.phase('alignment'):
+            self.flock.alignment(pairs, far)
+        with profiler.phase('separation'):
+            self.flock.separation(20, pairs)
+
+    def tick(self):
+        self.apply_rules()
+        with self.profiler.phase('integrate'):
+            self.flock.update(False, self.dt, self.integrator, self.min_speed)
+
+
+'''
+Flock of boids avoiding obstacles on its way to a goal (experiments/boids-with-obstacles.py).
+
+With flow_resolution set the boids follow the shortest paths to the goal around the obstacles (see modules.flow_field.FlowField, cells of side flow_resolution) instead of heading straight for it.
+'''
+class ObstacleSimulation(FlockSimulation):
+    def __init__(self, num_boids=None, num_obstacles=None, species=CAUTIOUS_BOID, flow_resolution=None, **kwargs):
+        FlockSimulation.__init__(self, **kwargs)
+        self.flow_resolution = flow_resolution
+        if num_boids is None:
+            num_boids = config.get('num_boids')
+        if num_obstacles is None:
+            num_obstacles = config.get('num_obstacles')
+
+        self.flock = Flock(self.width, self.height, num_boids, rng=self.numpy_rng, kernels=self.kernels)
+        for i in range(num_boids):
+            self.flock.add(self.rng.randint(0, self.width), self.rng.randint(0, self.height), species)
+
+        obstacles = []
+        for i in range(num_obstacles):
+            obstacles.append(Obstacle(self.rng.randint(0 + BORDER, self.width - BORDER),
+                                      self.rng.randint(0 + BORDER, self.height - BORDER)))
+        self.place_obstacles(obstacles)
+        self.neighbors = self.neighbor_search(self.flock)
+
+        # Point the boids are heading to, the middle of the world until told otherwise
+        self.goal_x = self.width / 2
+        self.goal_y = self.height / 2
+
+    '''
+    Replace the obstacles with the list of Obstacle obstacles.
+    '''
+    def place_obstacles(self, obstacles):
+        self.obstacles = obstacles
+        # Obstacles never move, so everything about them is computed once up front
+        self.obstacle_field = ObstacleField(self.obstacles, self.flock.field_of_view.max(), self.width, self.height)
+        self.navigate(self.flow_resolution)
+
+    '''
+    Follow a FlowField with cells of side resolution to the goal, or head straight for it when resolution is None.
+    '''
+    def navigate(self, resolution):
+        self.flow_resolution = resolution
+        self.flow_field = None
+        if resolution is not None:
+            self.flow_field = FlowField(self.obstacles, self.width, self.height, resolution, self.flock.size)
+
+    def state(self):
+        state = FlockSimulation.state(self)
+        state['goal'] = self.goal_x, self.goal_y
+        state['flow_resolution'] = self.flow_resolution
+        # The paths prepare worked out, so that the workers do not work them out again
+        state['flow'] = self.flow_field.current() if self.flow_field is not None else None
+        return state
+
+    def sync(self, state):
+        FlockSimulation.sync(self, state)
+        self.goal_x, self.goal_y = state['goal']
+        if state['flow_resolution'] != self.flow_resolution:
+            self.navigate(state['flow_resolution'])
+        if state['flow'] is not None:
+            self.flow_field.use(*state['flow'])
+
+    def prepare(self):
+        if self.flow_field is not None:
+            # Only works the paths out again when the goal moved to another cell
+            with self.profiler.phase('goal'):
+                self.flow_field.set_goal(self.goal_x, self.goal_y)
+
+    def rules(self, start, end):
+        profiler = self.profiler
+        with profiler.phase('neighbors'):
+            pairs = self.neighbors.find_neighbors(start, end)
+        with profiler.phase('cohesion'):
+            self.flock.cohesion(pairs)
+        with profiler.phase('alignment'):
+            self.flock.alignment(pairs)
+        with profiler.phase('separation'):
+            self.flock.separation(20, pairs)
+        with profiler.phase('obstacle_avoidance'):
+            self.flock.obstacle_avoidance(self.obstacle_field, start, end)
+        with profiler.phase('goal'):
+            if self.flow_field is None:
+                self.flock.goal(self.goal_x, self.goal_y, start, end)
+            else:
+                self.flock.follow(self.flow_field, start, end)
+
+    def tick(self):
+        self.apply_rules()
+        with self.profiler.phase('integrate'):
+            self.flock.update(False, self.dt, self.integrator, self.min_speed)
+
+        # Push the boids that ran into an obstacle back out of it
+        with self.profiler.phase('collisions'):
+            self.flock.obstacle_collisions(self.obstacle_field)
+
+
+'''
+Flock of prey hunted by a flock of predators (experiments/boids-with-predators.py).
+
+Prey and predators are two Flocks, the interactions between them are batched by Predation. Prey that get eaten are removed from the prey flock, and come back respawn ticks later when respawn is set. The prey flock has room for capacity prey (num_prey by default), more prey can be spawned up to that many (see modules.population).
+'''
+class PredatorSimulation(Simulation):
+    def __init__(self, num_prey=None, num_predators=None, prey_species=PREY, predator_species=PREDATOR,
+                 respawn=None, capacity=None, **kwargs):
+        Simulation.__init__(self, **kwargs)
+        if num_prey is None:
+            num_prey = config.get('num_prey')
+        if num_predators is None:
+            num_predators = config.get('num_predators')
+
+        self.prey = Flock(self.width, self.height, max(num_prey, capacity or 0), rng=self.numpy_rng,
+                          kernels=self.kernels)
+        self.predators = Flock(self.width, self.height, num_predators, rng=self.numpy_rng, kernels=self.kernels)
+        for i in range(num_prey):
+            self.prey.add(self.rng.randint(BORDER, self.width - BORDER), self.rng.randint(BORDER, self.height - BORDER), prey_species)
+        for i in range(num_predators):
+            self.predators.add(self.rng.randint(BORDER, self.width - BORDER), self.rng.randint(BORDER, self.height - BORDER), predator_species)
+
+        self.predation = Predation(self.prey, self.predators)
+        self.population = Population(self.prey, capacity, respawn)
+        self.prey_neighbors = self.neighbor_search(self.prey)
+        self.predator_neighbors = self.neighbor_search(self.predators)
+
+    def flocks(self):
+        return [self.prey, self.predators]
+
+    def tick(self):
+        profiler = self.profiler
+        prey, predators = self.prey, self.predators
+        prey.begin_tick()
+        predators.begin_tick()
+
+        # Scan for boids and predators to pay attention to, prey flock with the prey up to 200 pixels away
+        with profiler.phase('neighbors'):
+            prey_pairs = self.prey_neighbors.find_neighbors(radius=200)
+            predator_pairs = self.predator_neighbors.find_neighbors()
+        with profiler.phase('predation'):
+            self.predation.find()
+
+        # Apply the rules of the boids
+        with profiler.phase('cohesion'):
+            prey.cohesion(prey_pairs)
+            predators.cohesion(predator_pairs)
+        with profiler.phase('alignment'):
+            prey.alignment(prey_pairs)
+            predators.alignment(predator_pairs)
+        with profiler.phase('separation'):
+            prey.separation(20, prey_pairs)
+            predators.separation(20, predator_pairs)
+        with profiler.phase('flee'):
+            self.predation.flee()
+        with profiler.phase('attack'):
+            self.predation.attack()
+
+        with profiler.phase('integrate'):
+            prey.update(True, self.dt, self.integrator, self.min_speed)
+            predators.update(True, self.dt, self.integrator, self.min_speed)
+
+        # If a predator manages to touch a prey, the prey gets eaten!
+        with profiler.phase('collisions'):
+            self.predation.kills(self.population.despawn)
+            self.population.tick()
+
+
+'''
+Any number of species sharing a single flock, what every species does about the others given by an interaction matrix (experiments/boids-with-species.py).
+
+species lists the species with their numbers of boids, as (Species, count), by default prey and starlings (num_prey of each) and predators (num_predators), and interactions maps pairs of species (or of their names) to what the boids of the first do about those of the second (see modules.interactions), pairs left out ignore each other. Every tick runs one neighbor search for all the species, and every rule once over the pairs of all the species it applies to. Boids that get eaten are removed from the flock, and come back respawn ticks later when respawn is set. The flock has room for capacity boids (as many as there are at first by default), see modules.population.
+'''
+class SpeciesSimulation(Simulation):
+    def __init__(self, species=None, interactions=SPECIES_INTERACTIONS, wrap=True, respawn=None, capacity=None,
+                 **kwargs):
+        Simulation.__init__(self, **kwargs)
+        self.wrap = wrap
+        if species is None:
+            species = ((PREY, config.get('num_prey')), (STARLING, config.get('num_prey')),
+                       (PREDATOR, config.get('num_predators')))
+
+        self.flock = Flock(self.width, self.height, max(sum(count for kind, count in species), capacity or 0),
+                           rng=self.numpy_rng, kernels=self.kernels)
+        # Indexes of the species in the flock are those of the interaction matrix
+        self.interactions = Interactions([kind for kind, count in species], interactions)
+        for kind, count in species:
+            self.flock.species_index(kind)
+        for kind, count in species:
+            for i in range(count):
+                self.flock.add(self.rng.randint(BORDER, self.width - BORDER),
+                               self.rng.randint(BORDER, self.height - BORDER), kind)
+        self.population = Population(self.flock, capacity, respawn)
+        self.neighbors = self.neighbor_search(self.flock)
+
+    def flocks(self):
+        return [self.flock]
+
+    def tick(self):
+        profiler = self.profiler
+        flock, interactions = self.flock, self.interactions
+        flock.begin_tick()
+
+        # A single scan for the neighbors of every species, sorted by what the boids do about them
+        with profiler.phase('neighbors'):
+            pairs = interactions.split(flock, self.neighbors.find_neighbors())
+
+        with profiler.phase('cohesion'):
+            flock.cohesion(pairs[FLOCK])
+        with profiler.phase('alignment'):
+            flock.alignment(pairs[FLOCK])
+        with profiler.phase('separation'):
+            flock.separation(20, pairs[FLOCK])
+        with profiler.phase('flee'):
+            fleeing = interactions.flee(flock, pairs[FLEE])
+        with profiler.phase('attack'):
+            attacking = interactions.attack(flock, pairs[ATTACK])
+            interactions.roam(flock, fleeing | attacking)
+
+        with profiler.phase('integrate'):
+            flock.update(self.wrap, self.dt, self.integrator, self.min_speed)
+
+        # Boids touched by a boid that attacks them get eaten
+        with profiler.phase('collisions'):
+            interactions.kills(flock, self.population.despawn)
+            self.population.tick()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# coding=utf-8
+from __future__ import division  # required in Python 2.7
+
+import math
+
+import numpy
+
+
+'''
+Uniform grid spatial index (spatial hash) for whole arrays of points at once. Using the field of view as the cell size means every point only has to be matched against the points of the 3x3 block of cells around it instead of against every other point.
+
+Returns three arrays (query_ids, target_ids, distances) listing every pair of a point in points and a point in targets that are strictly closer than radius, together with the distance between them. When targets is not given the points are matched against each other and pairs of a point with itself are left out.
+
+Targets are bucketed into cells of side cell_size (the radius by default) by sorting them on their cell key, so every query only needs a binary search per neighboring cell instead of a scan of all targets.
+'''
+def neighbor_pairs(points, radius, targets=None, cell_size=None):
+    same = targets is None
+    if same:
+        targets = points
+    if cell_size is None:
+        cell_size = radius
+
+    empty = numpy.zeros(0, dtype=numpy.intp)
+    if len(points) == 0 or len(targets) == 0:
+        return empty, empty, numpy.zeros(0)
+
+    reach = int(math.ceil(radius / cell_size))
+    point_cells = numpy.floor(points / cell_size).astype(numpy.int64)
+    target_cells = numpy.floor(targets / cell_size).astype(numpy.int64)
+
+    # Flatten 2d cell coordinates into a single key, leaving a margin of reach cells on each side so that neighboring cells never wrap around onto another row.
+    origin = numpy.minimum(point_cells.min(axis=0), target_cells.min(axis=0)) - reach
+    point_cells -= origin
+    target_cells -= origin
+    rows = max(point_cells[:, 1].max(), target_cells[:, 1].max()) + reach + 1
+
+    target_keys = target_cells[:, 0] * rows + target_cells[:, 1]
+    order = numpy.argsort(target_keys, kind='mergesort')
+    sorted_keys = target_keys[order]
+
+    query_ids = []
+    target_ids = []
+    point_range = numpy.arange(len(points))
+    for offset_x in range(-reach, reach + 1):
+        for offset_y in range(-reach, reach + 1):
+            keys = (point_cells[:, 0] + offset_x) * rows + point_cells[:, 1] + offset_y
+            starts = numpy.searchsorted(sorted_keys, keys, 'left')
+            counts = numpy.searchsorted(sorted_keys, keys, 'right') - starts
+            total = counts.sum()
+            if total == 0:
+                continue
+
+            # Expand every (point, cell) match into one entry per target in the cell.
+            firsts = numpy.cumsum(counts) - counts
+            within = numpy.arange(total) - numpy.repeat(firsts, counts)
+            query_ids.append(numpy.repeat(point_range, counts))
+            target_ids.append(order[numpy.repeat(starts, counts) + within])
+
+    if len(query_ids) == 0:
+        return empty, empty, numpy.zeros(0)
+
+    query_ids = numpy.concatenate(query_ids)
+    target_ids = numpy.concatenate(target_ids)
+    delta = points[query_ids] - targets[target_ids]
+    distances = numpy.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+
+    keep = distances < radius
+    if same:
+        keep &= query_ids != target_ids
+
+    return query_ids[keep], target_ids[keep], distances[keep]
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Names of the parameters shared by every boid of a species, in the order Species takes them
+PARAMETERS = ('cohesion_weight', 'alignment_weight', 'separation_weight', 'obstacle_avoidance_weight', 'goal_weight',
+              'field_of_view', 'max_speed')
+
+
+class Species(object):
+    '''
+    Parameters shared by a whole kind of boids: the weights of the rules, how far they see and how fast they go.
+
+    Boids of a Flock only store their own state plus the index of their species, so a flock of a million boids holds a handful of Species rather than a million copies of the same weights. The flock copies the parameters when the species is first added to it, changes made to a Species afterwards are not seen by that flock.
+    '''
+    __slots__ = PARAMETERS + ('name',)
+
+    def __init__(self, cohesion_weight, alignment_weight, separation_weight, obstacle_avoidance_weight, goal_weight,
+                 field_of_view, max_speed, name=''):
+        self.cohesion_weight = cohesion_weight
+        self.alignment_weight = alignment_weight
+        self.separation_weight = separation_weight
+        self.obstacle_avoidance_weight = obstacle_avoidance_weight
+        self.goal_weight = goal_weight
+        self.field_of_view = field_of_view
+        self.max_speed = max_speed
+        self.name = name
+
+    def __repr__(self):
+        return 'Species({0})'.format(', '.join('{0}={1!r}'.format(name, getattr(self, name)) for name in self.__slots__))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# coding=utf-8
+from modules.constants import *
+from modules import surface_cache
+
+# Sprites drawing the simulation. Importing this module imports pygame, only code that draws does.
+
+
+'''
+Sprite drawing a boid of a Flock. It has no state of its own, Flock.sync_sprites tells it which boid to show (index) and where.
+'''
+class FlockSprite(pygame.sprite.DirtySprite):
+    def __init__(self, image):
+        pygame.sprite.DirtySprite.__init__(self)
+
+        # Boid of the flock shown by the sprite
+        self.index = None
+
+        # Load image as sprite, shared with every other sprite using the same image
+        self.image = surface_cache.load(image)
+        # Image and scale the sprite is drawn with
+        self.shown = image, 1
+
+        # Fetch the rectangle object that has the dimensions of the image
+        self.rect = self.image.get_rect()
+
+    '''
+    Draw the sprite with image scaled by scale from now on (boids of several species share the sprites of their flock, and the camera zooms).
+    '''
+    def show(self, image, scale=1):
+        if self.shown != (image, scale):
+            self.shown = image, scale
+            self.image = surface_cache.load(image, 0, scale)
+            self.rect.size = self.image.get_size()
+
+
+'''
+Sprite drawing an Obstacle.
+'''
+class ObstacleSprite(pygame.sprite.DirtySprite):
+    def __init__(self, obstacle):
+        pygame.sprite.DirtySprite.__init__(self)
+
+        self.obstacle = obstacle
+        self.place()
+
+    '''
+    Put the sprite where the obstacle is on a screen showing view (a pygame.Rect of the world, the top left of the world by default), zoom pixels of the screen per pixel of the world.
+    '''
+    def place(self, view=None, zoom=1):
+        left, top = (view.left, view.top) if view is not None else (0, 0)
+        size = int(round(self.obstacle.size * zoom))
+
+        # Draw obstacles (squares), every obstacle of a size shares the same surface
+        self.image = surface_cache.solid([size, size], RED)
+
+        # Fetch the rectangle object that has the dimensions of the image
+        self.rect = self.image.get_rect()
+        self.rect.x = (self.obstacle.x - left) * zoom
+        self.rect.y = (self.obstacle.y - top) * zoom
+
+        self.dirty = 1
+
+
+'''
+Sprites drawing the list of Obstacle obstacles, one per obstacle. Made once per obstacle and then reused.
+'''
+def obstacle_sprites(obstacles):
+    sprites = []
+    for obstacle in obstacles:
+        if obstacle.sprite is None:
+            obstacle.sprite = ObstacleSprite(obstacle)
+        sprites.append(obstacle.sprite)
+    return sprites
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# coding=utf-8
+from modules import pygame
+
+# Surfaces shared by every sprite of a kind. Each image is decoded and converted once, so spawning more sprites costs no extra image loading or memory.
+# Sprites must treat the surfaces they get from here as read only, since drawing on one changes every sprite using it.
+_surfaces = {}
+
+'''
+Return the converted surface of the image at path, rotated by angle degrees and scaled by scale.
+'''
+def load(path, angle=0, scale=1):
+    key = (path, angle, scale)
+    surface = _surfaces.get(key)
+    if surface is None:
+        if angle == 0 and scale == 1:
+            surface = pygame.image.load(path).convert_alpha()
+        else:
+            surface = pygame.transform.rotozoom(load(path), angle, scale)
+        _surfaces[key] = surface
+
+    return surface
+
+'''
+Return a surface of the given size filled with color.
+'''
+def solid(size, color):
+    key = (tuple(size), tuple(color))
+    surface = _surfaces.get(key)
+    if surface is None:
+        surface = pygame.Surface(size)
+        surface.fill(color)
+        _surfaces[key] = surface
+
+    return surface
+
+'''
+Forget the cached surfaces of the image at path (every rotation and scale), or every cached surface if no path is given.
+
+Needed after the display mode changes, since converted surfaces are tied to the pixel format of the display.
+'''
+def invalidate(path=None):
+    if path is None:
+        _surfaces.clear()
+        return
+
+    for key in list(_surfaces):
+        if key[0] == path:
+            del _surfaces[key]